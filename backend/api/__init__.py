@@ -3,4 +3,6 @@ from .clients import router as clients_router
 from .payments import router as payments_router
 from .contracts import router as contracts_router
 from .files import router as files_router
-from .contacts import router as contacts_router
\ No newline at end of file
+from .contacts import router as contacts_router
+from .admin import router as admin_router
+from .jobs import router as jobs_router
\ No newline at end of file
@@ -0,0 +1,116 @@
+# backend/api/admin.py
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from typing import List, Dict, Any, Optional
+import logging
+
+from database import get_worst_queries, get_db_connection
+from utils.pattern_registry import get_pattern_registry
+from utils.pipeline import get_last_run
+from utils.reclassifier import reclassify_dry_run, start_reclassify, get_reclassify_status
+from utils.outbox import get_outbox_status, retry_failed
+from utils.job_queue import submit_job
+
+router = APIRouter()
+
+@router.get("/slow-queries", response_model=List[Dict[str, Any]])
+async def get_slow_queries(
+    limit: int = Query(20, ge=1, le=500, description="Number of statements to return"),
+    order_by: str = Query("max_ms", pattern="^(max_ms|total_ms|count)$", description="Ranking: max_ms, total_ms or count")
+):
+    """Lists the worst offenders from the slow-query log, with their EXPLAIN QUERY PLAN output"""
+    try:
+        return get_worst_queries(limit=limit, order_by=order_by)
+    except Exception as e:
+        logging.error(f"Error reading slow-query log: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to read slow-query log")
+
+@router.get("/pattern-stats", response_model=List[Dict[str, Any]])
+async def get_pattern_stats():
+    """Lists the loaded document patterns with how often each one matched since startup"""
+    registry = get_pattern_registry()
+    return sorted(registry.get_stats(), key=lambda p: (p["pattern_type"], -p["match_count"]))
+
+@router.get("/pipeline-stats", response_model=Dict[str, Any])
+async def get_pipeline_stats():
+    """Per-stage item, error and retry counts and timing from the most recent document scan"""
+    return get_last_run()
+
+@router.post("/reclassify", response_model=Dict[str, Any])
+async def reclassify_documents(
+    dry_run: bool = Query(False, description="Only count the documents whose outcome would change")
+):
+    """
+    Re-examines documents classified with an older document_patterns version
+    and updates the ones whose outcome changed. Runs in the background;
+    an interrupted run is resumed.
+    """
+    if dry_run:
+        # Re-parses every stale document, so it runs off the event loop
+        try:
+            return await run_in_threadpool(reclassify_dry_run)
+        except Exception as e:
+            logging.error(f"Error in reclassify dry run: {str(e)}")
+            raise HTTPException(status_code=500, detail="Failed to check documents for reclassification")
+    
+    if not start_reclassify():
+        raise HTTPException(status_code=409, detail="Reclassification is already running")
+    return {"started": True}
+
+@router.get("/reclassify", response_model=Optional[Dict[str, Any]])
+async def get_reclassify_run():
+    """Progress of the most recent reclassification run"""
+    conn = get_db_connection()
+    try:
+        return get_reclassify_status(conn)
+    except Exception as e:
+        logging.error(f"Error reading reclassify status: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to read reclassify status")
+    finally:
+        conn.close()
+
+@router.get("/outbox", response_model=Dict[str, Any])
+async def get_outbox():
+    """Pending, done and failed shortcut creations, with the most recent failures"""
+    conn = get_db_connection()
+    try:
+        return get_outbox_status(conn)
+    except Exception as e:
+        logging.error(f"Error reading outbox status: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to read outbox status")
+    finally:
+        conn.close()
+
+@router.post("/outbox/retry", response_model=Dict[str, Any])
+async def retry_outbox():
+    """Queue the shortcut creations that gave up for another round of attempts"""
+    conn = get_db_connection()
+    try:
+        return {"requeued": retry_failed(conn)}
+    except Exception as e:
+        logging.error(f"Error retrying outbox: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to retry outbox")
+    finally:
+        conn.close()
+
+@router.post("/dedupe-report", response_model=Dict[str, Any], status_code=202)
+async def start_dedupe_report(
+    start_year: int = Query(..., description="First mail dump year"),
+    end_year: int = Query(..., description="Last mail dump year")
+):
+    """
+    Queues a report of identical files in the mail dump folders of a range
+    of years; the result is on /api/jobs/{job_id}. To replace duplicates
+    with links to one stored copy, run python -m utils.blob_store --apply.
+    """
+    if start_year > end_year:
+        raise HTTPException(status_code=400, detail="start_year must not be after end_year")
+    conn = get_db_connection()
+    try:
+        job, created = submit_job(conn, "dedupe_report", {"start_year": start_year, "end_year": end_year})
+        return {**job, "deduplicated": not created}
+    except Exception as e:
+        logging.error(f"Error queueing dedupe report: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to queue dedupe report")
+    finally:
+        conn.close()
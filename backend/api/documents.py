@@ -1,15 +1,23 @@
 # backend/api/documents.py
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form, BackgroundTasks
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from typing import List, Optional, Dict, Any
-import os
+from urllib.parse import quote
 import logging
 from datetime import datetime
 
 from database import get_db_connection
-from models.file import FileResponse, FileCreate, PaymentFileLink
-from utils.file_manager import FileManager
+from models.file import FileResponse, FileCreate, PaymentFileLink, MatchReviewResolution, BackfillRequest
+from utils.file_manager import FileManager, UploadTooLarge
 from utils.document_processor import DocumentProcessor
+from utils.mail_watcher import get_mail_watcher
+from utils.backfill import start_backfill, get_backfill_status
+from utils.job_queue import submit_scan
+from utils.outbox import enqueue_shortcut, get_outbox_worker
+from utils.file_server import file_cache, get_file_meta, lookup_document, serve_file
+from utils.bundles import select_documents, stream_zip, bundle_filename
+from utils.document_listing import list_documents
 
 router = APIRouter()
 file_manager = FileManager()
@@ -17,7 +25,7 @@ doc_processor = DocumentProcessor()
 
 @router.post("/upload", response_model=FileResponse, status_code=201)
 async def upload_document(
-    background_tasks: BackgroundTasks,
+    response: Response,
     file: UploadFile = File(...),
     client_ids: List[int] = Form(...),
     payment_ids: Optional[List[int]] = Form(None),
@@ -31,73 +39,78 @@ async def upload_document(
         raise HTTPException(status_code=400, detail="No file provided")
         
     try:
-        # Save document to mail dump (Store Once)
-        result = file_manager.save_document_to_mail_dump(file, file.filename, provider_id=provider_id)
-        file_id = result["file_id"]
+        # Stream the document to the mail dump (Store Once)
+        staged = await file_manager.stage_upload(file, file.filename)
         
-        # Process client associations and create shortcuts (Link Everywhere)
-        conn = get_db_connection()
         try:
-            # For each client, create a shortcut
-            for client_id in client_ids:
-                # Get client info
-                client = conn.execute(
-                    "SELECT display_name FROM clients WHERE client_id = ?",
-                    (client_id,)
-                ).fetchone()
-                
-                if not client:
-                    continue
-                
-                # Extract year from filename for shortcut organization
-                year = file_manager.path_resolver.extract_year_from_filename(file.filename)
-                
-                # Create shortcut in client folder
-                shortcut_path = file_manager.path_resolver.get_shortcut_path(
-                    client['display_name'], file.filename, year
-                )
-                file_manager.path_resolver.create_windows_shortcut(result["file_path"], shortcut_path)
-            
-            # Link to payments if provided
-            if payment_ids:
-                for payment_id in payment_ids:
-                    conn.execute(
-                        "INSERT INTO payment_files(payment_id, file_id) VALUES (?, ?)",
-                        (payment_id, file_id)
-                    )
-            
-            # Mark as processed
-            conn.execute(
-                "UPDATE client_files SET is_processed = 1 WHERE file_id = ?",
-                (file_id,)
+            # Hashing, storing and linking the file block, so they run off
+            # the event loop
+            file_info, status = await run_in_threadpool(
+                _record_upload, staged, file.filename, client_ids, payment_ids, provider_id
             )
-            conn.commit()
-            
-            # Get the file metadata from the database
-            file_info = conn.execute(
-                "SELECT * FROM client_files WHERE file_id = ?",
-                (file_id,)
-            ).fetchone()
-            
-            if not file_info:
-                raise HTTPException(status_code=404, detail="File not found after upload")
-                
-            # Schedule background task to process other similar documents
-            background_tasks.add_task(
-                scan_mail_dump_for_similar_documents,
-                file.filename,
-                datetime.now().year
-            )
-                
-            return dict(file_info)
         finally:
-            conn.close()
+            file_manager.discard_upload(staged.temp_path)
+        
+        if not file_info:
+            raise HTTPException(status_code=404, detail="File not found after upload")
+        
+        # The same file uploaded again creates nothing new
+        if status == "duplicate":
+            response.status_code = 200
+        return file_info
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logging.error(f"File upload error: {str(e)}")
         raise HTTPException(status_code=500, detail="File upload failed")
 
+def _record_upload(staged, filename: str, client_ids: List[int], payment_ids: Optional[List[int]],
+                   provider_id: Optional[int]):
+    # The document row, its payment links and the client shortcuts (Link
+    # Everywhere) are recorded in one transaction; once it has committed
+    # the file is moved into place and the outbox worker creates the
+    # shortcuts
+    conn = get_db_connection()
+    try:
+        with conn:
+            cursor = conn.cursor()
+            file_id, status = file_manager.record_upload(
+                cursor, staged, filename, provider_id=provider_id, is_processed=True
+            )
+            
+            # Extract year from filename for shortcut organization
+            year = file_manager.path_resolver.extract_year_from_filename(filename)
+            placeholders = ", ".join("?" for _ in client_ids)
+            clients = cursor.execute(
+                f"SELECT display_name FROM clients WHERE client_id IN ({placeholders})",
+                client_ids
+            ).fetchall()
+            for client in clients:
+                shortcut_path = file_manager.path_resolver.get_shortcut_path(client['display_name'], filename, year)
+                enqueue_shortcut(cursor, staged.file_path, shortcut_path, file_id)
+            
+            # Link to payments if provided
+            if payment_ids:
+                cursor.executemany(
+                    "INSERT OR IGNORE INTO payment_files(payment_id, file_id) VALUES (?, ?)",
+                    [(payment_id, file_id) for payment_id in payment_ids]
+                )
+        file_manager.commit_upload(staged)
+        get_outbox_worker().notify()
+        file_cache.invalidate(("document", file_id))
+        
+        # The mail dump watcher picks up other new documents as they
+        # arrive; without it, queue an (incremental) scan of this year
+        if not get_mail_watcher().is_running:
+            submit_scan(conn, datetime.now().year)
+        
+        file_info = conn.execute("SELECT * FROM client_files WHERE file_id = ?", (file_id,)).fetchone()
+        return (dict(file_info) if file_info else None), status
+    finally:
+        conn.close()
+
 @router.get("/payment/{payment_id}", response_model=List[Dict[str, Any]])
 async def get_documents_for_payment(payment_id: int):
     """Get all documents linked to a payment using the DocumentView"""
@@ -117,46 +130,148 @@ async def get_documents_for_payment(payment_id: int):
         logging.error(f"Error retrieving documents: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to retrieve documents")
 
-@router.get("/{file_id}")
-async def get_document(file_id: int):
-    """Retrieve a document by ID and serve it"""
+@router.get("/reviews", response_model=List[Dict[str, Any]])
+async def get_match_reviews(status: str = "pending"):
+    """Get client name matches that were not confident enough to link automatically"""
     try:
-        # Get file info from database
-        conn = get_db_connection()
-        file_info = conn.execute(
-            "SELECT file_path, original_filename FROM client_files WHERE file_id = ?", 
-            (file_id,)
-        ).fetchone()
-        
-        if not file_info:
-            raise HTTPException(status_code=404, detail="Document not found")
-            
-        file_path = file_info["file_path"]
-        
-        if not os.path.exists(file_path):
-            raise HTTPException(status_code=404, detail="Document file not found on disk")
-            
-        # Determine media type
-        filename = file_info["original_filename"]
-        media_type = None
-        
-        if filename.lower().endswith(".pdf"):
-            media_type = "application/pdf"
-        elif filename.lower().endswith((".jpg", ".jpeg")):
-            media_type = "image/jpeg"
-        elif filename.lower().endswith(".png"):
-            media_type = "image/png"
-        else:
-            media_type = "application/octet-stream"
-            
-        return FileResponse(
-            path=file_path,
-            filename=filename,
-            media_type=media_type
-        )
+        processor = DocumentProcessor()
+        return processor.get_match_reviews(status)
+    except Exception as e:
+        logging.error(f"Error retrieving match reviews: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to retrieve match reviews")
+
+@router.post("/reviews/{review_id}", response_model=Dict[str, Any])
+async def resolve_match_review(review_id: int, resolution: MatchReviewResolution):
+    """Link a reviewed document to the chosen client, or reject the match (client_id null)"""
+    try:
+        processor = DocumentProcessor()
+        return processor.resolve_match_review(review_id, resolution.client_id, resolution.remember)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logging.error(f"Error resolving match review: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to resolve match review")
+
+@router.post("/backfill", response_model=Dict[str, Any], status_code=202)
+async def start_document_backfill(request: BackfillRequest):
+    """
+    Queue the processing of the mail dump folders of a range of past years;
+    progress is checkpointed per folder
+    """
+    conn = get_db_connection()
+    try:
+        job, created = start_backfill(conn, request.start_year, request.end_year)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logging.error(f"Error starting backfill: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to start backfill")
+    finally:
+        conn.close()
+    
+    if not created:
+        raise HTTPException(status_code=409, detail="A backfill is already queued or running")
+    return _backfill_status(job["job_id"])
+
+@router.get("/backfill", response_model=Dict[str, Any])
+async def get_latest_document_backfill():
+    """Progress of the most recent backfill"""
+    return _backfill_status(None)
+
+@router.get("/backfill/{job_id}", response_model=Dict[str, Any])
+async def get_document_backfill(job_id: int):
+    """Progress of a backfill: per-folder files done, documents processed and errors"""
+    return _backfill_status(job_id)
+
+def _backfill_status(job_id: Optional[int]) -> Dict[str, Any]:
+    conn = get_db_connection()
+    try:
+        status = get_backfill_status(conn, job_id)
+    except Exception as e:
+        logging.error(f"Error retrieving backfill status: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to retrieve backfill status")
+    finally:
+        conn.close()
+    
+    if status is None:
+        raise HTTPException(status_code=404, detail="Backfill not found")
+    return status
+
+@router.get("/bundle")
+async def download_document_bundle(
+    client_id: Optional[int] = Query(None, description="Documents of this client"),
+    payment_ids: Optional[List[int]] = Query(None, description="Documents linked to any of these payments"),
+    start_date: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}$", description="First document date"),
+    end_date: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}$", description="Last document date")
+):
+    """
+    Download every document matching the filters as one ZIP, streamed as it
+    is built (e.g. a client's statements for a quarter)
+    """
+    conn = get_db_connection()
+    try:
+        documents = select_documents(conn, client_id, payment_ids, start_date, end_date)
+        client = conn.execute(
+            "SELECT display_name FROM clients WHERE client_id = ?", (client_id,)
+        ).fetchone() if client_id is not None else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logging.error(f"Error selecting bundle documents: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to select documents")
+    finally:
+        conn.close()
+    
+    if not documents:
+        raise HTTPException(status_code=404, detail="No documents match")
+    
+    filename = bundle_filename(client['display_name'] if client else None, start_date, end_date)
+    return StreamingResponse(
+        stream_zip(documents),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename*=utf-8''{quote(filename)}"}
+    )
+
+@router.get("", response_model=Dict[str, Any])
+async def get_documents(
+    client_id: Optional[int] = Query(None, description="Documents mentioning (or uploaded for) this client"),
+    provider_id: Optional[int] = Query(None, description="Documents of this provider"),
+    extracted_provider: Optional[str] = Query(None, description="Provider name as extracted from the document"),
+    start_date: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}$", description="First document date"),
+    end_date: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}$", description="Last document date"),
+    match_status: Optional[str] = Query(None, pattern="^(matched|review|rejected|unmatched)$",
+                                        description="Documents with a client name in this match state"),
+    after: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(50, ge=1, le=500, description="Number of documents to return")
+):
+    """Lists documents newest first, filtered and one page at a time"""
+    conn = get_db_connection()
+    try:
+        return list_documents(conn, client_id, provider_id, extracted_provider, start_date, end_date,
+                              match_status, after, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logging.error(f"Error listing documents: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to list documents")
+    finally:
+        conn.close()
+
+@router.api_route("/{file_id}", methods=["GET", "HEAD"])
+async def get_document(file_id: int, request: Request):
+    """
+    Serve a document, with ETag/Last-Modified revalidation and byte ranges;
+    add ?v=<content_hash> for a URL that can be cached for good
+    """
+    try:
+        meta = await run_in_threadpool(get_file_meta, ("document", file_id), lambda: lookup_document(file_id))
     except Exception as e:
         logging.error(f"Error serving document: {str(e)}")
         raise HTTPException(status_code=500, detail="Error serving document")
+    
+    if meta is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return serve_file(request, meta)
 
 @router.post("/link", response_model=PaymentFileLink)
 async def link_document_to_payment(link: PaymentFileLink):
@@ -193,26 +308,21 @@ async def link_document_to_payment(link: PaymentFileLink):
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to link document: {str(e)}")
 
-@router.post("/process", response_model=Dict[str, Any])
+@router.post("/process", response_model=Dict[str, Any], status_code=202)
 async def process_documents(year: Optional[int] = None):
     """
-    Manually trigger document processing for the mail dump folder
+    Queue a scan of a year's mail dump folder and return the job at once;
+    poll /api/jobs/{job_id} for progress and the processed file IDs
     """
+    conn = get_db_connection()
     try:
-        if year is None:
-            year = datetime.now().year
-            
-        processor = DocumentProcessor()
-        processed_ids = processor.scan_mail_dump(year)
-        
-        return {
-            "success": True,
-            "processed_count": len(processed_ids),
-            "processed_ids": processed_ids
-        }
+        job, created = submit_scan(conn, year or datetime.now().year)
+        return {**job, "deduplicated": not created}
     except Exception as e:
-        logging.error(f"Document processing error: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Document processing failed: {str(e)}")
+        logging.error(f"Error queueing document processing: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to queue document processing: {str(e)}")
+    finally:
+        conn.close()
 
 @router.get("/unprocessed", response_model=List[Dict[str, Any]])
 async def get_unprocessed_documents():
@@ -223,14 +333,3 @@ async def get_unprocessed_documents():
     except Exception as e:
         logging.error(f"Error retrieving unprocessed documents: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to retrieve unprocessed documents")
-
-async def scan_mail_dump_for_similar_documents(filename: str, year: int):
-    """
-    Background task to scan for documents similar to the one just uploaded
-    """
-    try:
-        logging.info(f"Scanning mail dump for documents similar to {filename}")
-        processor = DocumentProcessor()
-        processor.scan_mail_dump(year)
-    except Exception as e:
-        logging.error(f"Background scan failed: {str(e)}")
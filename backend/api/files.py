@@ -1,12 +1,12 @@
 # backend/api/files.py
-from fastapi import APIRouter, HTTPException, Path, UploadFile, File, Form, Response
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, Path, UploadFile, File, Form, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from typing import List, Optional
-import os
 import logging
 
 from database import get_db_connection
-from utils.file_manager import FileManager
+from utils.file_manager import FileManager, UploadTooLarge
+from utils.file_server import get_file_meta, lookup_document, serve_file
 from models.file import FileResponse, FileCreate, PaymentFileLink
 
 router = APIRouter()
@@ -23,7 +23,7 @@ async def upload_file(
         raise HTTPException(status_code=400, detail="No file provided")
         
     try:
-        result = file_manager.save_uploaded_file(client_id, file, file.filename)
+        result = await file_manager.save_uploaded_file(client_id, file, file.filename)
         
         # Get the file metadata from the database
         conn = get_db_connection()
@@ -39,6 +39,8 @@ async def upload_file(
             return dict(file_info)
         finally:
             conn.close()
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -79,43 +81,19 @@ async def get_payment_files(payment_id: int):
     finally:
         conn.close()
 
-@router.get("/{file_id}")
-async def get_file(file_id: int):
-    """Retrieve a file by ID and serve it"""
+@router.api_route("/{file_id}", methods=["GET", "HEAD"])
+async def get_file(file_id: int, request: Request):
+    """Retrieve a file by ID and serve it (with revalidation and byte ranges)"""
     try:
-        # Get file info from database
-        file_info = file_manager.get_file_info(file_id)
-        
-        if not file_info:
-            raise HTTPException(status_code=404, detail="File not found")
-            
-        # Get the full path
-        full_path = file_manager.get_full_path(file_info["onedrive_path"])
-        
-        if not full_path or not os.path.exists(full_path):
-            raise HTTPException(status_code=404, detail="File not found on disk")
-            
-        # Determine media type
-        filename = file_info["file_name"]
-        media_type = None
-        
-        if filename.lower().endswith(".pdf"):
-            media_type = "application/pdf"
-        elif filename.lower().endswith((".jpg", ".jpeg")):
-            media_type = "image/jpeg"
-        elif filename.lower().endswith(".png"):
-            media_type = "image/png"
-        else:
-            media_type = "application/octet-stream"
-            
-        return FileResponse(
-            path=full_path,
-            filename=filename,
-            media_type=media_type
-        )
+        # Same cache entry as /api/documents/{file_id}, so an upload invalidates both
+        meta = await run_in_threadpool(get_file_meta, ("document", file_id), lambda: lookup_document(file_id))
     except Exception as e:
         logging.error(f"Error serving file: {str(e)}")
         raise HTTPException(status_code=500, detail="Error serving file")
+    
+    if meta is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    return serve_file(request, meta)
 
 @router.post("/link", response_model=PaymentFileLink)
 async def link_file_to_payment(link: PaymentFileLink):
@@ -0,0 +1,59 @@
+# backend/api/jobs.py
+from fastapi import APIRouter, HTTPException, Query
+from typing import List, Dict, Any, Optional
+import logging
+
+from database import get_db_connection
+from utils.job_queue import get_job, list_jobs, cancel_job
+
+router = APIRouter()
+
+@router.get("", response_model=List[Dict[str, Any]])
+async def get_jobs(
+    status: Optional[str] = Query(None, pattern="^(queued|running|completed|failed|cancelled)$", description="Only jobs with this status"),
+    limit: int = Query(50, ge=1, le=500, description="Number of jobs to return")
+):
+    """Lists background jobs, most recent first"""
+    conn = get_db_connection()
+    try:
+        return list_jobs(conn, status=status, limit=limit)
+    except Exception as e:
+        logging.error(f"Error retrieving jobs: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to retrieve jobs")
+    finally:
+        conn.close()
+
+@router.get("/{job_id}", response_model=Dict[str, Any])
+async def get_job_status(job_id: int):
+    """Status, progress and (once finished) result or error of a background job"""
+    conn = get_db_connection()
+    try:
+        job = get_job(conn, job_id)
+    except Exception as e:
+        logging.error(f"Error retrieving job: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to retrieve job")
+    finally:
+        conn.close()
+
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.post("/{job_id}/cancel", response_model=Dict[str, Any])
+async def cancel_background_job(job_id: int):
+    """
+    Cancel a job: a queued job is dropped, a running one stops at its next
+    progress report
+    """
+    conn = get_db_connection()
+    try:
+        job = cancel_job(conn, job_id)
+    except Exception as e:
+        logging.error(f"Error cancelling job: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to cancel job")
+    finally:
+        conn.close()
+
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
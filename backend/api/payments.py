@@ -203,7 +203,7 @@ async def create_payment(
         
         # Handle file upload if provided
         if file and file.filename:
-            file_result = file_manager.save_uploaded_file(
+            file_result = await file_manager.save_uploaded_file(
                 payment.client_id,
                 file,
                 file.filename
@@ -279,7 +279,7 @@ async def update_payment(
             
         # Handle file upload if provided
         if file and file.filename:
-            file_result = file_manager.save_uploaded_file(
+            file_result = await file_manager.save_uploaded_file(
                 client_id,
                 file,
                 file.filename
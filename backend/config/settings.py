@@ -38,11 +38,67 @@ class Settings:
                 "fallback": "data/401k_payments_master.db",
                 "backup": {
                     "home": "data/backup_dbs"
+                },
+                "archive": {
+                    "home": "data/archive",
+                    "superseded_days": 90,
+                    "processing_log_days": 365
                 }
             },
             "files": {
                 "base_path": "data/files",
-                "test_path": "data/test_files"
+                "test_path": "data/test_files",
+                "link_backend": "lnk",
+                "max_upload_mb": 100,
+                "blob_store": None,
+                "serve_cache_seconds": 5,
+                "serve_cache_size": 1024
+            },
+            "monitoring": {
+                "slow_query_ms": 250,
+                "slow_query_log": "logs/slow_queries.log",
+                "slow_query_log_max_bytes": 5242880,
+                "slow_query_log_backups": 5
+            },
+            "watcher": {
+                "enabled": True,
+                "debounce_seconds": 2,
+                "poll_interval_seconds": 60
+            },
+            "processing": {
+                "parallel_min_files": 500,
+                "workers": 0,
+                "chunk_size": 250,
+                "write_batch_size": 500,
+                "log_batch_size": 500,
+                "log_flush_seconds": 5,
+                "pipeline_queue_size": 64,
+                "stage_retries": 3,
+                "retry_delay_seconds": 0.5
+            },
+            "backfill": {
+                "workers": 2,
+                "chunk_size": 100,
+                "max_files_per_second": 20,
+                "idle_seconds": 2
+            },
+            "jobs": {
+                "workers": 2,
+                "poll_seconds": 2
+            },
+            "outbox": {
+                "poll_seconds": 2,
+                "batch_size": 200,
+                "max_attempts": 8,
+                "retry_delay_seconds": 5
+            },
+            "content": {
+                "enabled": False,
+                "extractor": "auto",
+                "workers": 2,
+                "timeout_seconds": 30,
+                "max_pages": 5,
+                "max_chars": 200000
             }
         }
     
@@ -126,5 +182,50 @@ class Settings:
                 return office_path
         
         return self._fix_path(self.config["database"]["backup"]["home"])
+    
+    def _section(self, name):
+        """Return a config section with defaults filled in for missing keys"""
+        section = dict(self._default_config()[name])
+        section.update(self.config.get(name) or {})
+        return section
+    
+    def get_files_config(self):
+        """Return document file settings"""
+        return self._section("files")
+    
+    def get_archive_config(self):
+        """Return archive settings with the archive directory path resolved"""
+        archive = dict(self._default_config()["database"]["archive"])
+        archive.update(self.config["database"].get("archive") or {})
+        archive["home"] = self._fix_path(archive["home"])
+        return archive
+    
+    def get_monitoring_config(self):
+        """Return slow-query monitoring settings"""
+        return self._section("monitoring")
+    
+    def get_watcher_config(self):
+        """Return mail dump watcher settings"""
+        return self._section("watcher")
+    
+    def get_processing_config(self):
+        """Return document processing settings"""
+        return self._section("processing")
+    
+    def get_backfill_config(self):
+        """Return historical backfill settings"""
+        return self._section("backfill")
+    
+    def get_jobs_config(self):
+        """Return background job queue settings"""
+        return self._section("jobs")
+    
+    def get_content_config(self):
+        """Return document text extraction settings"""
+        return self._section("content")
+    
+    def get_outbox_config(self):
+        """Return filesystem outbox worker settings"""
+        return self._section("outbox")
 
 settings = Settings()
\ No newline at end of file
@@ -1,2 +1,3 @@
 # backend/database/__init__.py
-from .connection import get_db_connection, backup_database
\ No newline at end of file
+from .connection import get_db_connection, backup_database
+from .query_monitor import get_worst_queries
@@ -0,0 +1,313 @@
+# backend/database/archive.py
+#
+# Moves superseded rows (valid_to set) and old processing_log rows out of
+# the hot database into per-year archive files (data/archive/archive_YYYY.db).
+# Archives are attached on demand and exposed through TEMP union views
+# (payments_history, contracts_history, ...) for historical queries.
+#
+#   python -m database.archive [--test] [--dry-run]
+import os
+import re
+import sys
+import logging
+import argparse
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from config import settings
+from database import get_db_connection
+from database.index_pack import get_table_columns
+from database.maintenance import refresh_stats_after_bulk_load
+
+ARCHIVE_SCHEMA = "archive"
+
+# SQLite allows 10 attached databases by default
+MAX_ATTACHED_ARCHIVES = 9
+
+# What gets archived per table, in dependency order (children first).
+# "where" selects archivable rows in main and may use :cutoff and
+# :log_cutoff; "date" is the column that decides the archive year.
+ARCHIVE_TABLES = [
+    {
+        "table": "payment_files",
+        "key": ("payment_id", "file_id"),
+        "date": "(SELECT p.valid_to FROM payments p WHERE p.payment_id = payment_files.payment_id)",
+        "where": """payment_id IN (
+                        SELECT payment_id FROM payments
+                        WHERE valid_to IS NOT NULL AND valid_to < :cutoff
+                    )""",
+    },
+    {
+        "table": "payments",
+        "key": ("payment_id",),
+        "date": "valid_to",
+        "where": "valid_to IS NOT NULL AND valid_to < :cutoff",
+    },
+    {
+        "table": "contacts",
+        "key": ("contact_id",),
+        "date": "valid_to",
+        "where": "valid_to IS NOT NULL AND valid_to < :cutoff",
+    },
+    {
+        "table": "contracts",
+        "key": ("contract_id",),
+        "date": "valid_to",
+        # Keep contracts that current payments still point at
+        "where": """valid_to IS NOT NULL AND valid_to < :cutoff
+                    AND NOT EXISTS (
+                        SELECT 1 FROM payments p
+                        WHERE p.contract_id = contracts.contract_id
+                    )""",
+    },
+    {
+        "table": "clients",
+        "key": ("client_id",),
+        "date": "valid_to",
+        # Only once nothing in the hot database refers to the client
+        "where": """valid_to IS NOT NULL AND valid_to < :cutoff
+                    AND NOT EXISTS (SELECT 1 FROM payments p WHERE p.client_id = clients.client_id)
+                    AND NOT EXISTS (SELECT 1 FROM contracts c WHERE c.client_id = clients.client_id)
+                    AND NOT EXISTS (SELECT 1 FROM contacts c WHERE c.client_id = clients.client_id)
+                    AND NOT EXISTS (SELECT 1 FROM client_providers cp WHERE cp.client_id = clients.client_id)
+                    AND NOT EXISTS (SELECT 1 FROM client_files cf WHERE cf.client_id = clients.client_id)
+                    AND NOT EXISTS (
+                        SELECT 1 FROM client_match_reviews r WHERE r.resolved_client_id = clients.client_id
+                    )
+                    AND NOT EXISTS (
+                        SELECT 1 FROM document_client_mentions m WHERE m.client_id = clients.client_id
+                    )""",
+    },
+    {
+        "table": "processing_log",
+        "key": ("log_id",),
+        "date": "process_date",
+        "where": "process_date < :log_cutoff",
+    },
+]
+
+# Columns indexed in the archive files for historical lookups
+ARCHIVE_INDEX_COLUMNS = ("client_id", "payment_id", "file_id")
+
+
+def get_archive_path(year: int) -> str:
+    """Return the archive database file for a year"""
+    return os.path.join(settings.get_archive_config()["home"], f"archive_{year}.db")
+
+
+def list_archive_years() -> List[int]:
+    """Return the years that have an archive file, oldest first"""
+    home = settings.get_archive_config()["home"]
+    if not os.path.isdir(home):
+        return []
+    years = []
+    for name in os.listdir(home):
+        match = re.fullmatch(r"archive_(\d{4})\.db", name)
+        if match:
+            years.append(int(match.group(1)))
+    return sorted(years)
+
+
+def get_cutoffs(now: Optional[datetime] = None) -> Dict[str, str]:
+    """Return the cutoff timestamps for superseded rows and processing_log rows"""
+    config = settings.get_archive_config()
+    now = now or datetime.now()
+    return {
+        "cutoff": (now - timedelta(days=int(config["superseded_days"]))).strftime("%Y-%m-%d %H:%M:%S"),
+        "log_cutoff": (now - timedelta(days=int(config["processing_log_days"]))).strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+def _quote_columns(columns: List[str]) -> str:
+    return ", ".join(f'"{column}"' for column in columns)
+
+
+def _ensure_archive_table(conn: sqlite3.Connection, schema: str, spec: Dict, columns: List[str]):
+    """Create the table in the attached archive, or add columns the hot table gained since"""
+    table = spec["table"]
+    existing = [row[1] for row in conn.execute(f"PRAGMA {schema}.table_info({table})").fetchall()]
+
+    if not existing:
+        types = {row[1]: row[2] for row in conn.execute(f"PRAGMA main.table_info({table})").fetchall()}
+        column_sql = ", ".join(f'"{column}" {types[column]}' for column in columns)
+        key_sql = _quote_columns(spec["key"])
+        conn.execute(f'CREATE TABLE {schema}."{table}" ({column_sql}, PRIMARY KEY ({key_sql}))')
+        for column in ARCHIVE_INDEX_COLUMNS:
+            if column in columns and column not in spec["key"]:
+                conn.execute(f'CREATE INDEX {schema}."idx_{table}_{column}" ON "{table}"("{column}")')
+        return
+
+    for column in columns:
+        if column not in existing:
+            conn.execute(f'ALTER TABLE {schema}."{table}" ADD COLUMN "{column}"')
+
+
+def get_archivable_counts(conn: sqlite3.Connection, cutoffs: Dict[str, str]) -> Dict[str, Dict[int, int]]:
+    """Count archivable rows per table and year without moving anything"""
+    counts = {}
+    for spec in ARCHIVE_TABLES:
+        if not get_table_columns(conn, spec["table"]):
+            continue
+        rows = conn.execute(
+            f"""SELECT CAST(strftime('%Y', {spec['date']}) AS INTEGER) AS year, COUNT(*)
+                FROM {spec['table']} WHERE {spec['where']} GROUP BY year""",
+            cutoffs
+        ).fetchall()
+        counts[spec["table"]] = {row[0]: row[1] for row in rows if row[0]}
+    return counts
+
+
+def archive_year(conn: sqlite3.Connection, year: int, cutoffs: Dict[str, str]) -> Dict[str, int]:
+    """
+    Move one year's archivable rows into archive_YYYY.db
+
+    Copy and delete happen in one transaction spanning both files, so a
+    crash leaves rows either in the hot database or in the archive.
+
+    Returns:
+        Rows moved per table
+    """
+    os.makedirs(settings.get_archive_config()["home"], exist_ok=True)
+    conn.execute(f"ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}", (get_archive_path(year),))
+    moved = {}
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            params = dict(cutoffs, year=str(year))
+            for spec in ARCHIVE_TABLES:
+                columns = get_table_columns(conn, spec["table"])
+                if not columns:
+                    continue
+                _ensure_archive_table(conn, ARCHIVE_SCHEMA, spec, columns)
+
+                column_sql = _quote_columns(columns)
+                condition = f"{spec['where']} AND strftime('%Y', {spec['date']}) = :year"
+                conn.execute(
+                    f"""INSERT OR REPLACE INTO {ARCHIVE_SCHEMA}."{spec['table']}" ({column_sql})
+                        SELECT {column_sql} FROM main."{spec['table']}" WHERE {condition}""",
+                    params
+                )
+                moved[spec["table"]] = conn.execute(
+                    f'DELETE FROM main."{spec["table"]}" WHERE {condition}',
+                    params
+                ).rowcount
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    finally:
+        conn.execute(f"DETACH DATABASE {ARCHIVE_SCHEMA}")
+
+    logging.info(f"Archived to {get_archive_path(year)}: {moved}")
+    return moved
+
+
+def archive_superseded_rows(conn: sqlite3.Connection, now: Optional[datetime] = None) -> Dict[int, Dict[str, int]]:
+    """
+    Archive everything that is past its cutoff, one year file at a time
+
+    Returns:
+        Rows moved per year and table
+    """
+    cutoffs = get_cutoffs(now)
+    years = sorted({year for per_year in get_archivable_counts(conn, cutoffs).values() for year in per_year})
+
+    results = {}
+    for year in years:
+        results[year] = archive_year(conn, year, cutoffs)
+
+    refresh_stats_after_bulk_load(conn, sum(sum(moved.values()) for moved in results.values()))
+    return results
+
+
+def attach_archives(conn: sqlite3.Connection, years: Optional[List[int]] = None) -> List[int]:
+    """
+    Attach archive files to a connection as arch_YYYY
+
+    Args:
+        conn: Database connection
+        years: Years to attach (defaults to all, newest first up to the
+            attach limit)
+
+    Returns:
+        Years that were attached
+    """
+    available = list_archive_years()
+    if years is None:
+        years = sorted(available, reverse=True)[:MAX_ATTACHED_ARCHIVES]
+        if len(available) > MAX_ATTACHED_ARCHIVES:
+            logging.warning(f"Only attaching the {MAX_ATTACHED_ARCHIVES} newest of {len(available)} archives")
+
+    attached_schemas = {row[1] for row in conn.execute("PRAGMA database_list").fetchall()}
+    attached = []
+    for year in years:
+        if year not in available:
+            continue
+        if f"arch_{year}" not in attached_schemas:
+            conn.execute(f"ATTACH DATABASE ? AS arch_{year}", (get_archive_path(year),))
+        attached.append(year)
+    return sorted(attached)
+
+
+def create_history_views(conn: sqlite3.Connection, years: List[int]):
+    """
+    Create TEMP views <table>_history = hot rows UNION ALL archived rows
+
+    Columns missing from older archive files come back as NULL.
+    """
+    for spec in ARCHIVE_TABLES:
+        table = spec["table"]
+        columns = get_table_columns(conn, table)
+        if not columns:
+            continue
+
+        selects = [f'SELECT {_quote_columns(columns)} FROM main."{table}"']
+        for year in years:
+            archived = {row[1] for row in conn.execute(f'PRAGMA arch_{year}.table_info("{table}")').fetchall()}
+            if not archived:
+                continue
+            column_sql = ", ".join(f'"{c}"' if c in archived else f'NULL AS "{c}"' for c in columns)
+            selects.append(f'SELECT {column_sql} FROM arch_{year}."{table}"')
+
+        conn.execute(f'DROP VIEW IF EXISTS temp."{table}_history"')
+        conn.execute(f'CREATE TEMP VIEW "{table}_history" AS ' + " UNION ALL ".join(selects))
+
+
+def get_history_connection(test_mode: bool = False, years: Optional[List[int]] = None) -> sqlite3.Connection:
+    """
+    Open a connection for historical queries: archives attached and
+    payments_history, contracts_history, contacts_history, clients_history,
+    payment_files_history and processing_log_history available
+    """
+    conn = get_db_connection(test_mode=test_mode)
+    create_history_views(conn, attach_archives(conn, years))
+    return conn
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive superseded rows into per-year cold databases")
+    parser.add_argument("--test", action="store_true", help="Use the test database")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be archived")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    conn = get_db_connection(test_mode=args.test)
+    try:
+        if args.dry_run:
+            for table, per_year in get_archivable_counts(conn, get_cutoffs()).items():
+                print(f"{table}: {per_year or 'nothing to archive'}")
+            return 0
+
+        results = archive_superseded_rows(conn)
+        for year, moved in results.items():
+            print(f"{year}: {moved}")
+        if not results:
+            print("Nothing to archive")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
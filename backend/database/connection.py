@@ -7,6 +7,7 @@ from datetime import datetime
 import shutil
 
 from config import settings
+from .query_monitor import MonitoredConnection
 
 def get_db_connection(test_mode=False):
     """
@@ -16,12 +17,13 @@ def get_db_connection(test_mode=False):
         test_mode (bool): If True, connects to the test database
         
     Returns:
-        sqlite3.Connection: Database connection with Row factory enabled
+        sqlite3.Connection: Database connection with Row factory enabled and
+            slow-query monitoring (see database.query_monitor)
     """
     if test_mode:
         path = settings.get_test_db_path()
         if os.path.exists(path):
-            conn = sqlite3.connect(path)
+            conn = sqlite3.connect(path, factory=MonitoredConnection)
             conn.row_factory = sqlite3.Row
             return conn
         else:
@@ -34,7 +36,7 @@ def get_db_connection(test_mode=False):
     for path in paths:
         try:
             if os.path.exists(path):
-                conn = sqlite3.connect(path)
+                conn = sqlite3.connect(path, factory=MonitoredConnection)
                 conn.row_factory = sqlite3.Row
                 logging.info(f"Connected to database at {path}")
                 return conn
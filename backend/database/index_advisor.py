@@ -0,0 +1,248 @@
+# backend/database/index_advisor.py
+#
+# Replays the application workload against an in-memory copy of the
+# database, measures each candidate index and recommends the ones that pay
+# off. With --apply the managed index pack is applied to the real database
+# as a migration and the measured speedups are stored in index_benchmarks.
+#
+#   python -m database.index_advisor [--test] [--apply]
+import sys
+import time
+import logging
+import argparse
+import sqlite3
+from typing import Dict, List, Tuple
+
+from database import get_db_connection
+from database.index_pack import INDEX_PACK, IndexSpec, can_create
+from database.maintenance import optimize_database
+from database.migrations import apply_migrations
+from database.query_monitor import explain_query_plan, summarize_plan
+from database.workload import get_workload
+
+# Candidates evaluated next to the pack. Rejected ones stay here so the
+# report keeps showing why they are not in the pack.
+EXTRA_CANDIDATES: List[IndexSpec] = [
+    # Both contract indexes make the planner drive v_client_sidebar and
+    # v_client_details from contracts, which is 10-25x slower
+    IndexSpec("idx_contracts_client_active", "contracts", ("client_id", "is_active"), "valid_to IS NULL"),
+    IndexSpec("idx_contracts_client_valid_active", "contracts", ("client_id", "valid_to", "is_active")),
+    IndexSpec("idx_contacts_client_type_valid", "contacts", ("client_id", "contact_type", "valid_to")),
+    # Overlaps idx_payments_client_date; no consistent gain
+    IndexSpec("idx_payments_active_client_date", "payments", ("client_id", "received_date"), "valid_to IS NULL"),
+    # The applied-period columns are only read through expressions
+    # (year * 100 + month), so these are never picked up
+    IndexSpec(
+        "idx_payments_active_month_period", "payments",
+        ("client_id", "applied_start_month_year", "applied_start_month"),
+        "valid_to IS NULL AND applied_start_month IS NOT NULL"
+    ),
+    IndexSpec(
+        "idx_payments_active_quarter_period", "payments",
+        ("client_id", "applied_start_quarter_year", "applied_start_quarter"),
+        "valid_to IS NULL AND applied_start_quarter IS NOT NULL"
+    ),
+]
+
+# An index must save at least this share of a query's time to count
+MIN_GAIN = 0.05
+
+# A query that gets this much slower (and by more than MIN_REGRESSION_MS)
+# disqualifies the index
+MAX_REGRESSION = 0.5
+MIN_REGRESSION_MS = 1.0
+
+
+def copy_to_memory(conn: sqlite3.Connection) -> sqlite3.Connection:
+    """Copy a database into memory so candidate indexes never touch the real file"""
+    scratch = sqlite3.connect(":memory:")
+    conn.backup(scratch)
+    return scratch
+
+
+def time_workload(conn: sqlite3.Connection, workload: List[Tuple[str, str, tuple]], repeat: int = 3) -> Dict[str, float]:
+    """
+    Run the workload and return the time per query name in milliseconds
+    (best of ``repeat`` runs for each parameter set, summed per name)
+    """
+    timings = {}
+    for name, sql, params in workload:
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            conn.execute(sql, params).fetchall()
+            elapsed = (time.perf_counter() - started) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        timings[name] = timings.get(name, 0.0) + best
+    return timings
+
+
+def uses_index(conn: sqlite3.Connection, workload: List[Tuple[str, str, tuple]], index_name: str) -> List[str]:
+    """Return the query names whose plan picks up the given index"""
+    names = []
+    for name, sql, params in workload:
+        if name in names:
+            continue
+        if any(index_name in line for line in explain_query_plan(conn, sql, params)):
+            names.append(name)
+    return names
+
+
+def get_full_scans(conn: sqlite3.Connection, sql: str, params: tuple) -> List[str]:
+    """Return the full table scans in a query's plan"""
+    return summarize_plan(explain_query_plan(conn, sql, params))["full_scans"]
+
+
+def evaluate_candidates(conn: sqlite3.Connection, candidates: List[IndexSpec], repeat: int = 3) -> Dict:
+    """
+    Measure each candidate index on its own, starting from a copy without
+    any of the candidates
+
+    Returns:
+        Dict with the workload baseline and one result per candidate
+    """
+    scratch = copy_to_memory(conn)
+    try:
+        for spec in candidates:
+            scratch.execute(spec.drop_sql())
+        scratch.execute("ANALYZE")
+
+        workload = get_workload(scratch)
+        baseline = time_workload(scratch, workload, repeat)
+
+        results = []
+        for spec in candidates:
+            if not can_create(scratch, spec):
+                results.append({"index": spec, "skipped": True})
+                continue
+
+            scratch.execute(spec.create_sql())
+            scratch.execute("ANALYZE")
+            used_by = uses_index(scratch, workload, spec.name)
+            affected = [w for w in workload if w[0] in used_by]
+            timings = time_workload(scratch, affected, repeat)
+            scans_after = {name: get_full_scans(scratch, sql, params) for name, sql, params in affected}
+
+            # Re-measure the same queries without the index right away so
+            # both sides see the same machine conditions
+            scratch.execute(spec.drop_sql())
+            scratch.execute("ANALYZE")
+            before = time_workload(scratch, affected, repeat)
+            scans_before = {name: get_full_scans(scratch, sql, params) for name, sql, params in affected}
+
+            speedups = {
+                name: {"before_ms": round(before[name], 3), "after_ms": round(after, 3)}
+                for name, after in timings.items()
+            }
+            saved = sum(before[name] - after for name, after in timings.items())
+            faster = [
+                name for name, after in timings.items()
+                if before[name] > 0 and (before[name] - after) / before[name] >= MIN_GAIN
+            ]
+            regressed = [
+                name for name, after in timings.items()
+                if after - before[name] > max(MIN_REGRESSION_MS, before[name] * MAX_REGRESSION)
+            ]
+            # On small tables timings are noise; a removed full scan still
+            # counts because it grows with the table
+            removes_scan = [
+                name for name in used_by
+                if len(scans_after[name]) < len(scans_before[name])
+            ]
+            results.append({
+                "index": spec,
+                "skipped": False,
+                "used_by": used_by,
+                "speedups": speedups,
+                "saved_ms": round(saved, 3),
+                "regressed": regressed,
+                "removes_scan": removes_scan,
+                "recommended": bool(faster or removes_scan) and not regressed and saved >= 0
+            })
+
+        return {"baseline": baseline, "results": results}
+    finally:
+        scratch.close()
+
+
+def measure_pack(conn: sqlite3.Connection, specs: List[IndexSpec], repeat: int = 3) -> List[Tuple[str, str, float, float]]:
+    """
+    Measure the whole pack together on a scratch copy
+
+    Returns:
+        List of (index_name, query_name, before_ms, after_ms) for every query
+        that uses one of the indexes
+    """
+    scratch = copy_to_memory(conn)
+    try:
+        for spec in specs:
+            scratch.execute(spec.drop_sql())
+        scratch.execute("ANALYZE")
+        workload = get_workload(scratch)
+        before = time_workload(scratch, workload, repeat)
+
+        specs = [spec for spec in specs if can_create(scratch, spec)]
+        for spec in specs:
+            scratch.execute(spec.create_sql())
+        scratch.execute("ANALYZE")
+        after = time_workload(scratch, workload, repeat)
+
+        rows = []
+        for spec in specs:
+            for name in uses_index(scratch, workload, spec.name):
+                rows.append((spec.name, name, round(before[name], 3), round(after[name], 3)))
+        return rows
+    finally:
+        scratch.close()
+
+
+def print_report(evaluation: Dict):
+    """Print the advisor results, best candidates first"""
+    results = sorted(evaluation["results"], key=lambda r: r.get("saved_ms", 0), reverse=True)
+    print(f"Baseline workload: {sum(evaluation['baseline'].values()):.1f} ms over {len(evaluation['baseline'])} queries")
+    print()
+    for result in results:
+        spec = result["index"]
+        if result["skipped"]:
+            print(f"  SKIP  {spec.name}: {spec.table} or its columns do not exist")
+            continue
+        marker = "  ADD " if result["recommended"] else "  --  "
+        print(f"{marker} {spec.create_sql()}")
+        print(f"        saves {result['saved_ms']:.1f} ms, used by {', '.join(result['used_by']) or 'nothing'}")
+        if result["removes_scan"]:
+            print(f"        removes a full scan from {', '.join(result['removes_scan'])}")
+        if result["regressed"]:
+            print(f"        slows down {', '.join(result['regressed'])}")
+        for name, speedup in result["speedups"].items():
+            print(f"          {name}: {speedup['before_ms']:.2f} -> {speedup['after_ms']:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recommend and apply indexes for the application workload")
+    parser.add_argument("--test", action="store_true", help="Use the test database")
+    parser.add_argument("--apply", action="store_true", help="Apply pending migrations (including the index pack) and record speedups")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per query when timing")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    conn = get_db_connection(test_mode=args.test)
+    try:
+        print_report(evaluate_candidates(conn, INDEX_PACK + EXTRA_CANDIDATES, args.repeat))
+
+        if args.apply:
+            speedups = measure_pack(conn, INDEX_PACK, args.repeat)
+            applied = apply_migrations(conn)
+            optimize_database(conn, full_analyze=True)
+            with conn:
+                conn.executemany(
+                    "INSERT INTO index_benchmarks(index_name, query_name, before_ms, after_ms) VALUES (?, ?, ?, ?)",
+                    speedups
+                )
+            print()
+            print(f"Applied migrations: {applied or 'none pending'}; recorded {len(speedups)} measurements")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
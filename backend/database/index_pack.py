@@ -0,0 +1,74 @@
+# backend/database/index_pack.py
+import logging
+import sqlite3
+from typing import List, NamedTuple, Optional, Tuple
+
+
+class IndexSpec(NamedTuple):
+    """An index managed by the application (created and dropped by name)"""
+    name: str
+    table: str
+    columns: Tuple[str, ...]
+    where: Optional[str] = None
+
+    def create_sql(self) -> str:
+        sql = f"CREATE INDEX IF NOT EXISTS {self.name} ON {self.table}({', '.join(self.columns)})"
+        if self.where:
+            sql += f" WHERE {self.where}"
+        return sql
+
+    def drop_sql(self) -> str:
+        return f"DROP INDEX IF EXISTS {self.name}"
+
+
+# Indexes chosen with the index advisor (python -m database.index_advisor).
+# Most views only look at current rows, so where possible the soft-delete
+# filter is made part of the index (partial index on valid_to IS NULL).
+# This is the advisor's working list; each migration keeps its own frozen
+# copy of the indexes it creates.
+INDEX_PACK: List[IndexSpec] = [
+    IndexSpec("idx_contacts_client_type", "contacts", ("client_id", "contact_type"), "valid_to IS NULL"),
+    IndexSpec("idx_clients_active_name", "clients", ("display_name",), "valid_to IS NULL"),
+    IndexSpec("idx_payment_files_file_id", "payment_files", ("file_id",)),
+    IndexSpec("idx_client_files_processed_upload", "client_files", ("is_processed", "upload_date")),
+    IndexSpec("idx_processing_log_file_id", "processing_log", ("file_id",)),
+    IndexSpec("idx_processing_log_status_date", "processing_log", ("status", "process_date")),
+    IndexSpec("idx_processing_log_process_date", "processing_log", ("process_date",)),
+]
+
+
+def get_table_columns(conn: sqlite3.Connection, table: str, include_generated: bool = False) -> List[str]:
+    """
+    Return the column names of a table (empty if the table does not exist)
+
+    Generated columns are left out unless include_generated is set: they
+    can be read and indexed but not inserted into.
+    """
+    if not include_generated:
+        return [row[1] for row in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+    # table_xinfo's hidden flag: 2 and 3 are generated columns, 1 hidden virtual table columns
+    return [row[1] for row in conn.execute(f"PRAGMA table_xinfo({table})").fetchall() if row[6] != 1]
+
+
+def can_create(conn: sqlite3.Connection, spec: IndexSpec) -> bool:
+    """Check that the table and all indexed columns exist in this database"""
+    columns = get_table_columns(conn, spec.table, include_generated=True)
+    return bool(columns) and all(column in columns for column in spec.columns)
+
+
+def create_indexes(conn: sqlite3.Connection, specs: List[IndexSpec]) -> List[str]:
+    """
+    Create the given indexes, skipping ones whose table or columns are
+    missing from this database
+
+    Returns:
+        Names of indexes that were created (or already existed)
+    """
+    created = []
+    for spec in specs:
+        if not can_create(conn, spec):
+            logging.warning(f"Skipping index {spec.name}: {spec.table} is missing or lacks {spec.columns}")
+            continue
+        conn.execute(spec.create_sql())
+        created.append(spec.name)
+    return created
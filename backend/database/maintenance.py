@@ -0,0 +1,77 @@
+# backend/database/maintenance.py
+import time
+import logging
+import sqlite3
+from typing import Optional
+
+from .connection import get_db_connection
+
+# A load that changes at least this many rows refreshes planner statistics
+BULK_LOAD_ROWS = 200
+
+
+def has_planner_stats(conn: sqlite3.Connection) -> bool:
+    """Check whether ANALYZE has ever been run on this database"""
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'"
+    ).fetchone() is not None
+
+
+def optimize_database(conn: sqlite3.Connection, full_analyze: bool = False) -> str:
+    """
+    Refresh the statistics the query planner uses to pick join orders
+
+    A full ANALYZE runs the first time (no sqlite_stat1 yet) or when asked
+    for; otherwise PRAGMA optimize only re-analyzes tables whose statistics
+    are stale.
+
+    Returns:
+        The statement that was run
+    """
+    statement = "ANALYZE" if full_analyze or not has_planner_stats(conn) else "PRAGMA optimize"
+    started = time.perf_counter()
+    conn.execute(statement)
+    conn.commit()
+    logging.info(f"{statement} completed in {(time.perf_counter() - started) * 1000:.0f} ms")
+    return statement
+
+
+def refresh_stats_after_bulk_load(conn: sqlite3.Connection, rows_changed: int, table: Optional[str] = None) -> bool:
+    """
+    Re-analyze after a bulk load so plans reflect the new row counts
+
+    Args:
+        conn: Database connection (no transaction may be open)
+        rows_changed: Number of rows inserted or updated by the load
+        table: Analyze just this table instead of running PRAGMA optimize
+
+    Returns:
+        True if statistics were refreshed
+    """
+    if rows_changed < BULK_LOAD_ROWS:
+        return False
+
+    try:
+        if table:
+            conn.execute(f"ANALYZE {table}")
+            conn.commit()
+        else:
+            optimize_database(conn)
+        return True
+    except sqlite3.Error as e:
+        logging.error(f"Failed to refresh planner statistics: {str(e)}")
+        return False
+
+
+def run_maintenance(test_mode: bool = False, full_analyze: bool = False) -> bool:
+    """Scheduled maintenance job: refresh planner statistics"""
+    try:
+        conn = get_db_connection(test_mode=test_mode)
+        try:
+            optimize_database(conn, full_analyze=full_analyze)
+        finally:
+            conn.close()
+        return True
+    except Exception as e:
+        logging.error(f"Database maintenance failed: {str(e)}")
+        return False
@@ -0,0 +1,162 @@
+# backend/database/migrations/__init__.py
+import time
+import logging
+import sqlite3
+from typing import Dict, List, Optional
+
+from database.connection import get_db_connection
+from . import m0001_reconcile_schema
+from . import m0002_index_pack
+from . import m0003_pattern_versions
+from . import m0004_name_versions
+from . import m0005_match_reviews
+from . import m0006_scan_manifest
+from . import m0007_processing_log_indexes
+from . import m0008_reclassify_runs
+from . import m0009_backfill
+from . import m0010_jobs
+from . import m0011_outbox
+from . import m0012_content_hash
+from . import m0013_blobs
+from . import m0014_document_mentions
+from . import m0015_document_text
+
+# Ordered list of migrations. Each module defines VERSION, DESCRIPTION and
+# upgrade(conn); versions must be strictly increasing. A migration runs in
+# a single transaction unless it sets TRANSACTIONAL = False, in which case
+# it manages its own (short) transactions and must be idempotent.
+MIGRATIONS = [
+    m0001_reconcile_schema,
+    m0002_index_pack,
+    m0003_pattern_versions,
+    m0004_name_versions,
+    m0005_match_reviews,
+    m0006_scan_manifest,
+    m0007_processing_log_indexes,
+    m0008_reclassify_runs,
+    m0009_backfill,
+    m0010_jobs,
+    m0011_outbox,
+    m0012_content_hash,
+    m0013_blobs,
+    m0014_document_mentions,
+    m0015_document_text,
+]
+
+# How long to wait for other connections before giving up on a lock
+BUSY_TIMEOUT_MS = 30000
+
+
+def ensure_schema_version_table(conn: sqlite3.Connection):
+    """Create the schema_version table if it does not exist"""
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS schema_version (
+               version INTEGER PRIMARY KEY,
+               description TEXT NOT NULL,
+               applied_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+               duration_ms REAL
+           )"""
+    )
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Return the highest applied migration version (0 if none)"""
+    ensure_schema_version_table(conn)
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def get_migration_status(conn: sqlite3.Connection) -> List[Dict]:
+    """Return every known migration with when it was applied (None if pending)"""
+    ensure_schema_version_table(conn)
+    applied = {
+        row[0]: row[1]
+        for row in conn.execute("SELECT version, applied_at FROM schema_version").fetchall()
+    }
+    return [
+        {
+            "version": migration.VERSION,
+            "description": migration.DESCRIPTION,
+            "applied_at": applied.get(migration.VERSION)
+        }
+        for migration in MIGRATIONS
+    ]
+
+
+def _check_order():
+    versions = [migration.VERSION for migration in MIGRATIONS]
+    if versions != sorted(set(versions)):
+        raise RuntimeError(f"Migration versions must be unique and increasing: {versions}")
+
+
+def _apply(conn: sqlite3.Connection, migration):
+    started = time.perf_counter()
+
+    if getattr(migration, "TRANSACTIONAL", True):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            migration.upgrade(conn)
+        except Exception:
+            conn.rollback()
+            raise
+    else:
+        migration.upgrade(conn)
+        conn.execute("BEGIN IMMEDIATE")
+
+    # The version row commits together with a transactional migration
+    conn.execute(
+        "INSERT INTO schema_version(version, description, duration_ms) VALUES (?, ?, ?)",
+        (migration.VERSION, migration.DESCRIPTION, (time.perf_counter() - started) * 1000)
+    )
+    conn.commit()
+
+
+def apply_migrations(conn: sqlite3.Connection, target: Optional[int] = None) -> List[int]:
+    """
+    Apply pending migrations in order
+
+    Args:
+        conn: Database connection (no transaction may be open)
+        target: Stop after this version (defaults to the latest)
+
+    Returns:
+        List of versions that were applied
+    """
+    _check_order()
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    current = get_schema_version(conn)
+    conn.commit()
+    applied = []
+
+    for migration in MIGRATIONS:
+        if migration.VERSION <= current:
+            continue
+        if target is not None and migration.VERSION > target:
+            break
+
+        try:
+            _apply(conn, migration)
+        except Exception:
+            logging.error(f"Migration {migration.VERSION} ({migration.DESCRIPTION}) failed")
+            raise
+
+        logging.info(f"Applied migration {migration.VERSION}: {migration.DESCRIPTION}")
+        applied.append(migration.VERSION)
+
+    return applied
+
+
+def run_migrations(test_mode: bool = False) -> bool:
+    """Startup hook: bring the database up to the latest schema version"""
+    try:
+        conn = get_db_connection(test_mode=test_mode)
+        try:
+            applied = apply_migrations(conn)
+        finally:
+            conn.close()
+        if applied:
+            logging.info(f"Database migrated to version {applied[-1]}")
+        return True
+    except Exception as e:
+        logging.error(f"Database migration failed: {str(e)}")
+        return False
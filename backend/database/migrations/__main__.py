@@ -0,0 +1,35 @@
+# backend/database/migrations/__main__.py
+#
+#   python -m database.migrations [--test] [--status] [--target N]
+import sys
+import logging
+import argparse
+
+from database import get_db_connection
+from database.migrations import apply_migrations, get_migration_status
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply schema migrations")
+    parser.add_argument("--test", action="store_true", help="Use the test database")
+    parser.add_argument("--status", action="store_true", help="Show applied and pending migrations without applying")
+    parser.add_argument("--target", type=int, help="Migrate up to this version only")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    conn = get_db_connection(test_mode=args.test)
+    try:
+        if not args.status:
+            applied = apply_migrations(conn, target=args.target)
+            print(f"Applied: {applied or 'nothing pending'}")
+
+        for migration in get_migration_status(conn):
+            state = migration["applied_at"] or "pending"
+            print(f"  {migration['version']:04d}  {migration['description']}  [{state}]")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+# backend/database/migrations/m0001_reconcile_schema.py
+#
+# The database files in data/ have drifted apart. Bring every copy up to
+# the tables and columns the application code relies on. Columns are only
+# ever added (nullable), never dropped or rewritten.
+from .operations import add_column_if_missing, table_exists
+
+VERSION = 1
+DESCRIPTION = "Reconcile drifted database files with data/schema.sql"
+
+# Document system tables missing from older database files
+TABLES = {
+    "providers": """
+        CREATE TABLE IF NOT EXISTS "providers" (
+            "provider_id" INTEGER PRIMARY KEY AUTOINCREMENT,
+            "provider_name" TEXT NOT NULL UNIQUE,
+            "name_variants" TEXT,
+            "valid_from" DATETIME DEFAULT CURRENT_TIMESTAMP,
+            "valid_to" DATETIME
+        )""",
+    "client_providers": """
+        CREATE TABLE IF NOT EXISTS client_providers (
+            client_id INTEGER NOT NULL,
+            provider_id INTEGER NOT NULL,
+            start_date TEXT,
+            end_date TEXT,
+            is_active INTEGER DEFAULT 1,
+            PRIMARY KEY (client_id, provider_id),
+            FOREIGN KEY (client_id) REFERENCES clients(client_id),
+            FOREIGN KEY (provider_id) REFERENCES providers(provider_id)
+        )""",
+    "date_format_patterns": """
+        CREATE TABLE IF NOT EXISTS date_format_patterns (
+            format_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            format_pattern TEXT NOT NULL,
+            format_description TEXT,
+            regex_pattern TEXT,
+            priority INTEGER DEFAULT 1
+        )""",
+    "document_patterns": """
+        CREATE TABLE IF NOT EXISTS document_patterns (
+            pattern_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            pattern_type TEXT NOT NULL,
+            pattern TEXT NOT NULL,
+            description TEXT,
+            priority INTEGER DEFAULT 1,
+            is_active INTEGER DEFAULT 1
+        )""",
+    "processing_log": """
+        CREATE TABLE IF NOT EXISTS processing_log (
+            log_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            file_name TEXT NOT NULL,
+            process_date DATETIME DEFAULT CURRENT_TIMESTAMP,
+            status TEXT NOT NULL,
+            details TEXT,
+            file_id INTEGER,
+            FOREIGN KEY (file_id) REFERENCES client_files(file_id)
+        )""",
+    "system_config": """
+        CREATE TABLE IF NOT EXISTS system_config (
+            config_key TEXT PRIMARY KEY,
+            config_value TEXT NOT NULL,
+            description TEXT,
+            last_updated DATETIME DEFAULT CURRENT_TIMESTAMP
+        )""",
+}
+
+# (table, column, definition) for columns the code reads but some files lack
+COLUMNS = [
+    # api/files.py and FileManager filter client_files by client
+    ("client_files", "client_id", "INTEGER REFERENCES clients(client_id)"),
+    # Document-system columns missing from the original client_files layout
+    ("client_files", "file_path", "TEXT"),
+    ("client_files", "original_filename", "TEXT"),
+    ("client_files", "upload_date", "DATETIME"),
+    ("client_files", "document_date", "TEXT"),
+    ("client_files", "provider_id", "INTEGER REFERENCES providers(provider_id)"),
+    ("client_files", "is_processed", "INTEGER DEFAULT 0"),
+    ("client_files", "metadata", "TEXT"),
+    ("clients", "name_variants", "TEXT"),
+    # DocumentProcessor.find_matching_payments filters contracts by provider
+    ("contracts", "provider_id", "INTEGER REFERENCES providers(provider_id)"),
+]
+
+
+def upgrade(conn):
+    for table, create_sql in TABLES.items():
+        if not table_exists(conn, table):
+            conn.execute(create_sql)
+
+    for table, column, definition in COLUMNS:
+        if table_exists(conn, table):
+            add_column_if_missing(conn, table, column, definition)
+
+    # Files linked to payments of exactly one client belong to that client
+    conn.execute(
+        """UPDATE client_files
+           SET client_id = (
+               SELECT MIN(p.client_id)
+               FROM payment_files pf
+               JOIN payments p ON pf.payment_id = p.payment_id
+               WHERE pf.file_id = client_files.file_id
+               HAVING COUNT(DISTINCT p.client_id) = 1
+           )
+           WHERE client_id IS NULL"""
+    )
+
+    # Contracts name their provider; resolve it to provider_id
+    conn.execute(
+        """UPDATE contracts
+           SET provider_id = (
+               SELECT pr.provider_id FROM providers pr
+               WHERE pr.provider_name = contracts.provider_name
+           )
+           WHERE provider_id IS NULL AND provider_name IS NOT NULL"""
+    )
@@ -0,0 +1,36 @@
+# backend/database/migrations/m0002_index_pack.py
+from database.index_pack import IndexSpec
+from .operations import create_indexes_online
+
+VERSION = 2
+DESCRIPTION = "Managed index pack for the v_* views and endpoint queries"
+
+# Each index is built in its own short transaction
+TRANSACTIONAL = False
+
+# The indexes as of this migration. Frozen here: later changes to the
+# managed lists in database.index_pack must not change what it does.
+INDEXES = [
+    IndexSpec("idx_contacts_client_type", "contacts", ("client_id", "contact_type"), "valid_to IS NULL"),
+    IndexSpec("idx_clients_active_name", "clients", ("display_name",), "valid_to IS NULL"),
+    IndexSpec("idx_payment_files_file_id", "payment_files", ("file_id",)),
+    IndexSpec("idx_client_files_processed_upload", "client_files", ("is_processed", "upload_date")),
+    IndexSpec("idx_processing_log_file_id", "processing_log", ("file_id",)),
+]
+
+
+def upgrade(conn):
+    # Speedups measured by the index advisor when the pack is applied
+    with conn:
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS index_benchmarks (
+                   benchmark_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                   measured_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                   index_name TEXT NOT NULL,
+                   query_name TEXT NOT NULL,
+                   before_ms REAL NOT NULL,
+                   after_ms REAL NOT NULL
+               )"""
+        )
+
+    create_indexes_online(conn, INDEXES)
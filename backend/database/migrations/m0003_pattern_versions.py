@@ -0,0 +1,9 @@
+# backend/database/migrations/m0003_pattern_versions.py
+from database.table_versions import create_version_triggers
+
+VERSION = 3
+DESCRIPTION = "Track changes to document_patterns for the pattern registry"
+
+
+def upgrade(conn):
+    create_version_triggers(conn, "document_patterns")
@@ -0,0 +1,10 @@
+# backend/database/migrations/m0004_name_versions.py
+from database.table_versions import create_version_triggers
+
+VERSION = 4
+DESCRIPTION = "Track changes to clients and providers for the name index"
+
+
+def upgrade(conn):
+    create_version_triggers(conn, "clients")
+    create_version_triggers(conn, "providers")
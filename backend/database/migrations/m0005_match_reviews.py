@@ -0,0 +1,26 @@
+# backend/database/migrations/m0005_match_reviews.py
+VERSION = 5
+DESCRIPTION = "Review queue for low-confidence client name matches"
+
+
+def upgrade(conn):
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS client_match_reviews (
+               review_id INTEGER PRIMARY KEY AUTOINCREMENT,
+               file_id INTEGER NOT NULL REFERENCES client_files(file_id),
+               extracted_name TEXT NOT NULL,
+               candidates TEXT,
+               status TEXT NOT NULL DEFAULT 'pending',
+               resolved_client_id INTEGER REFERENCES clients(client_id),
+               created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+               resolved_at DATETIME
+           )"""
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_client_match_reviews_status ON client_match_reviews(status)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_client_match_reviews_file_id ON client_match_reviews(file_id)")
+
+    conn.execute(
+        """INSERT OR IGNORE INTO system_config(config_key, config_value, description)
+           VALUES ('client_match_threshold', '0.75',
+                   'Minimum name match score (0-1) for linking a document to a client without review')"""
+    )
@@ -0,0 +1,60 @@
+# backend/database/migrations/m0006_scan_manifest.py
+VERSION = 6
+DESCRIPTION = "Scan manifest for incremental mail dump scans"
+
+
+def upgrade(conn):
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS scan_manifest (
+               file_path TEXT PRIMARY KEY,
+               folder TEXT NOT NULL,
+               size INTEGER NOT NULL,
+               mtime_ns INTEGER NOT NULL,
+               scanned_at DATETIME DEFAULT CURRENT_TIMESTAMP
+           )"""
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_scan_manifest_folder ON scan_manifest(folder)")
+
+    # The scan's set difference probes client_files by path, and scans
+    # running side by side (watcher, hourly scan, jobs) rely on the index
+    # being unique to record each file once
+    _merge_duplicate_paths(conn)
+    conn.execute("DROP INDEX IF EXISTS idx_client_files_file_path")
+    conn.execute("CREATE UNIQUE INDEX idx_client_files_file_path ON client_files(file_path)")
+
+
+def _merge_duplicate_paths(conn):
+    # Older files hold one client_files row per linked payment for the same
+    # document; the first row is kept and takes over the others' links
+    conn.execute(
+        """CREATE TEMP TABLE duplicate_files AS
+           SELECT file_id, keep_id FROM (
+               SELECT file_id, MIN(file_id) OVER (PARTITION BY file_path) AS keep_id
+               FROM client_files WHERE file_path IS NOT NULL
+           ) WHERE file_id != keep_id"""
+    )
+    if conn.execute("SELECT COUNT(*) FROM temp.duplicate_files").fetchone()[0]:
+        # The kept row belongs to a client only if every copy agreed
+        conn.execute(
+            """UPDATE client_files
+               SET client_id = (SELECT CASE WHEN COUNT(DISTINCT cf.client_id) = 1 AND COUNT(*) = COUNT(cf.client_id)
+                                            THEN MIN(cf.client_id) END
+                                FROM client_files cf WHERE cf.file_path = client_files.file_path),
+                   is_processed = (SELECT MAX(COALESCE(cf.is_processed, 0))
+                                   FROM client_files cf WHERE cf.file_path = client_files.file_path)
+               WHERE file_id IN (SELECT keep_id FROM temp.duplicate_files)"""
+        )
+        repoint = "(SELECT d.keep_id FROM temp.duplicate_files d WHERE d.file_id = {table}.file_id)"
+        # A payment already linked to the kept row keeps that link
+        conn.execute(
+            f"""UPDATE OR IGNORE payment_files SET file_id = {repoint.format(table="payment_files")}
+                WHERE file_id IN (SELECT file_id FROM temp.duplicate_files)"""
+        )
+        conn.execute("DELETE FROM payment_files WHERE file_id IN (SELECT file_id FROM temp.duplicate_files)")
+        for table in ("processing_log", "client_match_reviews"):
+            conn.execute(
+                f"""UPDATE {table} SET file_id = {repoint.format(table=table)}
+                    WHERE file_id IN (SELECT file_id FROM temp.duplicate_files)"""
+            )
+        conn.execute("DELETE FROM client_files WHERE file_id IN (SELECT file_id FROM temp.duplicate_files)")
+    conn.execute("DROP TABLE temp.duplicate_files")
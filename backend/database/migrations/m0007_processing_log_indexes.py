@@ -0,0 +1,21 @@
+# backend/database/migrations/m0007_processing_log_indexes.py
+from database.index_pack import IndexSpec
+from .operations import create_indexes_online
+
+VERSION = 7
+DESCRIPTION = "Indexes for processing history by status, date and file"
+
+# Each index is built in its own short transaction
+TRANSACTIONAL = False
+
+# The indexes as of this migration. Frozen here: later changes to the
+# managed lists in database.index_pack must not change what it does.
+INDEXES = [
+    IndexSpec("idx_processing_log_file_id", "processing_log", ("file_id",)),
+    IndexSpec("idx_processing_log_status_date", "processing_log", ("status", "process_date")),
+    IndexSpec("idx_processing_log_process_date", "processing_log", ("process_date",)),
+]
+
+
+def upgrade(conn):
+    create_indexes_online(conn, INDEXES)
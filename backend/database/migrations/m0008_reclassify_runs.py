@@ -0,0 +1,28 @@
+# backend/database/migrations/m0008_reclassify_runs.py
+from .operations import add_column_if_missing
+
+VERSION = 8
+DESCRIPTION = "Checkpoints for reclassifying documents after pattern changes"
+
+
+def upgrade(conn):
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS reclassify_runs (
+               run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+               pattern_version INTEGER NOT NULL,
+               status TEXT NOT NULL DEFAULT 'running',
+               last_file_id INTEGER NOT NULL DEFAULT 0,
+               examined INTEGER NOT NULL DEFAULT 0,
+               changed INTEGER NOT NULL DEFAULT 0,
+               unlinked INTEGER NOT NULL DEFAULT 0,
+               added INTEGER NOT NULL DEFAULT 0,
+               error TEXT,
+               started_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+               finished_at DATETIME
+           )"""
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_reclassify_runs_status ON reclassify_runs(status)")
+
+    # Reclassifying only redoes the links the matcher made; links made by
+    # hand (or given at upload) keep the default and are never removed
+    add_column_if_missing(conn, "payment_files", "auto_linked", "INTEGER NOT NULL DEFAULT 0")
@@ -0,0 +1,25 @@
+# backend/database/migrations/m0009_backfill.py
+VERSION = 9
+DESCRIPTION = "Per-folder checkpoints for backfill jobs"
+
+
+def upgrade(conn):
+    # Backfills run as "backfill" jobs on the job queue (jobs, m0010); each
+    # job keeps one checkpoint row per mail dump folder
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS backfill_folders (
+               job_id INTEGER NOT NULL REFERENCES jobs(job_id),
+               year INTEGER NOT NULL,
+               folder TEXT NOT NULL,
+               status TEXT NOT NULL DEFAULT 'pending',
+               total_files INTEGER,
+               done_files INTEGER NOT NULL DEFAULT 0,
+               processed INTEGER NOT NULL DEFAULT 0,
+               errors INTEGER NOT NULL DEFAULT 0,
+               last_path TEXT,
+               error TEXT,
+               started_at DATETIME,
+               updated_at DATETIME,
+               PRIMARY KEY (job_id, year)
+           )"""
+    )
@@ -0,0 +1,31 @@
+# backend/database/migrations/m0010_jobs.py
+VERSION = 10
+DESCRIPTION = "Persistent background job queue"
+
+
+def upgrade(conn):
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS jobs (
+               job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+               job_type TEXT NOT NULL,
+               params TEXT NOT NULL DEFAULT '{}',
+               dedupe_key TEXT,
+               status TEXT NOT NULL DEFAULT 'queued',
+               progress_done INTEGER NOT NULL DEFAULT 0,
+               progress_total INTEGER,
+               progress_detail TEXT,
+               result TEXT,
+               error TEXT,
+               cancel_requested INTEGER NOT NULL DEFAULT 0,
+               attempts INTEGER NOT NULL DEFAULT 0,
+               created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+               started_at DATETIME,
+               finished_at DATETIME
+           )"""
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, job_id)")
+    # At most one queued or running job per dedupe key
+    conn.execute(
+        """CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_active_dedupe
+           ON jobs(dedupe_key) WHERE status IN ('queued', 'running')"""
+    )
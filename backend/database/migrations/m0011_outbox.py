@@ -0,0 +1,22 @@
+# backend/database/migrations/m0011_outbox.py
+VERSION = 11
+DESCRIPTION = "Outbox for filesystem side effects of uploads"
+
+
+def upgrade(conn):
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS fs_outbox (
+               outbox_id INTEGER PRIMARY KEY AUTOINCREMENT,
+               action TEXT NOT NULL,
+               target_path TEXT NOT NULL,
+               link_path TEXT NOT NULL,
+               file_id INTEGER,
+               status TEXT NOT NULL DEFAULT 'pending',
+               attempts INTEGER NOT NULL DEFAULT 0,
+               last_error TEXT,
+               next_attempt_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+               created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+               done_at DATETIME
+           )"""
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_fs_outbox_due ON fs_outbox(status, next_attempt_at)")
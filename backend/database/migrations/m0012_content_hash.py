@@ -0,0 +1,22 @@
+# backend/database/migrations/m0012_content_hash.py
+from database.index_pack import IndexSpec
+from .operations import add_column_if_missing, create_indexes_online
+
+VERSION = 12
+DESCRIPTION = "Content hash and size of uploaded documents"
+
+# The index is built in its own short transaction
+TRANSACTIONAL = False
+
+# The indexes as of this migration. Frozen here: later changes to the
+# managed lists in database.index_pack must not change what it does.
+INDEXES = [
+    IndexSpec("idx_client_files_content_hash", "client_files", ("content_hash",), "content_hash IS NOT NULL"),
+]
+
+
+def upgrade(conn):
+    with conn:
+        add_column_if_missing(conn, "client_files", "content_hash", "TEXT")
+        add_column_if_missing(conn, "client_files", "file_size", "INTEGER")
+    create_indexes_online(conn, INDEXES)
@@ -0,0 +1,14 @@
+# backend/database/migrations/m0013_blobs.py
+VERSION = 13
+DESCRIPTION = "Content-addressed blob store"
+
+
+def upgrade(conn):
+    # client_files.content_hash points at these
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS blobs (
+               content_hash TEXT PRIMARY KEY,
+               size INTEGER NOT NULL,
+               created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+           )"""
+    )
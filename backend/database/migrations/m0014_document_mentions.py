@@ -0,0 +1,103 @@
+# backend/database/migrations/m0014_document_mentions.py
+#
+# client_files.metadata holds what the processor extracted from a document
+# as JSON. The provider name and pattern version become generated columns
+# (computed by SQLite's JSON functions, so they can be indexed), and the
+# extracted client names move into document_client_mentions, one row per
+# name with the client it matched and how, so documents can be found by
+# client or by match status without parsing every row.
+import json
+
+from database.index_pack import IndexSpec
+from .operations import add_column_if_missing, create_indexes_online
+
+VERSION = 14
+DESCRIPTION = "Generated metadata columns and document client mentions"
+
+# The listing indexes are built in their own short transactions
+TRANSACTIONAL = False
+
+# The indexes as of this migration. Frozen here: later changes to the
+# managed lists in database.index_pack must not change what it does.
+INDEXES = [
+    IndexSpec("idx_client_files_document_date", "client_files", ("document_date", "file_id")),
+    IndexSpec("idx_client_files_client_date", "client_files", ("client_id", "document_date", "file_id")),
+    IndexSpec("idx_client_files_provider_date", "client_files", ("provider_id", "document_date", "file_id")),
+    IndexSpec("idx_client_files_extracted_provider", "client_files", ("extracted_provider", "document_date"),
+              "extracted_provider IS NOT NULL"),
+]
+
+# Malformed metadata reads as NULL instead of failing every query on the row
+GENERATED_COLUMNS = [
+    ("extracted_provider",
+     "TEXT GENERATED ALWAYS AS (CASE WHEN json_valid(metadata) THEN json_extract(metadata, '$.extracted_provider') END) VIRTUAL"),
+    ("pattern_version",
+     "INTEGER GENERATED ALWAYS AS (CASE WHEN json_valid(metadata) THEN json_extract(metadata, '$.pattern_version') END) VIRTUAL"),
+]
+
+
+def _backfill_mentions(conn):
+    """
+    Mentions for documents processed before the table existed. Names with a
+    review take its outcome. The rest were linked in the order they were
+    extracted when every one of them matched; otherwise which name matched
+    which client was not recorded, and they are left without a client.
+    """
+    rows = conn.execute(
+        """SELECT file_id, metadata FROM client_files
+           WHERE json_valid(metadata) AND json_extract(metadata, '$.extracted_clients') IS NOT NULL
+             AND NOT EXISTS (SELECT 1 FROM document_client_mentions m WHERE m.file_id = client_files.file_id)"""
+    ).fetchall()
+    reviews = {}
+    for review in conn.execute(
+        "SELECT file_id, extracted_name, status, resolved_client_id FROM client_match_reviews ORDER BY review_id"
+    ).fetchall():
+        reviews[(review[0], review[1])] = (review[2], review[3])
+
+    mentions = []
+    for file_id, metadata in rows:
+        metadata = json.loads(metadata)
+        names = list(dict.fromkeys(metadata.get("extracted_clients") or []))
+        client_ids = list(metadata.get("client_ids") or [])
+        unreviewed = [name for name in names if (file_id, name) not in reviews]
+        paired = dict(zip(unreviewed, client_ids)) if len(unreviewed) == len(client_ids) else {}
+        for name in names:
+            if (file_id, name) in reviews:
+                status, client_id = reviews[(file_id, name)]
+                status = {"linked": "matched", "pending": "review"}.get(status, status)
+            else:
+                client_id = paired.get(name)
+                status = "matched" if client_id else "unmatched"
+            mentions.append((file_id, name, client_id, status))
+
+    conn.executemany(
+        "INSERT OR IGNORE INTO document_client_mentions(file_id, extracted_name, client_id, match_status) "
+        "VALUES (?, ?, ?, ?)",
+        mentions
+    )
+
+
+def upgrade(conn):
+    with conn:
+        for column, definition in GENERATED_COLUMNS:
+            add_column_if_missing(conn, "client_files", column, definition)
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS document_client_mentions (
+                   mention_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                   file_id INTEGER NOT NULL REFERENCES client_files(file_id),
+                   extracted_name TEXT NOT NULL,
+                   client_id INTEGER REFERENCES clients(client_id),
+                   match_status TEXT NOT NULL,
+                   UNIQUE (file_id, extracted_name)
+               )"""
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_document_client_mentions_client "
+            "ON document_client_mentions(client_id, file_id) WHERE client_id IS NOT NULL"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_document_client_mentions_status "
+            "ON document_client_mentions(match_status, file_id)"
+        )
+        _backfill_mentions(conn)
+    create_indexes_online(conn, INDEXES)
@@ -0,0 +1,17 @@
+# backend/database/migrations/m0015_document_text.py
+VERSION = 15
+DESCRIPTION = "Extracted document text cached by content hash"
+
+
+def upgrade(conn):
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS document_text (
+               content_hash TEXT PRIMARY KEY,
+               extractor TEXT NOT NULL,
+               status TEXT NOT NULL,
+               text TEXT,
+               error TEXT,
+               duration_ms REAL,
+               extracted_at DATETIME DEFAULT CURRENT_TIMESTAMP
+           )"""
+    )
@@ -0,0 +1,112 @@
+# backend/database/migrations/operations.py
+#
+# Building blocks for migrations. All operations are idempotent so a
+# migration interrupted halfway can simply be run again.
+import time
+import logging
+import sqlite3
+from typing import List
+
+from database.index_pack import IndexSpec, can_create, get_table_columns
+
+# Page cache used while building an index. Large enough that the build
+# does not spill to disk, so the exclusive lock is only taken at commit.
+ONLINE_INDEX_CACHE_KB = 128 * 1024
+
+
+def table_exists(conn: sqlite3.Connection, table: str) -> bool:
+    """Check whether a table exists"""
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+        (table,)
+    ).fetchone() is not None
+
+
+def index_exists(conn: sqlite3.Connection, name: str) -> bool:
+    """Check whether an index exists"""
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?",
+        (name,)
+    ).fetchone() is not None
+
+
+def add_column_if_missing(conn: sqlite3.Connection, table: str, column: str, definition: str) -> bool:
+    """
+    Add a column unless the table already has it
+
+    Returns:
+        True if the column was added
+    """
+    if column in get_table_columns(conn, table, include_generated=True):
+        return False
+    conn.execute(f'ALTER TABLE {table} ADD COLUMN "{column}" {definition}')
+    logging.info(f"Added column {table}.{column}")
+    return True
+
+
+def create_index_online(conn: sqlite3.Connection, spec: IndexSpec, retries: int = 5) -> bool:
+    """
+    Build an index in its own short write transaction, outside any
+    migration transaction
+
+    SQLite holds a RESERVED lock while the index is built and readers keep
+    going; only the commit needs the exclusive lock. Raising the page cache
+    for the build keeps SQLite from spilling (and locking out readers)
+    early. A busy database is retried with backoff instead of failing.
+
+    Returns:
+        True if the index exists afterwards
+    """
+    if index_exists(conn, spec.name):
+        return True
+    if not can_create(conn, spec):
+        logging.warning(f"Skipping index {spec.name}: {spec.table} is missing or lacks {spec.columns}")
+        return False
+
+    previous_cache = conn.execute("PRAGMA cache_size").fetchone()[0]
+    conn.execute(f"PRAGMA cache_size = -{ONLINE_INDEX_CACHE_KB}")
+    try:
+        for attempt in range(retries):
+            try:
+                started = time.perf_counter()
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute(spec.create_sql())
+                conn.commit()
+                logging.info(f"Built index {spec.name} in {(time.perf_counter() - started) * 1000:.0f} ms")
+                return True
+            except sqlite3.OperationalError as e:
+                if conn.in_transaction:
+                    conn.rollback()
+                if "locked" not in str(e) and "busy" not in str(e):
+                    raise
+                logging.warning(f"Database busy building {spec.name}, retrying ({attempt + 1}/{retries})")
+                time.sleep(0.5 * 2 ** attempt)
+        raise sqlite3.OperationalError(f"Could not build index {spec.name}: database stayed busy")
+    finally:
+        conn.execute(f"PRAGMA cache_size = {previous_cache}")
+
+
+def create_indexes_online(conn: sqlite3.Connection, specs: List[IndexSpec]) -> List[str]:
+    """Build several indexes one at a time; returns the names that exist afterwards"""
+    return [spec.name for spec in specs if create_index_online(conn, spec)]
+
+
+def run_in_batches(conn: sqlite3.Connection, sql: str, batch_size: int = 1000) -> int:
+    """
+    Run an UPDATE/DELETE/INSERT ... SELECT repeatedly, committing between
+    batches so other writers can get in
+
+    The statement must take the batch size as its only parameter (e.g.
+    ``... WHERE rowid IN (SELECT rowid FROM t WHERE ... LIMIT ?)``) and
+    must stop matching rows once they are processed.
+
+    Returns:
+        Total number of rows changed
+    """
+    total = 0
+    while True:
+        with conn:
+            changed = conn.execute(sql, (batch_size,)).rowcount
+        total += changed
+        if changed < batch_size:
+            return total
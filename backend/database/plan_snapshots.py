@@ -0,0 +1,125 @@
+# backend/database/plan_snapshots.py
+#
+# Records EXPLAIN QUERY PLAN for every v_* view and endpoint query and
+# compares it with the snapshot stored in the repo. A query whose plan
+# gains a full table scan counts as a regression. Plans are taken on a
+# migrated temporary copy of the database, so they reflect the schema and
+# indexes the application runs with, and only the deduplicated summary of
+# each plan (its full scans and temp B-trees) is stored.
+#
+#   python -m database.plan_snapshots [--test] [--update]
+import os
+import sys
+import json
+import argparse
+import sqlite3
+import tempfile
+from typing import Dict, List
+
+from database import get_db_connection
+from database.migrations import apply_migrations
+from database.query_monitor import explain_query_plan, summarize_plan
+from database.workload import get_workload
+
+SNAPSHOT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "query_plans.json")
+
+
+def migrated_copy(source_path: str, dest_path: str) -> sqlite3.Connection:
+    """
+    Copy a database and bring the copy up to the latest schema version
+
+    Returns:
+        Connection to the migrated copy (the source is left untouched)
+    """
+    source = sqlite3.connect(source_path)
+    conn = sqlite3.connect(dest_path)
+    try:
+        source.backup(conn)
+    finally:
+        source.close()
+    conn.row_factory = sqlite3.Row
+    apply_migrations(conn)
+    return conn
+
+
+def capture_plans(conn: sqlite3.Connection) -> Dict[str, List[str]]:
+    """Return the current plan for each workload query, keyed by query name"""
+    plans = {}
+    for name, sql, params in get_workload(conn, samples=1):
+        if name not in plans:
+            plans[name] = explain_query_plan(conn, sql, params)
+    return plans
+
+
+def summarize_plans(plans: Dict[str, List[str]]) -> Dict[str, Dict[str, List[str]]]:
+    """Reduce each plan to its distinct full scans and temp B-trees, as stored in the snapshot"""
+    return {
+        name: {key: sorted(set(lines)) for key, lines in summarize_plan(plan).items()}
+        for name, plan in plans.items()
+    }
+
+
+def load_snapshot(path: str = SNAPSHOT_PATH) -> Dict[str, Dict[str, List[str]]]:
+    """Load the stored plans (empty if no snapshot has been taken)"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_snapshot(plans: Dict[str, List[str]], path: str = SNAPSHOT_PATH):
+    """Write the summary of plans to the snapshot file"""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(summarize_plans(plans), f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def find_regressions(snapshot: Dict[str, Dict[str, List[str]]], current: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    """
+    Compare plans with the snapshot
+
+    Returns:
+        For each regressed query, the full scans that were not in the snapshot
+    """
+    regressions = {}
+    for name, summary in summarize_plans(current).items():
+        if name not in snapshot:
+            continue
+        new_scans = sorted(set(summary["full_scans"]) - set(snapshot[name]["full_scans"]))
+        if new_scans:
+            regressions[name] = new_scans
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Snapshot query plans and detect regressions to full scans")
+    parser.add_argument("--test", action="store_true", help="Use the test database")
+    parser.add_argument("--update", action="store_true", help="Overwrite the stored snapshot with the current plans")
+    args = parser.parse_args()
+
+    conn = get_db_connection(test_mode=args.test)
+    source_path = conn.execute("PRAGMA database_list").fetchone()[2]
+    conn.close()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        conn = migrated_copy(source_path, os.path.join(temp_dir, "plans.db"))
+        try:
+            current = capture_plans(conn)
+        finally:
+            conn.close()
+
+    if args.update:
+        save_snapshot(current)
+        print(f"Saved plans for {len(current)} queries to {SNAPSHOT_PATH}")
+        return 0
+
+    regressions = find_regressions(load_snapshot(), current)
+    for name, scans in regressions.items():
+        print(f"{name}: new full scan of {', '.join(scans)}")
+    if not regressions:
+        print(f"No plan regressions in {len(current)} queries")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,245 @@
+# backend/database/query_monitor.py
+import os
+import re
+import json
+import time
+import logging
+import sqlite3
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from typing import Dict, List
+
+from config import settings
+
+_slow_query_logger = None
+
+
+def get_slow_query_threshold_ms() -> float:
+    """Return the configured slow-query threshold in milliseconds"""
+    return float(settings.get_monitoring_config()["slow_query_ms"])
+
+
+def _get_slow_query_logger() -> logging.Logger:
+    """Lazily create the logger that writes slow queries as JSON lines to a rotating file"""
+    global _slow_query_logger
+    if _slow_query_logger is None:
+        config = settings.get_monitoring_config()
+        log_path = config["slow_query_log"]
+        os.makedirs(os.path.dirname(log_path) or ".", exist_ok=True)
+
+        handler = RotatingFileHandler(
+            log_path,
+            maxBytes=int(config["slow_query_log_max_bytes"]),
+            backupCount=int(config["slow_query_log_backups"])
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+
+        logger = logging.getLogger("slow_queries")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        logger.addHandler(handler)
+        _slow_query_logger = logger
+    return _slow_query_logger
+
+
+def explain_query_plan(conn: sqlite3.Connection, sql: str, params=()) -> List[str]:
+    """
+    Run EXPLAIN QUERY PLAN for a statement
+
+    Returns:
+        List of plan detail lines, indented by depth in the plan tree
+    """
+    rows = sqlite3.Connection.execute(conn, f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+
+    depth = {0: -1}
+    lines = []
+    for row in rows:
+        node_id, parent_id, detail = row[0], row[1], row[3]
+        depth[node_id] = depth.get(parent_id, -1) + 1
+        lines.append("  " * depth[node_id] + detail)
+    return lines
+
+
+def summarize_plan(plan: List[str]) -> Dict:
+    """Pull full table scans and temp B-trees out of a query plan"""
+    full_scans = []
+    temp_btrees = []
+    for line in plan:
+        detail = line.strip()
+        # "SCAN t" is a full scan, "SCAN t USING INDEX" walks a whole index
+        if detail.startswith("SCAN ") and "USING" not in detail:
+            full_scans.append(detail[5:])
+        if "USE TEMP B-TREE" in detail:
+            temp_btrees.append(detail)
+    return {"full_scans": full_scans, "temp_btrees": temp_btrees}
+
+
+def normalize_sql(sql: str) -> str:
+    """Collapse whitespace so the same statement groups together in reports"""
+    return re.sub(r"\s+", " ", sql).strip()
+
+
+def record_slow_query(conn: sqlite3.Connection, sql: str, params, duration_ms: float):
+    """Capture a slow statement along with its query plan in the slow-query log"""
+    try:
+        plan = []
+        if sql.lstrip().upper().startswith(("SELECT", "WITH")):
+            try:
+                plan = explain_query_plan(conn, sql, params or ())
+            except sqlite3.Error as e:
+                plan = [f"EXPLAIN failed: {str(e)}"]
+
+        entry = {
+            "logged_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "sql": normalize_sql(sql),
+            "params": [p if isinstance(p, (int, float, str)) or p is None else repr(p) for p in (params or ())],
+            "duration_ms": round(duration_ms, 2),
+            "plan": plan
+        }
+        entry.update(summarize_plan(plan))
+
+        _get_slow_query_logger().info(json.dumps(entry))
+    except Exception as e:
+        logging.error(f"Failed to record slow query: {str(e)}")
+
+
+class MonitoredCursor(sqlite3.Cursor):
+    """
+    Cursor that times statements (execute plus fetch) and records the
+    ones that exceed the slow-query threshold.
+    """
+    def _start(self, sql, params):
+        self._sql = sql
+        self._params = params
+        self._elapsed = 0.0
+        self._recorded = False
+
+    def _check(self):
+        if not self._recorded and self._elapsed * 1000 >= self.connection.slow_query_ms:
+            self._recorded = True
+            record_slow_query(self.connection, self._sql, self._params, self._elapsed * 1000)
+
+    def execute(self, sql, params=()):
+        self._start(sql, params)
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, params)
+        finally:
+            self._elapsed += time.perf_counter() - started
+            self._check()
+
+    def executemany(self, sql, seq_of_params):
+        self._start(sql, None)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_params)
+        finally:
+            self._elapsed += time.perf_counter() - started
+            self._check()
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._add_fetch_time(started)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._add_fetch_time(started)
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._add_fetch_time(started)
+        return rows
+
+    def _add_fetch_time(self, started):
+        if hasattr(self, "_sql"):
+            self._elapsed += time.perf_counter() - started
+            self._check()
+
+
+class MonitoredConnection(sqlite3.Connection):
+    """
+    Connection whose cursors report slow statements to the slow-query log.
+    Pass as ``factory`` to ``sqlite3.connect``.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.slow_query_ms = get_slow_query_threshold_ms()
+
+    def cursor(self, factory=MonitoredCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+
+def _read_slow_query_log() -> List[Dict]:
+    """Read all entries from the current slow-query log and its rotated backups"""
+    config = settings.get_monitoring_config()
+    log_path = config["slow_query_log"]
+    paths = [log_path] + [f"{log_path}.{i}" for i in range(1, int(config["slow_query_log_backups"]) + 1)]
+
+    entries = []
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue
+    return entries
+
+
+def get_worst_queries(limit: int = 20, order_by: str = "max_ms") -> List[Dict]:
+    """
+    Aggregate the slow-query log by statement
+
+    Args:
+        limit: Number of statements to return
+        order_by: One of max_ms, total_ms, count
+
+    Returns:
+        Statements ordered worst first, with timing stats and the latest plan
+    """
+    grouped = {}
+    for entry in _read_slow_query_log():
+        stats = grouped.setdefault(entry["sql"], {
+            "sql": entry["sql"],
+            "count": 0,
+            "total_ms": 0.0,
+            "max_ms": 0.0,
+            "last_seen": None,
+            "slowest_params": None,
+            "plan": [],
+            "full_scans": [],
+            "temp_btrees": []
+        })
+        stats["count"] += 1
+        stats["total_ms"] += entry["duration_ms"]
+        if entry["duration_ms"] >= stats["max_ms"]:
+            stats["max_ms"] = entry["duration_ms"]
+            stats["slowest_params"] = entry.get("params")
+        if stats["last_seen"] is None or entry["logged_at"] >= stats["last_seen"]:
+            stats["last_seen"] = entry["logged_at"]
+            stats["plan"] = entry.get("plan", [])
+            stats["full_scans"] = entry.get("full_scans", [])
+            stats["temp_btrees"] = entry.get("temp_btrees", [])
+
+    results = list(grouped.values())
+    for stats in results:
+        stats["avg_ms"] = round(stats["total_ms"] / stats["count"], 2)
+        stats["total_ms"] = round(stats["total_ms"], 2)
+
+    if order_by not in ("max_ms", "total_ms", "count"):
+        order_by = "max_ms"
+    results.sort(key=lambda s: s[order_by], reverse=True)
+    return results[:limit]
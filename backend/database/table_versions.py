@@ -0,0 +1,43 @@
+# backend/database/table_versions.py
+#
+# Change counters for reference tables that are cached in memory. Triggers
+# bump table_versions.version on every insert, update or delete, so a cache
+# can tell with one primary-key lookup whether it needs to reload.
+import sqlite3
+
+
+def create_version_triggers(conn: sqlite3.Connection, table: str):
+    """Create the table_versions table and the triggers that track ``table``"""
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS table_versions (
+               table_name TEXT PRIMARY KEY,
+               version INTEGER NOT NULL DEFAULT 0
+           )"""
+    )
+    conn.execute("INSERT OR IGNORE INTO table_versions(table_name, version) VALUES (?, 0)", (table,))
+
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        conn.execute(
+            f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_version_{event.lower()}
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE table_versions SET version = version + 1 WHERE table_name = '{table}';
+                END"""
+        )
+
+
+def get_table_version(conn: sqlite3.Connection, table: str) -> int:
+    """
+    Return the change counter for a table
+
+    Returns -1 when the table is not tracked (migrations not applied yet);
+    callers should then treat every check as a change.
+    """
+    try:
+        row = conn.execute(
+            "SELECT version FROM table_versions WHERE table_name = ?",
+            (table,)
+        ).fetchone()
+    except sqlite3.OperationalError:
+        return -1
+    return row[0] if row else -1
@@ -0,0 +1,129 @@
+# backend/database/workload.py
+# Representative read workload: every v_* view plus the hot queries issued
+# by the endpoints. Replayed by the index advisor.
+import sqlite3
+from typing import Dict, List, Tuple
+
+# Parameter samplers return rows whose values are bound to the query
+ACTIVE_CLIENTS = "SELECT client_id FROM clients WHERE valid_to IS NULL ORDER BY client_id"
+ACTIVE_PAYMENTS = "SELECT payment_id FROM payments WHERE valid_to IS NULL ORDER BY payment_id DESC"
+LINKED_FILES = "SELECT DISTINCT file_id FROM payment_files ORDER BY file_id DESC"
+
+# Endpoint queries, keyed by a stable name: (sql, parameter sampler or None)
+ENDPOINT_QUERIES: Dict[str, Tuple[str, str]] = {
+    "clients.sidebar": (
+        "SELECT * FROM v_client_sidebar",
+        None
+    ),
+    "clients.details": (
+        "SELECT * FROM v_client_details WHERE client_id = ?",
+        ACTIVE_CLIENTS
+    ),
+    "clients.list": (
+        "SELECT * FROM clients WHERE valid_to IS NULL ORDER BY display_name",
+        None
+    ),
+    "payments.history": (
+        "SELECT * FROM v_payment_history WHERE client_id = ? ORDER BY payment_date_formatted DESC",
+        ACTIVE_CLIENTS
+    ),
+    "payments.last": (
+        "SELECT * FROM v_last_payment WHERE client_id = ?",
+        ACTIVE_CLIENTS
+    ),
+    "payments.missing": (
+        "SELECT * FROM v_missing_payment_periods WHERE client_id = ?",
+        ACTIVE_CLIENTS
+    ),
+    "contracts.active": (
+        "SELECT * FROM v_active_contracts WHERE client_id = ?",
+        ACTIVE_CLIENTS
+    ),
+    "contacts.client": (
+        "SELECT * FROM contacts WHERE client_id = ? AND valid_to IS NULL ORDER BY contact_type, contact_name",
+        ACTIVE_CLIENTS
+    ),
+    "files.payment": (
+        """SELECT cf.* FROM client_files cf
+           JOIN payment_files pf ON cf.file_id = pf.file_id
+           WHERE pf.payment_id = ?""",
+        ACTIVE_PAYMENTS
+    ),
+    "documents.payment": (
+        "SELECT * FROM DocumentView WHERE payment_id = ?",
+        ACTIVE_PAYMENTS
+    ),
+    "documents.payments_for_file": (
+        "SELECT payment_id FROM payment_files WHERE file_id = ?",
+        LINKED_FILES
+    ),
+    "documents.unprocessed": (
+        """SELECT file_id, file_path, original_filename, document_date, provider_id
+           FROM client_files WHERE is_processed = 0 ORDER BY upload_date DESC""",
+        None
+    ),
+    "documents.processing_log": (
+        "SELECT * FROM processing_log WHERE file_id = ? ORDER BY process_date DESC",
+        LINKED_FILES
+    ),
+    "documents.processing_errors": (
+        "SELECT * FROM processing_log WHERE status = 'error' ORDER BY process_date DESC LIMIT 100",
+        None
+    ),
+    "documents.processing_recent": (
+        "SELECT status, COUNT(*) FROM processing_log WHERE process_date >= datetime('now', '-7 days') GROUP BY status",
+        None
+    ),
+}
+
+
+def get_view_names(conn: sqlite3.Connection) -> List[str]:
+    """Return the names of all v_* views in the database"""
+    rows = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'view' AND name LIKE 'v\\_%' ESCAPE '\\' ORDER BY name"
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def object_exists(conn: sqlite3.Connection, name: str) -> bool:
+    """Check whether a table or view exists"""
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type IN ('table', 'view') AND name = ?",
+        (name,)
+    ).fetchone() is not None
+
+
+def get_workload(conn: sqlite3.Connection, samples: int = 3) -> List[Tuple[str, str, tuple]]:
+    """
+    Build the workload for a database
+
+    Args:
+        conn: Database connection
+        samples: Number of parameter sets to draw for parameterized queries
+
+    Returns:
+        List of (name, sql, params). Queries that cannot be prepared against
+        this database (drifted schemas) are left out.
+    """
+    workload = [(f"view.{view}", f"SELECT * FROM {view}", ()) for view in get_view_names(conn)]
+
+    for name, (sql, sampler) in ENDPOINT_QUERIES.items():
+        if sampler is None:
+            workload.append((name, sql, ()))
+            continue
+        try:
+            rows = conn.execute(f"{sampler} LIMIT ?", (samples,)).fetchall()
+        except sqlite3.Error:
+            continue
+        for row in rows:
+            workload.append((name, sql, tuple(row)))
+
+    return [item for item in workload if _can_prepare(conn, item[1], item[2])]
+
+
+def _can_prepare(conn: sqlite3.Connection, sql: str, params: tuple) -> bool:
+    try:
+        conn.execute(f"EXPLAIN {sql}", params).fetchall()
+        return True
+    except sqlite3.Error:
+        return False
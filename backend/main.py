@@ -7,10 +7,18 @@ import uvicorn
 import asyncio
 from fastapi_utils.tasks import repeat_every
 from datetime import datetime
-from api import clients_router, payments_router, contracts_router, files_router, contacts_router
+from api import clients_router, payments_router, contracts_router, files_router, contacts_router, admin_router, jobs_router
 from api.documents import router as documents_router
-from utils.document_processor import DocumentProcessor
+from utils.mail_watcher import get_mail_watcher
+from utils.processing_log import flush_processing_logs
+from utils.reclassifier import resume_interrupted_reclassify
+from utils.backfill import note_activity
+from utils.job_queue import get_job_queue, submit_scan
+from utils.outbox import get_outbox_worker
+from config import settings
 from database import get_db_connection, backup_database
+from database.maintenance import run_maintenance
+from database.migrations import run_migrations
 
 # Setup logging
 logging.basicConfig(
@@ -41,12 +49,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def track_interactive_requests(request, call_next):
+    """Background backfills back off while the API is serving requests"""
+    if not request.url.path.startswith("/api/documents/backfill"):
+        note_activity()
+    return await call_next(request)
+
 app.include_router(clients_router, prefix="/api/clients", tags=["clients"])
 app.include_router(payments_router, prefix="/api/payments", tags=["payments"])
 app.include_router(contracts_router, prefix="/api/contracts", tags=["contracts"])
 app.include_router(files_router, prefix="/api/files", tags=["files"])
 app.include_router(contacts_router, prefix="/api/contacts", tags=["contacts"])
 app.include_router(documents_router, prefix="/api/documents", tags=["documents"])
+app.include_router(admin_router, prefix="/api/admin", tags=["admin"])
+app.include_router(jobs_router, prefix="/api/jobs", tags=["jobs"])
 
 @app.on_event("startup")
 async def startup_event():
@@ -54,8 +71,32 @@ async def startup_event():
     # Create backup of database
     backup_database()
     
+    # Bring the schema up to date (runs after the backup so it can be restored)
+    run_migrations()
+    
+    # Finish a reclassification the last shutdown interrupted
+    resume_interrupted_reclassify()
+    
+    # Run queued background jobs (including any a restart interrupted)
+    get_job_queue().start()
+    
+    # Create client shortcuts recorded by uploads (and any left from the last run)
+    get_outbox_worker().start()
+    
     # Start period reference maintenance task
     asyncio.create_task(update_period_reference())
+    
+    # Process mail dump files as they arrive
+    if settings.get_watcher_config()["enabled"]:
+        get_mail_watcher().start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Run shutdown tasks"""
+    get_mail_watcher().stop()
+    get_job_queue().stop()
+    get_outbox_worker().stop()
+    flush_processing_logs()
 
 async def update_period_reference():
     """Update the period_reference table with current periods"""
@@ -102,16 +143,30 @@ async def scheduled_period_reference_update():
     """Daily scheduled task to update period reference"""
     await update_period_reference()
 
+@app.on_event("startup")
+@repeat_every(seconds=60*60*24)  # Run once a day
+async def scheduled_database_maintenance():
+    """Daily scheduled task to refresh query planner statistics"""
+    logging.info("Running scheduled database maintenance")
+    run_maintenance()
+
 @app.on_event("startup")
 @repeat_every(seconds=60*60)  # Run once an hour
 async def scheduled_document_processing():
-    """Hourly scheduled task to process new documents"""
+    """Hourly scheduled task to process new documents (safety net for the watcher)"""
+    if get_mail_watcher().is_running:
+        # The watcher scans the folder when it starts and sees new files as they arrive
+        return
     try:
-        logging.info("Running scheduled document processing")
-        processor = DocumentProcessor()
-        processed_ids = processor.scan_mail_dump()
-        if processed_ids:
-            logging.info(f"Processed {len(processed_ids)} documents")
+        year = datetime.now().year
+        conn = get_db_connection()
+        try:
+            # Runs on the job queue, and not at all if a scan of the year is queued or running
+            job, created = submit_scan(conn, year)
+        finally:
+            conn.close()
+        if created:
+            logging.info(f"Queued scheduled document processing of {year} (job {job['job_id']})")
     except Exception as e:
         logging.error(f"Scheduled document processing failed: {str(e)}")
 
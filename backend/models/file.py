@@ -18,4 +18,12 @@ class FileResponse(FileBase):
 class PaymentFileLink(BaseModel):
     payment_id: int
     file_id: int
-    linked_at: Optional[datetime] = None
\ No newline at end of file
+    linked_at: Optional[datetime] = None
+    
+class MatchReviewResolution(BaseModel):
+    client_id: Optional[int] = None  # None rejects the match
+    remember: bool = True
+    
+class BackfillRequest(BaseModel):
+    start_year: int
+    end_year: int
@@ -5,6 +5,9 @@ import os
 from fastapi.testclient import TestClient
 from backend.main import app
 from backend.database import get_db_connection
+from database.migrations import apply_migrations
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "schema.sql")
 
 @pytest.fixture
 def test_client():
@@ -16,4 +19,25 @@ def test_db():
     """Get a connection to the test database"""
     conn = get_db_connection(test_mode=True)
     yield conn
-    conn.close()
\ No newline at end of file
+    conn.close()
+
+@pytest.fixture
+def migrated_db_path(tmp_path):
+    """Path of an empty database built from data/schema.sql with every migration applied"""
+    path = str(tmp_path / "migrated.db")
+    conn = sqlite3.connect(path)
+    try:
+        with open(SCHEMA_PATH, "r", encoding="utf-8") as f:
+            conn.executescript(f.read())
+        apply_migrations(conn)
+    finally:
+        conn.close()
+    return path
+
+@pytest.fixture
+def migrated_db(migrated_db_path):
+    """Get a connection to an empty, fully migrated database"""
+    conn = sqlite3.connect(migrated_db_path)
+    conn.row_factory = sqlite3.Row
+    yield conn
+    conn.close()
@@ -67,4 +67,17 @@ def test_contacts_for_client(test_client, test_db):
             contact = response.json()[0]
             assert "contact_id" in contact
             assert "client_id" in contact
-            assert "contact_type" in contact
\ No newline at end of file
+            assert "contact_type" in contact
+
+def test_slow_queries(test_client):
+    """Test listing the worst offenders from the slow-query log"""
+    response = test_client.get("/api/admin/slow-queries?limit=5")
+    assert response.status_code == 200
+    assert isinstance(response.json(), list)
+    assert len(response.json()) <= 5
+    
+    if len(response.json()) > 0:
+        entry = response.json()[0]
+        assert "sql" in entry
+        assert "max_ms" in entry
+        assert "plan" in entry
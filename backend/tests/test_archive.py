@@ -0,0 +1,83 @@
+# backend/tests/test_archive.py
+import os
+import sqlite3
+from datetime import datetime
+import pytest
+from config import settings
+from database.archive import (
+    archive_superseded_rows, attach_archives, create_history_views, get_archivable_counts, get_cutoffs,
+    list_archive_years
+)
+
+# Superseded rows older than a year are archived: before 2022-06-01
+NOW = datetime(2023, 6, 1)
+
+@pytest.fixture
+def conn(migrated_db, tmp_path, monkeypatch):
+    archive = {"home": str(tmp_path / "archive"), "superseded_days": 365, "processing_log_days": 365}
+    monkeypatch.setattr(settings, "get_archive_config", lambda: dict(archive))
+
+    conn = migrated_db
+
+    clients = [
+        (1, None),            # Current
+        (2, "2021-06-01"),    # Superseded, nothing refers to it
+        (3, "2021-06-01"),    # Superseded, still mentioned in a document
+        (4, "2021-06-01"),    # Superseded, still owns a document
+    ]
+    conn.executemany("INSERT INTO clients(client_id, display_name, valid_to) VALUES (?, 'Client', ?)", clients)
+    conn.execute("INSERT INTO contracts(contract_id, client_id) VALUES (1, 1)")
+    payments = [(1, None), (2, "2021-05-01"), (3, "2022-03-01"), (4, "2023-01-01")]
+    conn.executemany(
+        "INSERT INTO payments(payment_id, contract_id, client_id, valid_to) VALUES (?, 1, 1, ?)", payments
+    )
+    conn.execute("INSERT INTO client_files(file_id, file_path, original_filename) VALUES (1, '/a.pdf', 'a.pdf')")
+    conn.execute("INSERT INTO client_files(file_id, file_path, original_filename, client_id) VALUES (2, '/b.pdf', 'b.pdf', 4)")
+    conn.execute("INSERT INTO payment_files(payment_id, file_id) VALUES (2, 1)")
+    conn.execute(
+        "INSERT INTO document_client_mentions(file_id, extracted_name, client_id, match_status) VALUES (1, 'C', 3, 'matched')"
+    )
+    conn.commit()
+    return conn
+
+def _ids(conn, sql):
+    return sorted(row[0] for row in conn.execute(sql).fetchall())
+
+def test_superseded_rows_are_split_by_year(conn):
+    """Test that rows past the cutoff move to the archive of the year they were superseded"""
+    assert get_archivable_counts(conn, get_cutoffs(NOW))["payments"] == {2021: 1, 2022: 1}
+
+    results = archive_superseded_rows(conn, now=NOW)
+
+    assert results == {
+        2021: {"payment_files": 1, "payments": 1, "contacts": 0, "contracts": 0, "clients": 1, "processing_log": 0},
+        2022: {"payment_files": 0, "payments": 1, "contacts": 0, "contracts": 0, "clients": 0, "processing_log": 0},
+    }
+    assert list_archive_years() == [2021, 2022]
+    assert _ids(conn, "SELECT payment_id FROM payments") == [1, 4]
+    assert _ids(conn, "SELECT payment_id FROM payment_files") == []
+
+    archived = sqlite3.connect(os.path.join(settings.get_archive_config()["home"], "archive_2021.db"))
+    try:
+        assert _ids(archived, "SELECT payment_id FROM payments") == [2]
+        assert _ids(archived, "SELECT payment_id FROM payment_files") == [2]
+    finally:
+        archived.close()
+
+def test_referenced_clients_stay(conn):
+    """Test that a superseded client anything in the hot database still refers to is not archived"""
+    archive_superseded_rows(conn, now=NOW)
+
+    assert _ids(conn, "SELECT client_id FROM clients") == [1, 3, 4]
+
+def test_history_views_union_hot_and_archived_rows(conn):
+    """Test that the _history views return hot rows together with every attached archive"""
+    archive_superseded_rows(conn, now=NOW)
+
+    years = attach_archives(conn)
+    create_history_views(conn, years)
+
+    assert years == [2021, 2022]
+    assert _ids(conn, "SELECT payment_id FROM payments_history") == [1, 2, 3, 4]
+    assert _ids(conn, "SELECT client_id FROM clients_history") == [1, 2, 3, 4]
+    assert _ids(conn, "SELECT payment_id FROM payment_files_history") == [2]
@@ -0,0 +1,34 @@
+# backend/tests/test_blob_store.py
+import os
+from utils.blob_store import BlobStore, apply_dedupe, dedupe_report
+
+def _write(path, data: bytes):
+    with open(path, "wb") as f:
+        f.write(data)
+
+def test_dedupe_skips_files_changed_since_the_report(tmp_path, migrated_db):
+    """Test that every copy is re-hashed before it is linked and changed ones are left alone"""
+    folder = tmp_path / "2021"
+    folder.mkdir()
+    paths = [str(folder / name) for name in ("a.pdf", "b.pdf", "c.pdf")]
+    for path in paths:
+        _write(path, b"statement")
+    with migrated_db:
+        migrated_db.executemany(
+            "INSERT INTO client_files(file_path, original_filename) VALUES (?, ?)",
+            [(path, os.path.basename(path)) for path in paths]
+        )
+    report = dedupe_report([str(folder)])
+    assert report["duplicate_files"] == 2
+
+    _write(paths[1], b"statement, revised")
+    store = BlobStore(str(tmp_path / ".blobs"))
+    counts = apply_dedupe(migrated_db, store, report)
+
+    assert counts["linked"] == 2 and counts["freed_bytes"] == 0
+    assert os.path.samefile(paths[0], paths[2])
+    assert not os.path.samefile(paths[0], paths[1])
+    with open(paths[1], "rb") as f:
+        assert f.read() == b"statement, revised"
+    hashes = dict(migrated_db.execute("SELECT file_path, content_hash FROM client_files").fetchall())
+    assert hashes[paths[1]] is None and hashes[paths[0]] == hashes[paths[2]] == report["duplicate_groups"][0]["content_hash"]
@@ -0,0 +1,41 @@
+# backend/tests/test_bundles.py
+import io
+import zipfile
+from utils.bundles import select_documents, stream_zip
+
+def test_streamed_zip_round_trip(tmp_path):
+    """Test that the streamed archive holds every document and lists the missing ones"""
+    pdf = tmp_path / "statement.pdf"
+    pdf.write_bytes(b"%PDF" + bytes(range(256)) * 1000)
+    notes = tmp_path / "notes.txt"
+    notes.write_text("fee schedule " * 100)
+    documents = [
+        {"file_id": 1, "file_path": str(pdf), "original_filename": "Q1.pdf"},
+        {"file_id": 2, "file_path": str(pdf), "original_filename": "Q1.pdf"},
+        {"file_id": 3, "file_path": str(notes), "original_filename": "notes.txt"},
+        {"file_id": 4, "file_path": str(tmp_path / "gone.pdf"), "original_filename": "gone.pdf"},
+    ]
+
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(stream_zip(documents))))
+
+    assert archive.testzip() is None
+    assert archive.namelist() == ["Q1.pdf", "Q1 (2).pdf", "notes.txt", "MISSING.txt"]
+    assert archive.read("Q1 (2).pdf") == pdf.read_bytes()
+    assert archive.getinfo("Q1.pdf").compress_type == zipfile.ZIP_STORED
+    assert archive.getinfo("notes.txt").compress_type == zipfile.ZIP_DEFLATED
+    assert "gone.pdf" in archive.read("MISSING.txt").decode()
+
+def test_client_bundle_includes_mentioned_documents(migrated_db):
+    """Test that a client's bundle has the documents that name the client, as the listing does"""
+    with migrated_db:
+        migrated_db.executemany(
+            "INSERT INTO client_files(file_id, client_id, file_path, original_filename, document_date) VALUES (?, ?, ?, ?, ?)",
+            [(1, 7, "/mail/a.pdf", "a.pdf", "2024-01-05"), (2, None, "/mail/b.pdf", "b.pdf", "2024-02-05"),
+             (3, None, "/mail/c.pdf", "c.pdf", "2024-03-05")]
+        )
+        migrated_db.execute(
+            "INSERT INTO document_client_mentions(file_id, extracted_name, client_id, match_status) "
+            "VALUES (2, 'Acme', 7, 'matched')"
+        )
+
+    assert [doc["file_id"] for doc in select_documents(migrated_db, client_id=7)] == [1, 2]
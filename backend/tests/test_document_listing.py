@@ -0,0 +1,51 @@
+# backend/tests/test_document_listing.py
+import json
+import pytest
+from database.migrations import m0014_document_mentions
+from utils.document_listing import list_documents
+
+@pytest.fixture
+def conn(migrated_db):
+    conn = migrated_db
+    documents = [
+        ("2024-01-15", {"extracted_provider": "John Hancock", "extracted_clients": ["Acme"], "client_ids": [1]}),
+        ("2024-02-15", {"extracted_provider": "Voya", "extracted_clients": ["Acme", "Bolt"], "client_ids": [1]}),
+        ("2024-03-15", {"extracted_provider": "Voya", "extracted_clients": ["Cobalt"], "client_ids": []}),
+        ("2024-04-15", None),
+    ]
+    for i, (document_date, metadata) in enumerate(documents, 1):
+        conn.execute(
+            "INSERT INTO client_files(file_path, original_filename, document_date, metadata) VALUES (?, ?, ?, ?)",
+            (f"/mail/{i}.pdf", f"{i}.pdf", document_date, json.dumps(metadata) if metadata else None)
+        )
+    conn.execute(
+        "INSERT INTO client_match_reviews(file_id, extracted_name, status) VALUES (2, 'Bolt', 'pending')"
+    )
+    conn.commit()
+    m0014_document_mentions._backfill_mentions(conn)
+    conn.commit()
+    return conn
+
+def test_documents_are_filtered_by_extracted_metadata(conn):
+    """Test that backfilled mentions and generated columns answer the listing filters"""
+    assert [d["file_id"] for d in list_documents(conn, client_id=1)["documents"]] == [2, 1]
+    assert [d["file_id"] for d in list_documents(conn, extracted_provider="Voya")["documents"]] == [3, 2]
+    assert [d["file_id"] for d in list_documents(conn, match_status="review")["documents"]] == [2]
+    assert [d["file_id"] for d in list_documents(conn, match_status="unmatched")["documents"]] == [3]
+
+    mentions = list_documents(conn, client_id=1, limit=1)["documents"][0]["mentions"]
+    assert mentions == [
+        {"extracted_name": "Acme", "client_id": 1, "match_status": "matched"},
+        {"extracted_name": "Bolt", "client_id": None, "match_status": "review"},
+    ]
+
+def test_pages_follow_the_cursor(conn):
+    """Test that paging with next_cursor returns every document once, newest first"""
+    seen, after = [], None
+    while True:
+        page = list_documents(conn, limit=3, after=after)
+        seen += [d["file_id"] for d in page["documents"]]
+        after = page["next_cursor"]
+        if after is None:
+            break
+    assert seen == [4, 3, 2, 1]
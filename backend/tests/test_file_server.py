@@ -0,0 +1,70 @@
+# backend/tests/test_file_server.py
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Route
+from starlette.testclient import TestClient
+from utils.file_server import TTLCache, file_cache, get_file_meta, serve_file
+
+CONTENT = bytes(range(256)) * 40
+
+@pytest.fixture
+def client(tmp_path):
+    path = tmp_path / "statement.pdf"
+    path.write_bytes(CONTENT)
+    file_cache.invalidate(("test", 1))
+
+    async def endpoint(request):
+        meta = get_file_meta(("test", 1), lambda: (str(path), "statement.pdf", "abc123"))
+        return serve_file(request, meta)
+
+    return TestClient(Starlette(routes=[Route("/file", endpoint, methods=["GET", "HEAD"])]))
+
+def test_full_file_with_caching_headers(client):
+    """Test that the whole file is sent with its ETag, type and cache headers"""
+    response = client.get("/file")
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    assert response.headers["etag"] == '"abc123"'
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["content-type"] == "application/pdf"
+    assert "immutable" in client.get("/file?v=abc123").headers["cache-control"]
+
+def test_conditional_request_is_not_modified(client):
+    """Test that a matching If-None-Match gets an empty 304"""
+    response = client.get("/file", headers={"If-None-Match": '"abc123"'})
+    assert response.status_code == 304 and response.content == b""
+
+def test_byte_ranges(client):
+    """Test that byte ranges are served as 206, invalid ones as 416 and stale If-Range as 200"""
+    response = client.get("/file", headers={"Range": "bytes=100-199"})
+    assert response.status_code == 206
+    assert response.content == CONTENT[100:200]
+    assert response.headers["content-range"] == f"bytes 100-199/{len(CONTENT)}"
+
+    assert client.get("/file", headers={"Range": "bytes=-10"}).content == CONTENT[-10:]
+    assert client.get("/file", headers={"Range": f"bytes={len(CONTENT)}-"}).status_code == 416
+    # A stale If-Range gets the whole file
+    stale = client.get("/file", headers={"Range": "bytes=0-9", "If-Range": '"old"'})
+    assert stale.status_code == 200 and len(stale.content) == len(CONTENT)
+
+def test_if_range_never_matches_a_weak_etag(tmp_path):
+    """Test that a range is ignored under If-Range when the file only has a weak ETag"""
+    path = tmp_path / "legacy.pdf"
+    path.write_bytes(CONTENT)
+    file_cache.invalidate(("test", 2))
+
+    async def endpoint(request):
+        return serve_file(request, get_file_meta(("test", 2), lambda: (str(path), "legacy.pdf", None)))
+
+    client = TestClient(Starlette(routes=[Route("/file", endpoint)]))
+    etag = client.get("/file").headers["etag"]
+    assert etag.startswith("W/")
+    assert client.get("/file", headers={"Range": "bytes=0-9"}).status_code == 206
+    response = client.get("/file", headers={"Range": "bytes=0-9", "If-Range": etag})
+    assert response.status_code == 200 and len(response.content) == len(CONTENT)
+
+def test_ttl_cache_expires_entries():
+    """Test that cache entries past their TTL are not returned"""
+    cache = TTLCache(ttl=-1)
+    cache.set("key", "value")
+    assert cache.get("key") is None
@@ -0,0 +1,37 @@
+# backend/tests/test_job_queue.py
+import pytest
+from utils.job_queue import submit_job, cancel_job, job_handler, _claim_job
+
+@job_handler("test_noop")
+def _noop(context, **params):
+    return {}
+
+def test_identical_pending_jobs_are_deduplicated(migrated_db):
+    """Test that a job matching a queued or running one returns that job"""
+    first, created = submit_job(migrated_db, "test_noop", {"year": 2021})
+    again, created_again = submit_job(migrated_db, "test_noop", {"year": 2021})
+    other, _ = submit_job(migrated_db, "test_noop", {"year": 2022})
+
+    assert created and not created_again
+    assert again["job_id"] == first["job_id"] != other["job_id"]
+
+    # Once the first one has finished, the same job can be queued again
+    cancel_job(migrated_db, first["job_id"])
+    _, created = submit_job(migrated_db, "test_noop", {"year": 2021})
+    assert created
+
+def test_cancel_queued_and_running_jobs(migrated_db):
+    """Test that a queued job is cancelled at once and a running one is asked to stop"""
+    running, _ = submit_job(migrated_db, "test_noop", {"n": 1})
+    queued, _ = submit_job(migrated_db, "test_noop", {"n": 2})
+    assert _claim_job(migrated_db)["job_id"] == running["job_id"]
+
+    assert cancel_job(migrated_db, queued["job_id"])["status"] == "cancelled"
+    job = cancel_job(migrated_db, running["job_id"])
+    assert job["status"] == "running" and job["cancel_requested"]
+    assert _claim_job(migrated_db) is None
+
+def test_unknown_job_type_is_rejected(migrated_db):
+    """Test that only registered job types can be queued"""
+    with pytest.raises(ValueError):
+        submit_job(migrated_db, "no_such_job")
@@ -0,0 +1,67 @@
+# backend/tests/test_link_writer.py
+import os
+import struct
+from utils.link_writer import build_lnk, LinkBatch, UrlWriter, LnkWriter, LNK_CLSID
+
+def _link_info(data):
+    """Return the LinkInfo structure of a .lnk built by build_lnk"""
+    size = struct.unpack_from("<I", data, 0x4C)[0]
+    return data[0x4C:0x4C + size]
+
+def _unicode_at(block, offset):
+    end = offset
+    while block[end:end + 2] != b"\x00\x00":
+        end += 2
+    return block[offset:end].decode("utf-16-le")
+
+def test_lnk_header():
+    """Test that the shell link header has the right size, CLSID and flags"""
+    data = build_lnk("C:/Mail/2024/Ascensus - 401k Advisor Fee - AirSea Q1-24.pdf")
+    size, clsid, flags = struct.unpack_from("<I16sI", data, 0)
+    assert size == 0x4C
+    assert clsid == LNK_CLSID
+    assert flags & 0x02 and flags & 0x10 and flags & 0x80
+    assert data.endswith(b"\x00\x00\x00\x00")
+
+def test_lnk_local_target():
+    """Test that a local target is stored as the Unicode local base path"""
+    target = "C:/Mail/2024/Fee – Bellmont Q2-24.pdf"
+    info = _link_info(build_lnk(target))
+    assert struct.unpack_from("<I", info, 8)[0] == 0x01
+    base_unicode_offset = struct.unpack_from("<I", info, 28)[0]
+    assert _unicode_at(info, base_unicode_offset) == target.replace("/", "\\")
+
+def test_lnk_unc_target():
+    """Test that a UNC target is split into share name and path suffix"""
+    info = _link_info(build_lnk("\\\\fileserver\\share\\mail\\2024\\Fee.pdf"))
+    assert struct.unpack_from("<I", info, 8)[0] == 0x02
+    network_offset = struct.unpack_from("<I", info, 20)[0]
+    net_name_offset = struct.unpack_from("<I", info, network_offset + 8)[0]
+    net_name_end = info.index(b"\x00", network_offset + net_name_offset)
+    assert info[network_offset + net_name_offset:net_name_end] == b"\\\\fileserver\\share"
+    suffix_unicode_offset = struct.unpack_from("<I", info, 32)[0]
+    assert _unicode_at(info, suffix_unicode_offset) == "mail\\2024\\Fee.pdf"
+
+def test_link_batch_creates_folders_and_links(tmp_path):
+    """Test that a batch writes every queued link and drops truncated ones"""
+    target = "C:\\Mail\\2024\\Fee Q1-24.pdf"
+    batch = LinkBatch(UrlWriter())
+    batch.add(target, str(tmp_path / "AirSea" / "2024" / "Fee Q1-24.pdf.url"))
+    batch.add(target, str(tmp_path / "Bellmont" / "2024" / "Fee Q1-24.pdf.url"))
+    batch.add(target, str(tmp_path / "Dakota" / "2024" / "Fee Q1-24.pdf.url"))
+    batch.truncate(2)
+
+    assert batch.flush() == (2, 0)
+    assert len(batch) == 0
+    with open(tmp_path / "AirSea" / "2024" / "Fee Q1-24.pdf.url", encoding="utf-8") as f:
+        assert f.read() == "[InternetShortcut]\nURL=file:///C:/Mail/2024/Fee%20Q1-24.pdf\n"
+    assert not os.path.exists(tmp_path / "Dakota")
+
+def test_lnk_writer_replaces_existing_link(tmp_path):
+    """Test that rewriting a shortcut replaces it without leaving a temp file"""
+    link_path = str(tmp_path / "Fee.pdf.lnk")
+    LnkWriter().write("C:/Mail/old.pdf", link_path)
+    LnkWriter().write("C:/Mail/new.pdf", link_path)
+    with open(link_path, "rb") as f:
+        assert "new.pdf".encode("utf-16-le") in f.read()
+    assert os.listdir(tmp_path) == ["Fee.pdf.lnk"]
@@ -0,0 +1,44 @@
+# backend/tests/test_mail_watcher.py
+from types import SimpleNamespace
+import pytest
+from utils import mail_watcher
+from utils.mail_watcher import MailDumpWatcher
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=100.0)
+    monkeypatch.setattr(mail_watcher, "time", SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+def test_files_are_due_after_a_quiet_period(clock):
+    """Test that a file is handed over only once no event arrived for debounce_seconds"""
+    watcher = MailDumpWatcher(debounce_seconds=2, poll_interval=60)
+    watcher.notify("/mail/a.pdf")
+    clock.now += 1
+    watcher.notify("/mail/b.pdf")
+    assert watcher._take_due() == []
+
+    clock.now += 1
+    assert watcher._take_due() == ["/mail/a.pdf"]
+    assert watcher._take_due() == []
+
+    clock.now += 1
+    assert watcher._take_due() == ["/mail/b.pdf"]
+
+def test_new_events_restart_the_debounce(clock):
+    """Test that a file still being written is not processed until writes stop"""
+    watcher = MailDumpWatcher(debounce_seconds=2, poll_interval=60)
+    for _ in range(3):
+        watcher.notify("/mail/a.pdf")
+        clock.now += 1.5
+        assert watcher._take_due() == []
+
+    clock.now += 0.5
+    assert watcher._take_due() == ["/mail/a.pdf"]
+
+def test_only_pdfs_are_queued(clock):
+    """Test that only PDF files are queued, whatever the case of the extension"""
+    watcher = MailDumpWatcher(debounce_seconds=0, poll_interval=60)
+    watcher.notify("/mail/a.PDF")
+    watcher.notify("/mail/~a.tmp")
+    assert watcher._take_due() == ["/mail/a.PDF"]
@@ -0,0 +1,113 @@
+# backend/tests/test_migrations.py
+import os
+import sqlite3
+from types import SimpleNamespace
+import pytest
+from database import migrations
+from database.migrations import apply_migrations, get_schema_version, MIGRATIONS
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "schema.sql")
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    yield conn
+    conn.close()
+
+def _migration(version, upgrade, transactional=True):
+    return SimpleNamespace(VERSION=version, DESCRIPTION=f"Test migration {version}",
+                           upgrade=upgrade, TRANSACTIONAL=transactional)
+
+def _create(table):
+    return lambda conn: conn.execute(f"CREATE TABLE {table} (id INTEGER)")
+
+def test_migrations_apply_in_order_once(conn):
+    """Test that every migration applies to schema.sql in order, and a second run applies none"""
+    with open(SCHEMA_PATH, "r", encoding="utf-8") as f:
+        conn.executescript(f.read())
+
+    versions = [migration.VERSION for migration in MIGRATIONS]
+    assert apply_migrations(conn) == versions
+    assert [row[0] for row in conn.execute("SELECT version FROM schema_version ORDER BY rowid")] == versions
+    assert apply_migrations(conn) == []
+    assert get_schema_version(conn) == versions[-1]
+
+def test_target_stops_early(conn, monkeypatch):
+    """Test that target leaves later migrations pending"""
+    monkeypatch.setattr(migrations, "MIGRATIONS", [_migration(1, _create("a")), _migration(2, _create("b"))])
+
+    assert apply_migrations(conn, target=1) == [1]
+    assert apply_migrations(conn) == [2]
+
+def test_versions_must_increase(conn, monkeypatch):
+    """Test that out-of-order or repeated versions are refused before anything runs"""
+    monkeypatch.setattr(migrations, "MIGRATIONS", [_migration(2, _create("b")), _migration(1, _create("a"))])
+    with pytest.raises(RuntimeError):
+        apply_migrations(conn)
+
+    monkeypatch.setattr(migrations, "MIGRATIONS", [_migration(1, _create("a")), _migration(1, _create("b"))])
+    with pytest.raises(RuntimeError):
+        apply_migrations(conn)
+    assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name IN ('a', 'b')").fetchone()[0] == 0
+
+def test_failed_migration_rolls_back(conn, monkeypatch):
+    """Test that a transactional migration that fails leaves no trace and is retried"""
+    def fail(conn):
+        conn.execute("CREATE TABLE half (id INTEGER)")
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(migrations, "MIGRATIONS", [_migration(1, _create("a")), _migration(2, fail)])
+    with pytest.raises(RuntimeError):
+        apply_migrations(conn)
+    assert get_schema_version(conn) == 1
+    assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'half'").fetchone()[0] == 0
+
+    monkeypatch.setattr(migrations, "MIGRATIONS", [_migration(1, _create("a")), _migration(2, _create("half"))])
+    assert apply_migrations(conn) == [2]
+
+def test_non_transactional_migration_is_rerun(conn, monkeypatch):
+    """Test that a TRANSACTIONAL = False migration keeps its committed steps and is rerun after a failure"""
+    calls = []
+
+    def upgrade(conn):
+        calls.append(len(calls))
+        with conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS steps (step INTEGER)")
+            conn.execute("INSERT INTO steps VALUES (1)")
+        if len(calls) == 1:
+            raise RuntimeError("interrupted")
+        # Runs outside any transaction the runner opened
+        assert not conn.in_transaction
+
+    monkeypatch.setattr(migrations, "MIGRATIONS", [_migration(1, upgrade, transactional=False)])
+    with pytest.raises(RuntimeError):
+        apply_migrations(conn)
+    assert get_schema_version(conn) == 0
+    assert conn.execute("SELECT COUNT(*) FROM steps").fetchone()[0] == 1
+
+    assert apply_migrations(conn) == [1]
+    assert conn.execute("SELECT COUNT(*) FROM steps").fetchone()[0] == 2
+    assert apply_migrations(conn) == []
+    assert len(calls) == 2
+
+def test_duplicate_file_paths_are_merged(conn):
+    """Test that m0006 keeps one client_files row per path, with every copy's payment links"""
+    with open(SCHEMA_PATH, "r", encoding="utf-8") as f:
+        conn.executescript(f.read())
+    apply_migrations(conn, target=5)
+    with conn:
+        conn.executemany(
+            "INSERT INTO client_files(file_id, client_id, file_path, original_filename, is_processed) VALUES (?, ?, ?, ?, ?)",
+            [(1, 4, "/mail/a.pdf", "a.pdf", 0), (2, 5, "/mail/a.pdf", "a.pdf", 1), (3, 4, "/mail/b.pdf", "b.pdf", 1)]
+        )
+        conn.executemany("INSERT INTO payment_files(payment_id, file_id) VALUES (?, ?)", [(10, 1), (11, 2), (10, 2)])
+        conn.execute("INSERT INTO processing_log(file_name, status, file_id) VALUES ('a.pdf', 'processed', 2)")
+    apply_migrations(conn)
+
+    assert conn.execute("SELECT file_id, client_id, is_processed FROM client_files ORDER BY file_id").fetchall() == [
+        (1, None, 1), (3, 4, 1)
+    ]
+    assert conn.execute("SELECT payment_id, file_id FROM payment_files ORDER BY payment_id").fetchall() == [(10, 1), (11, 1)]
+    assert conn.execute("SELECT file_id FROM processing_log").fetchall() == [(1,)]
+    with pytest.raises(sqlite3.IntegrityError):
+        conn.execute("INSERT INTO client_files(file_path, original_filename) VALUES ('/mail/b.pdf', 'b.pdf')")
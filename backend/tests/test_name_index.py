@@ -0,0 +1,52 @@
+# backend/tests/test_name_index.py
+from utils.name_index import NameIndex, NameResolver, match_key
+
+CLIENTS = NameIndex([
+    (1, "AirSea America", "AirSea,AS,Air Sea"),
+    (6, "Bellmont Cabinets", "Bellmont,BC,Bell"),
+    (8, "Dakota Creek", None),
+    (12, "Hansen Bros", None),
+    (14, "Hos Bros", None),
+])
+
+def test_exact_and_alias_matches():
+    """Test that display names and name variants resolve case-insensitively"""
+    assert CLIENTS.candidates("dakota creek")[0]["match"] == "exact"
+    assert CLIENTS.best_match("air  sea") == 1
+    assert CLIENTS.best_match("BELL") == 6
+
+def test_normalized_names_ignore_suffixes_and_punctuation():
+    """Test that legal suffixes and punctuation do not block a match"""
+    assert match_key("Tony's Coffee, LLC") == "tonys coffee"
+    assert CLIENTS.best_match("Bellmont Cabinets Inc.") == 6
+
+def test_fuzzy_matches_are_scored():
+    """Test that typos and partial names still find the right client"""
+    assert CLIENTS.best_match("Belmont Cabinet") == 6
+    assert CLIENTS.best_match("Dakota") == 8
+    assert CLIENTS.best_match("Unknown Client") is None
+
+def test_ambiguous_matches_are_not_linked():
+    """Test that a name matching two clients equally well is left for review"""
+    client_id, candidates = CLIENTS.match("Bros")
+    assert client_id is None
+    assert {c["id"] for c in candidates[:2]} == {12, 14}
+
+def test_names_are_found_in_document_text():
+    """Test that client names and long variants are found in text, short variants are not"""
+    text = "Fee statement for AIRSEA AMERICA and Hansen Bros., Inc. - Bell account BC"
+    assert CLIENTS.find_in_text(text) == ["AirSea America", "Hansen Bros"]
+
+def test_resolver_swaps_in_a_whole_build(migrated_db):
+    """Test that a rebuild replaces clients, providers and versions together"""
+    resolver = NameResolver()
+    before = resolver.snapshot()
+    with migrated_db:
+        migrated_db.execute("INSERT INTO clients(client_id, display_name) VALUES (1, 'AirSea America')")
+        migrated_db.execute("INSERT INTO providers(provider_id, provider_name) VALUES (1, 'Voya')")
+    assert resolver.refresh(migrated_db, force=True)
+
+    assert before[0].names == {} and before[2] is None
+    assert resolver.match_client("AirSea America") == 1 and resolver.match_provider("Voya") == 1
+    copy = NameResolver.from_snapshot(resolver.snapshot())
+    assert copy.versions == resolver.versions and copy.get_client_name(1) == "AirSea America"
@@ -0,0 +1,34 @@
+# backend/tests/test_outbox.py
+import os
+from utils.outbox import OutboxWorker, enqueue_shortcut
+
+def test_shortcuts_are_created_after_commit_and_failures_retried(migrated_db, tmp_path):
+    """Test that committed rows are carried out and a failing one is rescheduled"""
+    target = tmp_path / "mail" / "doc.pdf"
+    target.parent.mkdir()
+    target.write_bytes(b"%PDF")
+    blocked = tmp_path / "blocked"
+    blocked.write_text("a file where a folder should be")
+
+    with migrated_db:
+        enqueue_shortcut(migrated_db.cursor(), str(target), str(tmp_path / "Client A" / "doc.pdf.lnk"), 1)
+        enqueue_shortcut(migrated_db.cursor(), str(target), str(blocked / "doc.pdf.lnk"), 1)
+    try:
+        with migrated_db:
+            enqueue_shortcut(migrated_db.cursor(), str(target), str(tmp_path / "Client B" / "doc.pdf.lnk"), 2)
+            raise RuntimeError("upload failed")
+    except RuntimeError:
+        pass
+
+    worker = OutboxWorker()
+    worker.retry_delay = 60
+    assert worker.process_due(migrated_db) == 2
+
+    assert os.path.exists(tmp_path / "Client A" / "doc.pdf.lnk")
+    assert not os.path.exists(tmp_path / "Client B")
+    rows = {row["outbox_id"]: row for row in migrated_db.execute("SELECT * FROM fs_outbox")}
+    assert rows[1]["status"] == "done"
+    assert rows[2]["status"] == "pending" and rows[2]["attempts"] == 1 and rows[2]["last_error"]
+
+    # The failed row is not due again until its retry delay has passed
+    assert worker.process_due(migrated_db) == 0
@@ -0,0 +1,78 @@
+# backend/tests/test_pattern_registry.py
+import threading
+import pytest
+from utils.pattern_registry import PatternRegistry
+
+def _row(pattern_id, pattern, pattern_type="document_type", priority=1):
+    return {"pattern_id": pattern_id, "pattern_type": pattern_type, "pattern": pattern,
+            "description": None, "priority": priority}
+
+@pytest.fixture
+def conn(migrated_db):
+    conn = migrated_db
+    conn.execute("INSERT INTO document_patterns(pattern_type, pattern) VALUES ('document_type', '401k')")
+    conn.commit()
+    return conn
+
+def test_document_types_match_through_the_combined_regex():
+    """Test that the combined alternation reports which pattern matched"""
+    registry = PatternRegistry()
+    registry.load_rows([_row(1, r"401\(?k\)?"), _row(2, "fee statement")], 1)
+
+    assert registry._set.document_type_regex is not None
+    assert registry.is_401k_document("Q3 Fee Statement.pdf")
+    assert not registry.is_401k_document("invoice.pdf")
+    assert registry.match_counts == {2: 1}
+
+def test_clashing_groups_fall_back_to_one_by_one():
+    """Test that patterns whose own named groups clash are still matched, in priority order"""
+    registry = PatternRegistry()
+    registry.load_rows([_row(1, r"(?P<year>\d{4}) 401k", priority=2), _row(2, r"(?P<year>\d{4}) fees")], 1)
+
+    assert registry._set.document_type_regex is None
+    assert registry.is_401k_document("2023 fees.pdf")
+    assert registry.match_counts == {2: 1}
+
+def test_invalid_patterns_are_skipped():
+    """Test that a pattern that does not compile does not take the others down"""
+    registry = PatternRegistry()
+    registry.load_rows([_row(1, "(unclosed"), _row(2, "401k")], 1)
+
+    assert [p.pattern_id for p in registry.get_patterns("document_type")] == [2]
+    assert registry.is_401k_document("401k.pdf")
+
+def test_reloads_only_when_patterns_change(conn):
+    """Test that refresh reloads after document_patterns changes and not otherwise"""
+    registry = PatternRegistry(check_interval=0)
+
+    assert registry.refresh(conn)
+    assert not registry.refresh(conn)
+    assert not registry.is_401k_document("fee statement.pdf")
+
+    conn.execute("INSERT INTO document_patterns(pattern_type, pattern) VALUES ('document_type', 'fee statement')")
+    conn.commit()
+    assert registry.refresh(conn)
+    assert registry.is_401k_document("fee statement.pdf")
+
+    conn.execute("UPDATE document_patterns SET is_active = 0 WHERE pattern = 'fee statement'")
+    conn.commit()
+    assert registry.refresh(conn)
+    assert not registry.is_401k_document("fee statement.pdf")
+
+def test_match_counts_from_many_threads():
+    """Test that matches counted concurrently are all recorded"""
+    registry = PatternRegistry()
+    registry.load_rows([_row(1, "401k"), _row(2, "ER", pattern_type="client_name")], 1)
+
+    def classify():
+        for _ in range(2000):
+            registry.is_401k_document("401k.pdf")
+            registry.search("client_name", "ER")
+
+    threads = [threading.Thread(target=classify) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert {p["pattern_id"]: p["match_count"] for p in registry.get_stats()} == {1: 8000, 2: 8000}
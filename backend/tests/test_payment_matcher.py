@@ -0,0 +1,65 @@
+# backend/tests/test_payment_matcher.py
+import pytest
+from utils.payment_matcher import PaymentMatcher
+
+@pytest.fixture
+def conn(migrated_db):
+    conn = migrated_db
+    conn.execute("INSERT INTO providers(provider_id, provider_name) VALUES (1, 'Voya'), (2, 'Ascensus')")
+    conn.executemany(
+        "INSERT INTO contracts(contract_id, client_id, provider_id, provider_name) VALUES (?, ?, ?, ?)",
+        [(1, 1, 1, None), (2, 1, None, "Ascensus"), (3, 2, 1, None)]
+    )
+    payments = [
+        # payment_id, contract_id, client_id, received_date, valid_to
+        (1, 1, 1, "2024-03-10", None),
+        (2, 1, 1, "2024-03-20", None),
+        (3, 1, 1, "2024-04-30", None),          # Outside the window
+        (4, 2, 1, "2024-03-12", None),          # Ascensus, by contract provider name
+        (5, 1, 1, "2024-03-14", "2024-05-01"),  # Superseded
+        (6, 3, 2, "2024-03-15", None),          # Another client
+    ]
+    conn.executemany(
+        "INSERT INTO payments(payment_id, contract_id, client_id, received_date, valid_to) VALUES (?, ?, ?, ?, ?)",
+        payments
+    )
+    conn.commit()
+    return conn
+
+def _matcher(conn):
+    return PaymentMatcher(conn, days_to_match=7, provider_names={1: "Voya", 2: "Ascensus"})
+
+def test_payments_in_the_date_window_are_matched(conn):
+    """Test that only current payments of the client within days_to_match are linked"""
+    matcher = _matcher(conn)
+    matcher.add(10, 1, None, "2024-03-15")
+
+    assert sorted(matcher.resolve()) == [(1, 10), (2, 10), (4, 10)]
+
+def test_provider_filters_through_the_contract(conn):
+    """Test that a provider restricts matches by contract provider_id or provider_name"""
+    matcher = _matcher(conn)
+    matcher.add(10, 1, 1, "2024-03-15")
+    matcher.add(11, 1, 2, "2024-03-15")
+
+    assert sorted(matcher.resolve()) == [(1, 10), (2, 10), (4, 11)]
+
+def test_truncate_drops_later_probes(conn):
+    """Test that probes queued after a rolled-back write are not linked"""
+    matcher = _matcher(conn)
+    matcher.add(10, 1, 1, "2024-03-15")
+    kept = len(matcher)
+    matcher.add(11, 1, 2, "2024-03-15")
+    matcher.add(12, 2, None, "2024-03-15")
+    matcher.truncate(kept)
+
+    with conn:
+        assert matcher.write(conn.cursor()) == 1
+    assert len(matcher) == 0
+    assert sorted(tuple(row) for row in conn.execute("SELECT payment_id, file_id FROM payment_files")) == [(1, 10), (2, 10)]
+
+def test_invalid_dates_are_skipped(conn):
+    """Test that a document date that cannot be parsed queues no probe"""
+    matcher = _matcher(conn)
+    matcher.add(10, 1, None, "March 2024")
+    assert len(matcher) == 0 and matcher.resolve() == []
@@ -0,0 +1,49 @@
+# backend/tests/test_pipeline.py
+import pytest
+from utils.pipeline import Pipeline, Stage
+
+def _items(count):
+    return ({"file_path": f"{i}.pdf", "n": i, "error": None} for i in range(count))
+
+def test_items_flow_through_threaded_and_caller_stages():
+    """Test that every item passes every stage in order, with per-stage counts"""
+    def double(item):
+        item["n"] *= 2
+
+    def skip_odd(item):
+        if item["n"] % 4:
+            item["done"] = True
+
+    pipeline = Pipeline([
+        Stage("double", double, threaded=True),
+        Stage("filter", skip_odd, threaded=True),
+        Stage("record", lambda item: item.update(recorded=True)),
+    ], queue_size=2)
+    results = list(pipeline.run(_items(10)))
+
+    assert [item["n"] for item in results] == [i * 2 for i in range(10)]
+    assert sum(1 for item in results if item.get("recorded")) == 5
+    assert [stage["items"] for stage in pipeline.metrics] == [10, 10, 5]
+
+def test_transient_failures_are_retried():
+    """Test that a locked file is retried and a persistent error marks the item"""
+    attempts = {}
+
+    def flaky(item):
+        attempts[item["n"]] = attempts.get(item["n"], 0) + 1
+        if item["n"] == 0 and attempts[0] < 3:
+            raise PermissionError("file is locked")
+        if item["n"] == 1:
+            raise ValueError("bad document")
+
+    stage = Stage("link", flaky, retries=3, retry_delay=0)
+    results = list(Pipeline([stage]).run(_items(2)))
+
+    assert results[0]["error"] is None and attempts[0] == 3
+    assert results[1]["error"] == "link: bad document" and attempts[1] == 1
+    assert stage.metrics.retries == 2 and stage.metrics.errors == 1
+
+def test_threaded_stages_must_come_first():
+    """Test that a threaded stage after a caller-thread stage is rejected"""
+    with pytest.raises(ValueError):
+        Pipeline([Stage("link", lambda item: None), Stage("match", lambda item: None, threaded=True)])
@@ -0,0 +1,88 @@
+# backend/tests/test_processing_log.py
+import sqlite3
+import threading
+from utils.processing_log import ProcessingLogBuffer, flush_processing_logs
+
+def _log_db():
+    conn = sqlite3.connect(":memory:")
+    conn.execute(
+        """CREATE TABLE processing_log (
+               log_id INTEGER PRIMARY KEY AUTOINCREMENT,
+               file_name TEXT NOT NULL,
+               process_date DATETIME DEFAULT CURRENT_TIMESTAMP,
+               status TEXT NOT NULL,
+               details TEXT,
+               file_id INTEGER
+           )"""
+    )
+    return conn
+
+def _count(conn):
+    return conn.execute("SELECT COUNT(*) FROM processing_log").fetchone()[0]
+
+def test_rows_are_written_in_batches():
+    """Test that rows are held until the batch size is reached"""
+    conn = _log_db()
+    buffer = ProcessingLogBuffer(conn, batch_size=3, flush_seconds=60)
+    buffer.add("a.pdf", "skipped", "Not a 401k document")
+    buffer.add("b.pdf", "processed", "File ID: 1", 1)
+    assert _count(conn) == 0
+    buffer.add("c.pdf", "error", "boom")
+    assert _count(conn) == 3
+    assert len(buffer) == 0
+
+def test_old_rows_and_shutdown_flush():
+    """Test that stale rows flush on the next add and live buffers flush at shutdown"""
+    conn = _log_db()
+    buffer = ProcessingLogBuffer(conn, batch_size=100, flush_seconds=0)
+    buffer.add("a.pdf", "skipped")
+    assert _count(conn) == 1
+
+    buffer = ProcessingLogBuffer(conn, batch_size=100, flush_seconds=60)
+    buffer.add("b.pdf", "skipped")
+    flush_processing_logs()
+    assert _count(conn) == 2
+
+def test_failed_flush_keeps_rows():
+    """Test that rows survive a failed write and go out with the next flush"""
+    conn = sqlite3.connect(":memory:")
+    buffer = ProcessingLogBuffer(conn, batch_size=100, flush_seconds=60)
+    buffer.add("a.pdf", "skipped")
+    assert buffer.flush() == 0
+    assert len(buffer) == 1
+
+    conn.close()
+    buffer.conn = _log_db()
+    assert buffer.flush() == 1
+
+def test_flush_waits_for_open_transaction():
+    """Test that a flush never commits a transaction the caller still has open"""
+    conn = _log_db()
+    buffer = ProcessingLogBuffer(conn, batch_size=1, flush_seconds=60)
+    conn.execute("INSERT INTO processing_log(file_name, status) VALUES ('half.pdf', 'processing')")
+    buffer.add("a.pdf", "processed")
+    assert len(buffer) == 1
+
+    conn.rollback()
+    assert buffer.flush() == 1
+    assert [row[0] for row in conn.execute("SELECT file_name FROM processing_log")] == ["a.pdf"]
+
+def test_other_threads_flush_through_their_own_connection(migrated_db_path):
+    """Test that a buffer owned by another thread is flushed without touching its connection"""
+    buffers = []
+
+    def scan():
+        conn = sqlite3.connect(migrated_db_path)
+        buffer = ProcessingLogBuffer(conn, batch_size=100, flush_seconds=60,
+                                     connect=lambda: sqlite3.connect(migrated_db_path))
+        buffer.add("a.pdf", "processed")
+        buffers.append(buffer)
+
+    thread = threading.Thread(target=scan)
+    thread.start()
+    thread.join()
+
+    assert buffers[0].flush() == 1
+    conn = sqlite3.connect(migrated_db_path)
+    assert _count(conn) == 1
+    conn.close()
@@ -0,0 +1,30 @@
+# backend/tests/test_query_plans.py
+import pytest
+
+from config import settings
+from database.plan_snapshots import capture_plans, load_snapshot, find_regressions, migrated_copy
+
+@pytest.fixture
+def migrated_test_db(tmp_path):
+    """A migrated copy of the test database (the snapshot is taken on one)"""
+    conn = migrated_copy(settings.get_test_db_path(), str(tmp_path / "plans.db"))
+    yield conn
+    conn.close()
+
+def test_no_plan_regressions(migrated_test_db):
+    """Test that no view or endpoint query has regressed to a new full table scan"""
+    snapshot = load_snapshot()
+    if not snapshot:
+        pytest.skip("No query plan snapshot stored")
+    
+    regressions = find_regressions(snapshot, capture_plans(migrated_test_db))
+    assert regressions == {}, f"Query plans regressed to full scans: {regressions}"
+
+def test_snapshot_covers_views(migrated_test_db):
+    """Test that every v_* view has a stored plan"""
+    snapshot = load_snapshot()
+    if not snapshot:
+        pytest.skip("No query plan snapshot stored")
+    
+    missing = [name for name in capture_plans(migrated_test_db) if name.startswith("view.") and name not in snapshot]
+    assert missing == [], f"Views without a plan snapshot (run python -m database.plan_snapshots --test --update): {missing}"
@@ -0,0 +1,17 @@
+# backend/tests/test_reclassifier.py
+from types import SimpleNamespace
+from utils.reclassifier import Reclassifier
+
+def test_link_diff_keeps_manual_links(migrated_db):
+    """Test that reclassifying replaces the matcher's links and leaves links made by hand"""
+    with migrated_db:
+        migrated_db.executemany(
+            "INSERT INTO payment_files(payment_id, file_id, auto_linked) VALUES (?, ?, ?)",
+            [(1, 10, 1), (2, 10, 0), (3, 11, 1)]
+        )
+    reclassifier = Reclassifier(SimpleNamespace(conn=migrated_db))
+    with migrated_db:
+        reclassifier._write_link_diff(migrated_db.cursor(), [10, 11], {(4, 10)})
+
+    rows = migrated_db.execute("SELECT payment_id, file_id, auto_linked FROM payment_files ORDER BY payment_id")
+    assert [tuple(row) for row in rows] == [(2, 10, 0), (4, 10, 1)]
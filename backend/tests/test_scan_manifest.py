@@ -0,0 +1,51 @@
+# backend/tests/test_scan_manifest.py
+from utils.scan_manifest import find_changed_files, update_manifest
+
+FOLDER = "/mail"
+
+def _manifest(conn):
+    return {row[0]: (row[1], row[2]) for row in conn.execute("SELECT file_path, size, mtime_ns FROM scan_manifest")}
+
+def test_only_new_or_changed_files_are_returned(migrated_db):
+    """Test that files already in the manifest with the same size and mtime are skipped"""
+    listing = {"/mail/a.pdf": (10, 1), "/mail/b.pdf": (20, 1)}
+    new, changed = find_changed_files(migrated_db, listing)
+    assert new == changed == ["/mail/a.pdf", "/mail/b.pdf"]
+    update_manifest(migrated_db, FOLDER, listing, changed)
+
+    listing = {"/mail/a.pdf": (10, 1), "/mail/b.pdf": (20, 2), "/mail/c.pdf": (30, 1)}
+    assert find_changed_files(migrated_db, listing) == (["/mail/b.pdf", "/mail/c.pdf"], ["/mail/b.pdf", "/mail/c.pdf"])
+
+def test_known_files_are_changed_but_not_new(migrated_db):
+    """Test that a changed file already in client_files is not processed again"""
+    with migrated_db:
+        migrated_db.execute("INSERT INTO client_files(file_path, original_filename) VALUES ('/mail/a.pdf', 'a.pdf')")
+
+    assert find_changed_files(migrated_db, {"/mail/a.pdf": (10, 1)}) == ([], ["/mail/a.pdf"])
+
+def test_update_manifest_prunes_missing_files(migrated_db):
+    """Test that pruning drops rows for files gone from the folder, and only from that folder"""
+    listing = {"/mail/a.pdf": (10, 1), "/mail/b.pdf": (20, 1)}
+    find_changed_files(migrated_db, listing)
+    update_manifest(migrated_db, FOLDER, listing, listing)
+    other = {"/other/x.pdf": (5, 1)}
+    find_changed_files(migrated_db, other)
+    update_manifest(migrated_db, "/other", other, other)
+
+    listing = {"/mail/a.pdf": (11, 2)}
+    _, changed = find_changed_files(migrated_db, listing)
+    update_manifest(migrated_db, FOLDER, listing, changed)
+
+    assert _manifest(migrated_db) == {"/mail/a.pdf": (11, 2), "/other/x.pdf": (5, 1)}
+
+def test_partial_listing_is_not_pruned(migrated_db):
+    """Test that prune=False keeps rows for files outside the listing"""
+    listing = {"/mail/a.pdf": (10, 1), "/mail/b.pdf": (20, 1)}
+    find_changed_files(migrated_db, listing)
+    update_manifest(migrated_db, FOLDER, listing, listing)
+
+    partial = {"/mail/b.pdf": (21, 2)}
+    find_changed_files(migrated_db, partial)
+    update_manifest(migrated_db, FOLDER, partial, partial, prune=False)
+
+    assert _manifest(migrated_db) == {"/mail/a.pdf": (10, 1), "/mail/b.pdf": (21, 2)}
@@ -0,0 +1,49 @@
+# backend/tests/test_text_extraction.py
+import sys
+import sqlite3
+import pytest
+from utils.text_extraction import ContentExtractor, TextExtractor
+
+class CatExtractor(TextExtractor):
+    """Prints the file, after an optional delay"""
+    name = "cat"
+
+    def __init__(self, delay: float = 0):
+        self.delay = delay
+
+    def command(self, file_path, max_pages):
+        return [sys.executable, "-c",
+                f"import sys, time; time.sleep({self.delay}); sys.stdout.write(open(sys.argv[1]).read())", file_path]
+
+@pytest.fixture
+def connect(migrated_db_path):
+    def connect():
+        conn = sqlite3.connect(migrated_db_path)
+        conn.row_factory = sqlite3.Row
+        return conn
+    return connect
+
+def test_text_is_extracted_once_per_content(connect, tmp_path):
+    """Test that the same content under another name comes from the cache"""
+    first, second = tmp_path / "scan001.pdf", tmp_path / "renamed.pdf"
+    first.write_text("401k Fee Statement for Acme")
+    second.write_text("401k Fee Statement for Acme")
+    content = ContentExtractor(CatExtractor(), connect)
+
+    assert content.submit(str(first)).result() == "401k Fee Statement for Acme"
+    assert content.submit(str(second)).result() == "401k Fee Statement for Acme"
+    assert content.stats == {"cached": 1, "extracted": 1, "failed": 0}
+    content.close()
+
+def test_slow_extractions_time_out_and_are_not_retried(connect, tmp_path):
+    """Test that an extractor running past the timeout is killed and the failure cached"""
+    document = tmp_path / "huge.pdf"
+    document.write_text("never read")
+    content = ContentExtractor(CatExtractor(delay=30), connect, timeout=0.5)
+
+    assert content.get_text(str(document)) is None
+    assert content.get_text(str(document)) is None
+    assert content.stats == {"cached": 1, "extracted": 0, "failed": 1}
+    row = connect().execute("SELECT status FROM document_text").fetchone()
+    assert row["status"] == "timeout"
+    content.close()
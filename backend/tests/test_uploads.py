@@ -0,0 +1,80 @@
+# backend/tests/test_uploads.py
+import io
+import os
+import asyncio
+import pytest
+from config import settings
+from utils.file_manager import FileManager, UploadTooLarge
+
+class _Upload:
+    """Minimal stand-in for UploadFile.read"""
+    def __init__(self, data: bytes):
+        self._data = io.BytesIO(data)
+
+    async def read(self, size: int = -1) -> bytes:
+        return self._data.read(size)
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.setitem(settings.config["files"], "mail_dump", str(tmp_path / "{year}") + "/")
+    monkeypatch.setitem(settings.config["files"], "blob_store", str(tmp_path / ".blobs"))
+    monkeypatch.setitem(settings.config["files"], "max_upload_mb", 1)
+    monkeypatch.setattr(os, "getlogin", lambda: "tester", raising=False)
+    return FileManager(test_mode=True)
+
+def _upload(manager, migrated_db, data: bytes):
+    staged = asyncio.run(manager.stage_upload(_Upload(data), "Fee Q1-21.pdf"))
+    with migrated_db:
+        result = manager.record_upload(migrated_db.cursor(), staged, "Fee Q1-21.pdf")
+    manager.commit_upload(staged)
+    return staged, result
+
+def test_duplicates_are_told_apart_from_updates(manager, migrated_db):
+    """Test that the same content is a duplicate and new content replaces the file in place"""
+    staged, (file_id, status) = _upload(manager, migrated_db, b"first")
+    assert status == "created" and not os.path.exists(staged.temp_path)
+
+    _, (again_id, status) = _upload(manager, migrated_db, b"first")
+    assert (again_id, status) == (file_id, "duplicate")
+
+    _, (updated_id, status) = _upload(manager, migrated_db, b"second")
+    assert (updated_id, status) == (file_id, "updated")
+    with open(staged.file_path, "rb") as f:
+        assert f.read() == b"second"
+    assert migrated_db.execute("SELECT COUNT(*) FROM client_files").fetchone()[0] == 1
+
+def test_rolled_back_update_keeps_the_file(manager, migrated_db):
+    """Test that an update whose transaction rolls back leaves the existing file alone"""
+    staged, _ = _upload(manager, migrated_db, b"first")
+    update = asyncio.run(manager.stage_upload(_Upload(b"second"), "Fee Q1-21.pdf"))
+    with pytest.raises(RuntimeError):
+        with migrated_db:
+            manager.record_upload(migrated_db.cursor(), update, "Fee Q1-21.pdf")
+            raise RuntimeError("payment link failed")
+
+    with open(staged.file_path, "rb") as f:
+        assert f.read() == b"first"
+    assert migrated_db.execute("SELECT content_hash FROM client_files").fetchone()[0] == staged.content_hash
+
+def test_same_content_under_another_name_is_linked(manager, migrated_db):
+    """Test that a second name for stored content is a hard link to the same blob"""
+    staged = asyncio.run(manager.stage_upload(_Upload(b"statement"), "Fee Q1-21.pdf"))
+    with migrated_db:
+        manager.record_upload(migrated_db.cursor(), staged, "Fee Q1-21.pdf")
+    manager.commit_upload(staged)
+    renamed = asyncio.run(manager.stage_upload(_Upload(b"statement"), "Fee Q1-21 (copy).pdf"))
+    with migrated_db:
+        _, status = manager.record_upload(migrated_db.cursor(), renamed, "Fee Q1-21 (copy).pdf")
+    manager.commit_upload(renamed)
+
+    assert status == "created"
+    assert os.path.samefile(staged.file_path, renamed.file_path)
+    assert os.path.samefile(renamed.file_path, manager.blob_store.blob_path(staged.content_hash))
+    assert migrated_db.execute("SELECT COUNT(*) FROM blobs").fetchone()[0] == 1
+
+def test_oversized_upload_leaves_nothing_behind(manager):
+    """Test that an upload over max_upload_mb is rejected and its temporary file removed"""
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(manager.stage_upload(_Upload(b"x" * (1024 * 1024 + 1)), "Big Q1-21.pdf"))
+    folder = manager.path_resolver.get_mail_dump_path(2021)
+    assert os.listdir(folder) == []
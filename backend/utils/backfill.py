@@ -0,0 +1,242 @@
+# backend/utils/backfill.py
+#
+# Backfill of historical mail dump years, run as a "backfill" job on the
+# job queue (utils.job_queue). The job works through the years' folders,
+# newest first, on up to backfill.workers threads (one folder and one
+# DocumentProcessor per thread), in sorted chunks; after every chunk the
+# folder's row in backfill_folders records the last path done and the
+# counts. A job interrupted by a crash or restart is requeued by the queue
+# and resumes after the last finished chunk of each folder.
+#
+# Backfills run at low priority: chunks are small, the file rate (shared by
+# all the job's threads) is capped and the threads wait while the API has
+# served a request within the last idle_seconds.
+import os
+import time
+import logging
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from config import settings
+from database import get_db_connection
+from utils.document_processor import DocumentProcessor
+from utils.job_queue import JobCancelled, JobContext, JobInterrupted, get_job, submit_job
+from utils.path_resolver import PathResolver
+from utils.scan_manifest import list_folder
+
+# Last time the API served an interactive request (time.monotonic)
+_last_activity = 0.0
+
+# How often the job's thread reports progress and checks for cancellation
+REPORT_INTERVAL = 1.0
+
+
+def note_activity():
+    """Record an interactive request; backfills back off for a while after one"""
+    global _last_activity
+    _last_activity = time.monotonic()
+
+
+class Throttle:
+    """Caps the file rate across a backfill's threads and waits for the API to be idle"""
+    def __init__(self, files_per_second: float, idle_seconds: float, stop: threading.Event):
+        self.files_per_second = float(files_per_second)
+        self.idle_seconds = float(idle_seconds)
+        self.stop = stop
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self, files: int):
+        """
+        Pause after a chunk of ``files`` files; raises JobInterrupted once
+        the job is stopping
+        """
+        if self.files_per_second > 0:
+            with self._lock:
+                self._next = max(self._next, time.monotonic()) + files / self.files_per_second
+                delay = self._next - time.monotonic()
+            self.stop.wait(max(0.0, delay))
+        while not self.stop.is_set() and time.monotonic() - _last_activity < self.idle_seconds:
+            self.stop.wait(0.2)
+        if self.stop.is_set():
+            raise JobInterrupted()
+
+
+class BackfillRunner:
+    """Processes the unfinished folders of one backfill job"""
+    def __init__(self, context: JobContext):
+        config = settings.get_backfill_config()
+        self.context = context
+        self.job_id = context.job_id
+        self.workers = max(1, int(config["workers"]))
+        self.chunk_size = max(1, int(config["chunk_size"]))
+        # Set by the job's thread; the folder threads stop after their chunk
+        self._stop = threading.Event()
+        self.throttle = Throttle(config["max_files_per_second"], config["idle_seconds"], self._stop)
+        self._lock = threading.Lock()
+        self._progress: Dict[int, Tuple[int, int]] = {}
+
+    def run(self, start_year: int, end_year: int) -> Dict:
+        conn = get_db_connection(test_mode=self.context.test_mode)
+        try:
+            # First start: one checkpoint row per folder; a resumed job keeps its rows
+            path_resolver = PathResolver(test_mode=self.context.test_mode)
+            with conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO backfill_folders(job_id, year, folder) VALUES (?, ?, ?)",
+                    [(self.job_id, year, path_resolver.get_mail_dump_path(year))
+                     for year in range(start_year, end_year + 1)]
+                )
+            years = [row[0] for row in conn.execute(
+                "SELECT year FROM backfill_folders WHERE job_id = ? AND status IN ('pending', 'running') ORDER BY year DESC",
+                (self.job_id,)
+            ).fetchall()]
+            logging.info(f"Backfill job {self.job_id}: {len(years)} folders on {min(self.workers, len(years))} threads")
+
+            if years:
+                self._run_folders(years)
+            status = get_backfill_status(conn, self.job_id)
+        finally:
+            conn.close()
+
+        failed = [folder["year"] for folder in status["folders"] if folder["status"] == "failed"]
+        if failed:
+            raise RuntimeError(f"Backfill of {', '.join(map(str, failed))} failed")
+        return {key: status[key] for key in ("total_files", "done_files", "processed", "errors")}
+
+    def _run_folders(self, years):
+        # The context (and its connection) stays on this thread: it reports
+        # the folder threads' progress and notices cancellation for them
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(years)), thread_name_prefix="backfill") as pool:
+            futures = [pool.submit(self._backfill_folder, year) for year in years]
+            try:
+                while wait(futures, timeout=REPORT_INTERVAL).not_done:
+                    self._report()
+                    self.context.check_cancelled()
+            except (JobCancelled, JobInterrupted):
+                self._stop.set()
+                pool.shutdown(wait=True, cancel_futures=True)
+                raise
+        for future in futures:
+            future.result()
+        self._report()
+
+    def _report(self):
+        with self._lock:
+            done = sum(progress[0] for progress in self._progress.values())
+            total = sum(progress[1] for progress in self._progress.values())
+            detail = ", ".join(str(year) for year in sorted(self._progress))
+        self.context.progress(done, total or None, detail=detail or None)
+
+    def _backfill_folder(self, year: int):
+        # Each thread processes its folder on its own processor and connection
+        processor = DocumentProcessor(test_mode=self.context.test_mode)
+        conn = processor.conn
+        try:
+            folder = conn.execute(
+                "SELECT * FROM backfill_folders WHERE job_id = ? AND year = ?",
+                (self.job_id, year)
+            ).fetchone()
+            if not os.path.isdir(folder['folder']):
+                logging.warning(f"Backfill: mail dump folder for {year} does not exist: {folder['folder']}")
+                self._update(conn, year, status='missing')
+                return
+
+            listing = list_folder(folder['folder'])
+            paths = sorted(listing)
+            last_path = folder['last_path']
+            remaining = [path for path in paths if last_path is None or path > last_path]
+            done = len(paths) - len(remaining)
+            self._update(conn, year, status='running', total_files=len(paths), done_files=done)
+            with self._lock:
+                self._progress[year] = (done, len(paths))
+
+            for i in range(0, len(remaining), self.chunk_size):
+                chunk = remaining[i:i + self.chunk_size]
+                processor.failed_paths = set()
+                processed_ids = processor.process_listing(
+                    folder['folder'], {path: listing[path] for path in chunk}, prune=False
+                )
+                with conn:
+                    conn.execute(
+                        """UPDATE backfill_folders
+                           SET done_files = done_files + ?, processed = processed + ?, errors = errors + ?,
+                               last_path = ?, updated_at = CURRENT_TIMESTAMP
+                           WHERE job_id = ? AND year = ?""",
+                        (len(chunk), len(processed_ids), len(processor.failed_paths), chunk[-1], self.job_id, year)
+                    )
+                done += len(chunk)
+                with self._lock:
+                    self._progress[year] = (done, len(paths))
+                self.throttle.wait(len(chunk))
+
+            self._update(conn, year, status='done')
+        except JobInterrupted:
+            # The folder stays 'running' so a resumed job picks it up again
+            raise
+        except Exception as e:
+            logging.error(f"Backfill of {year} failed: {str(e)}")
+            self._update(conn, year, status='failed', error=str(e))
+        finally:
+            processor.close()
+
+    def _update(self, conn, year: int, **fields):
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        started = ", started_at = COALESCE(started_at, CURRENT_TIMESTAMP)" if fields.get("status") == "running" else ""
+        with conn:
+            conn.execute(
+                f"UPDATE backfill_folders SET {assignments}{started}, updated_at = CURRENT_TIMESTAMP "
+                "WHERE job_id = ? AND year = ?",
+                (*fields.values(), self.job_id, year)
+            )
+
+
+def start_backfill(conn: sqlite3.Connection, start_year: int, end_year: int) -> Tuple[Dict, bool]:
+    """
+    Queue a backfill job for a range of years
+
+    Returns:
+        (job, created): created is False when a backfill was already queued
+        or running (that job is returned)
+    """
+    if start_year > end_year:
+        raise ValueError("start_year must not be after end_year")
+    if end_year > datetime.now().year:
+        raise ValueError("end_year is in the future")
+    # One backfill at a time, whatever its years
+    return submit_job(conn, "backfill", {"start_year": start_year, "end_year": end_year}, dedupe_key="backfill")
+
+
+def get_backfill_status(conn: sqlite3.Connection, job_id: Optional[int] = None) -> Optional[Dict]:
+    """
+    Return a backfill job with per-folder progress (the latest job by default)
+    """
+    if job_id is None:
+        row = conn.execute(
+            "SELECT job_id FROM jobs WHERE job_type = 'backfill' ORDER BY job_id DESC LIMIT 1"
+        ).fetchone()
+        if not row:
+            return None
+        job_id = row[0]
+    job = get_job(conn, job_id)
+    if not job or job["job_type"] != "backfill":
+        return None
+
+    status = dict(job)
+    status["folders"] = [dict(row) for row in conn.execute(
+        "SELECT * FROM backfill_folders WHERE job_id = ? ORDER BY year", (job_id,)
+    ).fetchall()]
+    total = sum(folder["total_files"] or 0 for folder in status["folders"])
+    done = sum(folder["done_files"] for folder in status["folders"])
+    status.update({
+        "total_files": total,
+        "done_files": done,
+        "processed": sum(folder["processed"] for folder in status["folders"]),
+        "errors": sum(folder["errors"] for folder in status["folders"]),
+        "percent": round(100.0 * done / total, 1) if total else None,
+        "active": job["status"] == "running"
+    })
+    return status
@@ -0,0 +1,278 @@
+# backend/utils/blob_store.py
+#
+# Content-addressed storage for documents. Every distinct content is kept
+# once, under its SHA-256, in the blob store folder (files.blob_store,
+# mail/.blobs/ by default); the names in the mail dump are hard links to
+# the blobs and client_files.content_hash points at them. Uploading a
+# file whose content is already stored only adds a link and a row.
+#
+# Hard links need the blob store and the mail dump on the same volume;
+# where they cannot be created the file is copied instead, which keeps
+# everything working without the space saving.
+#
+# The dedupe report finds identical files in existing mail dump folders
+# (comparing sizes first, so only files of equal size are hashed) and
+# can turn the copies into links to one blob:
+#
+#   python -m utils.blob_store 2019 2024 [--test] [--apply]
+import os
+import sys
+import uuid
+import shutil
+import hashlib
+import logging
+import argparse
+import sqlite3
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from database import get_db_connection
+from utils.path_resolver import PathResolver
+from utils.scan_manifest import list_folder
+
+# Bytes read at a time when hashing
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(file_path: str) -> str:
+    """SHA-256 of a file's content"""
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+class BlobStore:
+    """Files stored once by content hash, linked into place by name"""
+    def __init__(self, root: str):
+        self.root = root
+
+    def blob_path(self, content_hash: str) -> str:
+        # Two-character fan-out keeps folders small
+        return os.path.join(self.root, content_hash[:2], content_hash)
+
+    def has(self, content_hash: str) -> bool:
+        return os.path.exists(self.blob_path(content_hash))
+
+    def put(self, temp_path: str, content_hash: str) -> bool:
+        """
+        Move a file with the given hash into the store, or drop it if that
+        content is stored already
+
+        Returns:
+            True if the content was new
+        """
+        blob_path = self.blob_path(content_hash)
+        if os.path.exists(blob_path):
+            os.remove(temp_path)
+            return False
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        os.replace(temp_path, blob_path)
+        return True
+
+    def adopt(self, file_path: str, content_hash: str) -> bool:
+        """
+        Make an existing file the blob for its content (as a hard link, so
+        nothing is copied) unless that content is stored already
+
+        Returns:
+            True if the content was new
+        """
+        blob_path = self.blob_path(content_hash)
+        if os.path.exists(blob_path):
+            return False
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        self._place(file_path, blob_path)
+        return True
+
+    def link(self, content_hash: str, dest_path: str) -> bool:
+        """
+        Atomically put the blob at dest_path (replacing any file there)
+
+        Returns:
+            True if dest_path is a hard link to the blob, False if it had
+            to be copied
+        """
+        blob_path = self.blob_path(content_hash)
+        try:
+            if os.path.samefile(blob_path, dest_path):
+                return True
+        except OSError:
+            pass
+        return self._place(blob_path, dest_path)
+
+    @staticmethod
+    def _place(source: str, dest_path: str) -> bool:
+        # Linked (or copied) to a temporary name first, then renamed over dest_path
+        temp_path = os.path.join(os.path.dirname(dest_path), f".{os.path.basename(dest_path)}.{uuid.uuid4().hex}.part")
+        try:
+            try:
+                os.link(source, temp_path)
+                linked = True
+            except OSError as e:
+                logging.warning(f"Could not hard link {dest_path}, copying instead: {str(e)}")
+                shutil.copyfile(source, temp_path)
+                linked = False
+            os.replace(temp_path, dest_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return linked
+
+    @staticmethod
+    def record(cursor: sqlite3.Cursor, content_hash: str, size: int):
+        """Register a blob (in the caller's transaction)"""
+        cursor.execute(
+            "INSERT OR IGNORE INTO blobs(content_hash, size) VALUES (?, ?)",
+            (content_hash, size)
+        )
+
+
+def get_blob_store(path_resolver: Optional[PathResolver] = None) -> BlobStore:
+    """Return the blob store configured in files.blob_store"""
+    return BlobStore((path_resolver or PathResolver()).get_blob_store_path())
+
+
+def dedupe_report(folders: List[str]) -> Dict:
+    """
+    Find files with identical content in the given folders
+
+    Only files that share their size with another file are hashed. Names
+    that are already hard links to one file count as a single copy.
+
+    Returns:
+        Dict with totals and the duplicate groups, most wasted space first
+    """
+    by_size = defaultdict(list)
+    files = total_bytes = 0
+    for folder in folders:
+        if not os.path.isdir(folder):
+            continue
+        for path, (size, _) in list_folder(folder).items():
+            by_size[size].append(path)
+            files += 1
+            total_bytes += size
+
+    by_hash = defaultdict(list)
+    hashed = 0
+    for size, paths in by_size.items():
+        if len(paths) < 2:
+            continue
+        for path in paths:
+            try:
+                by_hash[(size, hash_file(path))].append(path)
+                hashed += 1
+            except OSError as e:
+                logging.warning(f"Could not hash {path}: {str(e)}")
+
+    groups = []
+    for (size, content_hash), paths in by_hash.items():
+        if len(paths) < 2:
+            continue
+        copies = set()
+        for path in paths:
+            try:
+                stat = os.stat(path)
+                copies.add((stat.st_dev, stat.st_ino) if stat.st_ino else path)
+            except OSError:
+                copies.add(path)
+        groups.append({
+            "content_hash": content_hash,
+            "size": size,
+            "paths": sorted(paths),
+            "copies": len(copies),
+            "wasted_bytes": size * (len(copies) - 1)
+        })
+    groups.sort(key=lambda group: -group["wasted_bytes"])
+
+    return {
+        "folders": folders,
+        "files": files,
+        "bytes": total_bytes,
+        "hashed_files": hashed,
+        "duplicate_groups": groups,
+        "duplicate_files": sum(len(group["paths"]) - 1 for group in groups),
+        "wasted_bytes": sum(group["wasted_bytes"] for group in groups)
+    }
+
+
+def apply_dedupe(conn: sqlite3.Connection, store: BlobStore, report: Dict) -> Dict:
+    """
+    Replace the duplicate copies in a report with hard links to one blob
+    and point their client_files rows at it
+
+    Returns:
+        Counts of groups stored, names linked and bytes freed
+    """
+    counts = {"groups": 0, "linked": 0, "freed_bytes": 0}
+    for group in report["duplicate_groups"]:
+        content_hash, paths = group["content_hash"], group["paths"]
+        stored = False
+        done = []
+        linked = 0
+        for path in paths:
+            try:
+                # Content may have changed since the report was made; each
+                # file is checked right before it is replaced
+                if hash_file(path) != content_hash:
+                    logging.warning(f"{path} changed since the report; skipped")
+                    continue
+                if not stored:
+                    store.adopt(path, content_hash)
+                    stored = True
+                linked += store.link(content_hash, path)
+                done.append(path)
+            except OSError as e:
+                logging.error(f"Could not dedupe {path}: {str(e)}")
+        if not done:
+            continue
+
+        with conn:
+            store.record(conn.cursor(), content_hash, group["size"])
+            conn.executemany(
+                "UPDATE client_files SET content_hash = ?, file_size = ? WHERE file_path = ?",
+                [(content_hash, group["size"], path) for path in done]
+            )
+        counts["groups"] += 1
+        counts["linked"] += linked
+        if linked == len(paths):
+            counts["freed_bytes"] += group["wasted_bytes"]
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report (and optionally remove) duplicate files in mail dump folders")
+    parser.add_argument("start_year", type=int, help="First mail dump year")
+    parser.add_argument("end_year", type=int, help="Last mail dump year")
+    parser.add_argument("--test", action="store_true", help="Use the test database")
+    parser.add_argument("--apply", action="store_true", help="Replace duplicates with hard links to one stored copy")
+    parser.add_argument("--limit", type=int, default=20, help="Duplicate groups to list")
+    args = parser.parse_args()
+
+    path_resolver = PathResolver(test_mode=args.test)
+    folders = [path_resolver.get_mail_dump_path(year) for year in range(args.start_year, args.end_year + 1)]
+    report = dedupe_report(folders)
+
+    print(f"{report['files']} files ({report['bytes'] / 1048576:.1f} MB), {report['hashed_files']} hashed")
+    print(f"{len(report['duplicate_groups'])} groups with identical content, "
+          f"{report['duplicate_files']} extra copies, {report['wasted_bytes'] / 1048576:.1f} MB reclaimable")
+    for group in report["duplicate_groups"][:args.limit]:
+        print(f"\n{group['content_hash'][:12]}  {group['size']} bytes x {group['copies']} copies")
+        for path in group["paths"]:
+            print(f"    {path}")
+
+    if args.apply:
+        conn = get_db_connection(test_mode=args.test)
+        try:
+            counts = apply_dedupe(conn, get_blob_store(path_resolver), report)
+        finally:
+            conn.close()
+        print(f"\nLinked {counts['linked']} files in {counts['groups']} groups, "
+              f"freed {counts['freed_bytes'] / 1048576:.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
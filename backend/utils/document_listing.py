@@ -0,0 +1,118 @@
+# backend/utils/document_listing.py
+#
+# Filterable, paginated listing of documents. Every filter is answered by
+# an index: clients through document_client_mentions (plus the client a
+# document was uploaded for), providers and dates through client_files
+# and the extracted_provider generated column, match status through the
+# mentions. Pages are keyed on (document_date, file_id), newest first, so
+# a page costs the same however deep into the list it is. Filters are
+# written as IN (subquery) so the planner can start from the mentions when
+# they are the selective side (e.g. the few unmatched names).
+import sqlite3
+from typing import Any, Dict, List, Optional
+
+MATCH_STATUSES = ("matched", "review", "rejected", "unmatched")
+
+
+def _parse_cursor(cursor: str):
+    document_date, _, file_id = cursor.rpartition(":")
+    try:
+        return document_date or None, int(file_id)
+    except ValueError:
+        raise ValueError(f"Invalid cursor '{cursor}'")
+
+
+def list_documents(conn: sqlite3.Connection, client_id: Optional[int] = None, provider_id: Optional[int] = None,
+                   extracted_provider: Optional[str] = None, start_date: Optional[str] = None,
+                   end_date: Optional[str] = None, match_status: Optional[str] = None,
+                   after: Optional[str] = None, limit: int = 50) -> Dict[str, Any]:
+    """
+    One page of documents matching all of the given filters, newest first
+
+    Args:
+        client_id: Documents mentioning (or uploaded for) this client
+        provider_id: Documents of this provider
+        extracted_provider: Documents whose extracted provider name is this
+        start_date: First document_date (YYYY-MM-DD), inclusive
+        end_date: Last document_date (YYYY-MM-DD), inclusive
+        match_status: Documents with at least one client mention in this
+            state ('unmatched' finds names that matched no client)
+        after: next_cursor of the previous page
+        limit: Page size
+
+    Returns:
+        Dict with the documents (each with its client mentions) and the
+        cursor of the next page (None on the last page)
+    """
+    conditions, params = [], []
+    if client_id is not None:
+        conditions.append(
+            "(cf.client_id = ? OR cf.file_id IN (SELECT m.file_id FROM document_client_mentions m WHERE m.client_id = ?))"
+        )
+        params += [client_id, client_id]
+    if provider_id is not None:
+        conditions.append("cf.provider_id = ?")
+        params.append(provider_id)
+    if extracted_provider:
+        conditions.append("cf.extracted_provider = ?")
+        params.append(extracted_provider)
+    if start_date:
+        conditions.append("cf.document_date >= ?")
+        params.append(start_date)
+    if end_date:
+        conditions.append("cf.document_date <= ?")
+        params.append(end_date)
+    if match_status:
+        if match_status not in MATCH_STATUSES:
+            raise ValueError(f"Unknown match status '{match_status}'")
+        conditions.append(
+            "cf.file_id IN (SELECT m.file_id FROM document_client_mentions m WHERE m.match_status = ?)"
+        )
+        params.append(match_status)
+    if after:
+        # Undated documents sort last
+        after_date, after_id = _parse_cursor(after)
+        if after_date is None:
+            conditions.append("(cf.document_date IS NULL AND cf.file_id < ?)")
+            params.append(after_id)
+        else:
+            conditions.append("((cf.document_date, cf.file_id) < (?, ?) OR cf.document_date IS NULL)")
+            params += [after_date, after_id]
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    rows = conn.execute(
+        f"""SELECT cf.file_id, cf.file_path, cf.original_filename, cf.document_date, cf.upload_date,
+                   cf.provider_id, cf.extracted_provider, cf.client_id, cf.is_processed, cf.content_hash
+            FROM client_files cf
+            {where}
+            ORDER BY cf.document_date DESC, cf.file_id DESC
+            LIMIT ?""",
+        params + [limit + 1]
+    ).fetchall()
+
+    documents = [dict(row) for row in rows[:limit]]
+    _attach_mentions(conn, documents)
+    next_cursor = None
+    if len(rows) > limit:
+        last = documents[-1]
+        next_cursor = f"{last['document_date'] or ''}:{last['file_id']}"
+    return {"documents": documents, "next_cursor": next_cursor}
+
+
+def _attach_mentions(conn: sqlite3.Connection, documents: List[Dict]):
+    """Add each document's client mentions, in one query for the page"""
+    by_id = {document["file_id"]: document for document in documents}
+    for document in documents:
+        document["mentions"] = []
+    if not by_id:
+        return
+    placeholders = ", ".join("?" for _ in by_id)
+    for row in conn.execute(
+        f"""SELECT file_id, extracted_name, client_id, match_status
+            FROM document_client_mentions
+            WHERE file_id IN ({placeholders})
+            ORDER BY mention_id""",
+        list(by_id)
+    ).fetchall():
+        mention = dict(row)
+        by_id[mention.pop("file_id")]["mentions"].append(mention)
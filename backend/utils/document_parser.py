@@ -0,0 +1,203 @@
+# backend/utils/document_parser.py
+#
+# Filename parsing and name matching for mail dump documents. Everything
+# here works on in-memory data (the compiled pattern registry and the name
+# indexes), so it can run in worker processes as well as in the
+# DocumentProcessor.
+import os
+import re
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from utils.pattern_registry import PatternRegistry
+from utils.name_index import NameResolver, DEFAULT_MATCH_THRESHOLD
+
+
+class DocumentParser:
+    """
+    Extracts provider, clients and date from a document filename and
+    resolves the names to ids
+    """
+    def __init__(self, patterns: PatternRegistry, names: NameResolver):
+        self.patterns = patterns
+        self.names = names
+    
+    def is_401k_document(self, filename: str) -> bool:
+        """Check if a file is a 401k payment document based on patterns"""
+        return self.patterns.is_401k_document(filename)
+    
+    def extract_provider_name(self, filename: str) -> Optional[str]:
+        """Extract provider name from filename using patterns"""
+        result = self.patterns.search('provider_pattern', filename)
+        if result:
+            return result[1].group(1).strip()
+        
+        return None
+    
+    def extract_client_list(self, filename: str) -> List[str]:
+        """Extract list of client names from filename"""
+        patterns = self.patterns
+        
+        # First try to extract the client list section
+        client_section = None
+        result = patterns.search('client_list_pattern', filename)
+        if result:
+            client_section = result[1].group(1).strip()
+        
+        if not client_section:
+            # Try a fallback approach - look for text between known markers
+            # For example, between "Fee" and a date
+            base_name = os.path.splitext(filename)[0]
+            fee_match = re.search(r'Fee[s]?\s+(.+?)(?:\d{1,2}\.\d{1,2}\.\d{2,4}|\sQ[1-4]|\srecvd)', base_name, re.IGNORECASE)
+            if fee_match:
+                client_section = fee_match.group(1).strip()
+            else:
+                # Another fallback - look between provider and date
+                provider = self.extract_provider_name(filename)
+                if provider:
+                    provider_match = re.search(re.escape(provider) + r'\s*[-:]\s*(?:401[kK].*?Fee[s]?\s*[-:]?\s*)?(.+?)(?:\d{1,2}\.\d{1,2}\.\d{2,4}|\sQ[1-4]|-\s*\d{1,2}\.\d{1,2}\.\d{2,4}|\srecvd)', filename, re.IGNORECASE)
+                    if provider_match:
+                        client_section = provider_match.group(1).strip()
+        
+        if not client_section:
+            return []
+        
+        # Now split the client section using delimiters
+        clients = [client_section]  # Start with the whole section
+        
+        for delimiter in patterns.get_patterns('client_delimiter'):
+            # Create a new list by splitting all current entries
+            new_clients = []
+            for client in clients:
+                split_clients = delimiter.regex.split(client)
+                new_clients.extend([c.strip() for c in split_clients if c.strip()])
+            clients = new_clients
+        
+        return clients
+    
+    def extract_document_date(self, filename: str) -> Optional[str]:
+        """Extract date from filename and convert to YYYY-MM-DD format"""
+        result = self.patterns.search('date_pattern', filename)
+        
+        if result:
+            compiled, match = result
+            # Handle different date formats
+            if 'Q' in compiled.pattern:
+                # Handle quarter format (Q1-24)
+                quarter = int(match.group(1))
+                year_str = match.group(2)
+                
+                # Convert to full year if 2-digit
+                if len(year_str) == 2:
+                    year = int(year_str)
+                    if year < 50:
+                        year = 2000 + year
+                    else:
+                        year = 1900 + year
+                else:
+                    year = int(year_str)
+                
+                # Map quarter to middle month
+                month = (quarter * 3) - 1
+                return f"{year}-{month:02d}-15"
+            else:
+                # Handle MM.DD.YY format
+                month = int(match.group(1))
+                day = int(match.group(2))
+                year_str = match.group(3) if len(match.groups()) >= 3 else "20"
+                
+                # Convert to full year if 2-digit
+                if len(year_str) == 2:
+                    year = int(year_str)
+                    if year < 50:
+                        year = 2000 + year
+                    else:
+                        year = 1900 + year
+                else:
+                    year = int(year_str)
+                
+                return f"{year}-{month:02d}-{day:02d}"
+    
+        # If no date found, use current date
+        return datetime.now().strftime("%Y-%m-%d")
+    
+    def classify(self, file_path: str) -> Dict:
+        """
+        Start a parse result for a file and decide whether it is a 401k
+        document (the later steps only apply to those)
+        """
+        filename = os.path.basename(file_path)
+        return {
+            "file_path": file_path,
+            "filename": filename,
+            "is_401k": self.is_401k_document(filename),
+            "error": None
+        }
+    
+    def classify_text(self, result: Dict, text: str) -> Dict:
+        """
+        Second chance for a file whose name is not recognised: classify it
+        by its extracted text, which the later steps then also use
+        """
+        if text and self.patterns.is_401k_document(text):
+            result.update({"is_401k": True, "classified_by": "content", "text": text})
+        return result
+    
+    def extract(self, result: Dict) -> Dict:
+        """
+        Add the provider name, client names and document date from the
+        filename, filling what it lacks from the document text if there is any
+        """
+        filename = result["filename"]
+        result.update({
+            "provider_name": self.extract_provider_name(filename),
+            "client_names": self.extract_client_list(filename),
+            "document_date": self.extract_document_date(filename)
+        })
+        
+        text = result.get("text")
+        if text:
+            if not result["provider_name"]:
+                result["provider_name"] = self.extract_provider_name(text) or self.names.find_provider_in_text(text)
+            if not result["client_names"]:
+                result["client_names"] = self.names.find_clients_in_text(text)
+            if not self.patterns.search('date_pattern', filename) and self.patterns.search('date_pattern', text):
+                result["document_date"] = self.extract_document_date(text)
+        return result
+    
+    def match(self, result: Dict, threshold: float = DEFAULT_MATCH_THRESHOLD) -> Dict:
+        """Resolve the extracted provider and client names to ids"""
+        clients = []
+        for client_name in result["client_names"]:
+            client_id, candidates = self.names.resolve_client(client_name, threshold)
+            clients.append({"name": client_name, "client_id": client_id, "candidates": candidates})
+        
+        provider_name = result["provider_name"]
+        result.update({
+            "provider_id": self.names.match_provider(provider_name) if provider_name else None,
+            "clients": clients
+        })
+        return result
+    
+    def parse(self, file_path: str, threshold: float = DEFAULT_MATCH_THRESHOLD, text: Optional[str] = None) -> Dict:
+        """
+        Parse one document without touching the database (classify,
+        extract and match in one call); text, if given, is the document's
+        extracted text for when the filename is not enough
+        
+        Returns:
+            Dict with file_path, filename, is_401k and, for 401k documents,
+            provider_name, provider_id, client_names, document_date and
+            clients ({"name", "client_id", "candidates"} per extracted
+            name). "error" is set if parsing failed.
+        """
+        result = {"file_path": file_path, "filename": os.path.basename(file_path), "is_401k": False, "error": None}
+        try:
+            result = self.classify(file_path)
+            if not result["is_401k"] and text:
+                self.classify_text(result, text)
+            if result["is_401k"]:
+                self.match(self.extract(result), threshold)
+        except Exception as e:
+            result["error"] = str(e)
+        return result
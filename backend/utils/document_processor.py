@@ -1,16 +1,27 @@
 # backend/utils/document_processor.py
 import os
-import re
+import time
 import logging
-from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Tuple
+from datetime import datetime
+from typing import Callable, List, Dict, Optional, Tuple
 import sqlite3
-from pathlib import Path
 import json
 
+from config import settings
 from database import get_db_connection
+from database.maintenance import refresh_stats_after_bulk_load
 from utils.path_resolver import PathResolver
 from utils.file_manager import FileManager
+from utils.pattern_registry import get_pattern_registry
+from utils.document_parser import DocumentParser
+from utils.link_writer import LinkBatch
+from utils.parallel_processing import process_files_parallel
+from utils.payment_matcher import PaymentMatcher, get_days_to_match
+from utils.processing_log import ProcessingLogBuffer
+from utils.pipeline import Pipeline, Stage, StageMetrics, record_run
+from utils.scan_manifest import list_folder, find_changed_files, update_manifest
+from utils.text_extraction import get_content_extractor
+from utils.name_index import get_name_resolver, split_variants, DEFAULT_MATCH_THRESHOLD
 
 
 class DocumentProcessor:
@@ -23,264 +34,414 @@ class DocumentProcessor:
         self.file_manager = FileManager(test_mode=test_mode)
         self.test_mode = test_mode
         self.conn = get_db_connection(test_mode=test_mode)
+        self.pattern_registry = get_pattern_registry(test_mode)
+        self.name_resolver = get_name_resolver(test_mode)
+        self.failed_paths = set()
+        self.days_to_match = None
+        config = settings.get_processing_config()
+        self.processing_log = ProcessingLogBuffer(
+            self.conn, config["log_batch_size"], config["log_flush_seconds"],
+            connect=lambda: get_db_connection(test_mode=test_mode)
+        )
         
     def __del__(self):
         """Close database connection on cleanup"""
-        if hasattr(self, 'conn') and self.conn:
+        self.close()
+    
+    def close(self):
+        """Flush buffered log rows and close the database connection"""
+        if getattr(self, 'conn', None):
+            if hasattr(self, 'processing_log'):
+                self.processing_log.close()
             self.conn.close()
+            self.conn = None
+    
+    @property
+    def patterns(self):
+        """Compiled document patterns, reloaded when document_patterns changes"""
+        self.pattern_registry.refresh(self.conn)
+        return self.pattern_registry
+    
+    @property
+    def names(self):
+        """Client and provider name indexes, rebuilt when those tables change"""
+        self.name_resolver.refresh(self.conn)
+        return self.name_resolver
+    
+    @property
+    def parser(self):
+        """Filename parser over the current patterns and name indexes"""
+        return DocumentParser(self.patterns, self.names)
     
     def get_document_patterns(self, pattern_type: str) -> List[Dict]:
-        """Get document recognition patterns from the database"""
-        patterns = self.conn.execute(
-            """SELECT pattern_id, pattern, description, priority 
-               FROM document_patterns 
-               WHERE pattern_type = ? 
-               AND is_active = 1
-               ORDER BY priority DESC""",
-            (pattern_type,)
-        ).fetchall()
-        
-        return [dict(p) for p in patterns]
+        """Get document recognition patterns (served from the pattern registry)"""
+        return [p.to_dict() for p in self.patterns.get_patterns(pattern_type)]
     
     def is_401k_document(self, filename: str) -> bool:
         """Check if a file is a 401k payment document based on patterns"""
-        doc_type_patterns = self.get_document_patterns('document_type')
-        
-        for pattern_dict in doc_type_patterns:
-            pattern = pattern_dict['pattern']
-            if re.search(pattern, filename, re.IGNORECASE):
-                return True
-        
-        return False
+        return self.parser.is_401k_document(filename)
     
     def extract_provider_name(self, filename: str) -> Optional[str]:
         """Extract provider name from filename using patterns"""
-        provider_patterns = self.get_document_patterns('provider_pattern')
-        
-        for pattern_dict in provider_patterns:
-            pattern = pattern_dict['pattern']
-            match = re.search(pattern, filename)
-            if match:
-                return match.group(1).strip()
-        
-        return None
+        return self.parser.extract_provider_name(filename)
     
     def extract_client_list(self, filename: str) -> List[str]:
         """Extract list of client names from filename"""
-        client_list_patterns = self.get_document_patterns('client_list_pattern')
-        client_delimiters = self.get_document_patterns('client_delimiter')
-        
-        # First try to extract the client list section
-        client_section = None
-        for pattern_dict in client_list_patterns:
-            pattern = pattern_dict['pattern']
-            match = re.search(pattern, filename)
-            if match:
-                client_section = match.group(1).strip()
-                break
-        
-        if not client_section:
-            # Try a fallback approach - look for text between known markers
-            # For example, between "Fee" and a date
-            base_name = os.path.splitext(filename)[0]
-            fee_match = re.search(r'Fee[s]?\s+(.+?)(?:\d{1,2}\.\d{1,2}\.\d{2,4}|\sQ[1-4]|\srecvd)', base_name, re.IGNORECASE)
-            if fee_match:
-                client_section = fee_match.group(1).strip()
-            else:
-                # Another fallback - look between provider and date
-                provider = self.extract_provider_name(filename)
-                if provider:
-                    provider_match = re.search(re.escape(provider) + r'\s*[-:]\s*(?:401[kK].*?Fee[s]?\s*[-:]?\s*)?(.+?)(?:\d{1,2}\.\d{1,2}\.\d{2,4}|\sQ[1-4]|-\s*\d{1,2}\.\d{1,2}\.\d{2,4}|\srecvd)', filename, re.IGNORECASE)
-                    if provider_match:
-                        client_section = provider_match.group(1).strip()
-        
-        if not client_section:
-            return []
-        
-        # Now split the client section using delimiters
-        clients = [client_section]  # Start with the whole section
-        
-        for delimiter_dict in client_delimiters:
-            delimiter = delimiter_dict['pattern']
-            # Create a new list by splitting all current entries
-            new_clients = []
-            for client in clients:
-                split_clients = re.split(delimiter, client)
-                new_clients.extend([c.strip() for c in split_clients if c.strip()])
-            clients = new_clients
-        
-        return clients
+        return self.parser.extract_client_list(filename)
     
     def extract_document_date(self, filename: str) -> Optional[str]:
         """Extract date from filename and convert to YYYY-MM-DD format"""
-        date_patterns = self.get_document_patterns('date_pattern')
-        
-        for pattern_dict in date_patterns:
-            pattern = pattern_dict['pattern']
-            match = re.search(pattern, filename)
-            if match:
-                # Handle different date formats
-                if 'Q' in pattern:
-                    # Handle quarter format (Q1-24)
-                    quarter = int(match.group(1))
-                    year_str = match.group(2)
-                    
-                    # Convert to full year if 2-digit
-                    if len(year_str) == 2:
-                        year = int(year_str)
-                        if year < 50:
-                            year = 2000 + year
-                        else:
-                            year = 1900 + year
-                    else:
-                        year = int(year_str)
-                    
-                    # Map quarter to middle month
-                    month = (quarter * 3) - 1
-                    return f"{year}-{month:02d}-15"
-                else:
-                    # Handle MM.DD.YY format
-                    month = int(match.group(1))
-                    day = int(match.group(2))
-                    year_str = match.group(3) if len(match.groups()) >= 3 else "20"
-                    
-                    # Convert to full year if 2-digit
-                    if len(year_str) == 2:
-                        year = int(year_str)
-                        if year < 50:
-                            year = 2000 + year
-                        else:
-                            year = 1900 + year
-                    else:
-                        year = int(year_str)
-                    
-                    return f"{year}-{month:02d}-{day:02d}"
-        
-        # If no date found, use current date
-        return datetime.now().strftime("%Y-%m-%d")
+        return self.parser.extract_document_date(filename)
     
     def match_provider(self, provider_name: str) -> Optional[int]:
-        """Match a provider name to a provider_id in the database"""
+        """Match a provider name to a provider_id (exact, variant, then contains)"""
         if not provider_name:
             return None
-            
-        # Try exact match on provider_name
-        provider = self.conn.execute(
-            "SELECT provider_id FROM providers WHERE provider_name = ?",
-            (provider_name,)
-        ).fetchone()
-        
-        if provider:
-            return provider['provider_id']
-        
-        # Try variant match
-        providers = self.conn.execute(
-            "SELECT provider_id, provider_name, name_variants FROM providers WHERE name_variants IS NOT NULL"
-        ).fetchall()
-        
-        for p in providers:
-            variants = p['name_variants'].split(',')
-            for variant in variants:
-                if variant.strip().lower() == provider_name.lower():
-                    return p['provider_id']
-        
-        # Try fuzzy match (simple contains)
-        providers = self.conn.execute(
-            "SELECT provider_id, provider_name FROM providers"
-        ).fetchall()
-        
-        for p in providers:
-            if provider_name.lower() in p['provider_name'].lower() or p['provider_name'].lower() in provider_name.lower():
-                return p['provider_id']
-        
-        return None
+        return self.names.match_provider(provider_name)
     
     def match_client(self, client_name: str) -> Optional[int]:
-        """Match a client name to a client_id in the database"""
+        """Match a client name to an active client_id when the match is confident"""
         if not client_name:
             return None
-            
-        # Try exact match on display_name
-        client = self.conn.execute(
-            "SELECT client_id FROM clients WHERE display_name = ? AND valid_to IS NULL",
-            (client_name,)
-        ).fetchone()
+        return self.names.match_client(client_name, self.get_match_threshold())
+    
+    def resolve_client(self, client_name: str, threshold: float) -> Tuple[Optional[int], List[Dict]]:
+        """
+        Match a client name, returning the ranked candidates as well
         
-        if client:
-            return client['client_id']
+        Returns:
+            (client_id, candidates); client_id is None when no candidate is
+            confident enough to link without review
+        """
+        if not client_name:
+            return None, []
+        return self.names.resolve_client(client_name, threshold)
+    
+    def get_match_threshold(self) -> float:
+        """Get the auto-link score threshold from system_config"""
+        try:
+            config = self.conn.execute(
+                "SELECT config_value FROM system_config WHERE config_key = 'client_match_threshold'"
+            ).fetchone()
+            if config:
+                return float(config['config_value'])
+        except (sqlite3.Error, ValueError) as e:
+            logging.error(f"Invalid client_match_threshold: {str(e)}")
+        return DEFAULT_MATCH_THRESHOLD
+    
+    def link_client(self, cursor: sqlite3.Cursor, file_id: int, client_id: int,
+                    provider_id: Optional[int], document_date: str,
+                    matcher: Optional[PaymentMatcher] = None,
+                    shortcuts: Optional[LinkBatch] = None):
+        """
+        Link a document to a client's matching payments and create the client shortcut
         
-        # Try variant match
-        clients = self.conn.execute(
-            "SELECT client_id, display_name, name_variants FROM clients WHERE name_variants IS NOT NULL AND valid_to IS NULL"
-        ).fetchall()
+        With a matcher the payment probe is only queued; the caller writes
+        the links for the whole batch with matcher.write(cursor). Likewise
+        with a shortcuts batch the shortcut is only queued, and the caller
+        creates it with shortcuts.flush() once the transaction commits.
+        """
+        file_info = cursor.execute(
+            "SELECT file_path, original_filename FROM client_files WHERE file_id = ?",
+            (file_id,)
+        ).fetchone()
         
-        for c in clients:
-            if c['name_variants']:
-                variants = c['name_variants'].split(',')
-                for variant in variants:
-                    if variant.strip().lower() == client_name.lower():
-                        return c['client_id']
+        # Find and link matching payments
+        if matcher is None:
+            single = self.payment_matcher()
+            single.add(file_id, client_id, provider_id, document_date)
+            single.write(cursor)
+        else:
+            matcher.add(file_id, client_id, provider_id, document_date)
+            
+        # Create shortcut
+        display_name = self.name_resolver.get_client_name(client_id)
+        
+        if display_name:
+            filename = file_info['original_filename']
+            year = self.path_resolver.extract_year_from_filename(filename)
+            shortcut_path = self.path_resolver.get_shortcut_path(
+                display_name, filename, year
+            )
+            if shortcuts is None:
+                self.path_resolver.create_windows_shortcut(file_info['file_path'], shortcut_path)
+            else:
+                shortcuts.add(file_info['file_path'], shortcut_path)
+    
+    def queue_match_review(self, cursor: sqlite3.Cursor, file_id: int, client_name: str, candidates: List[Dict]):
+        """Hold a low-confidence client match for manual review instead of linking it"""
+        cursor.execute(
+            """INSERT INTO client_match_reviews(file_id, extracted_name, candidates)
+               VALUES (?, ?, ?)""",
+            (file_id, client_name, json.dumps(candidates))
+        )
+        logging.info(f"Client match for '{client_name}' needs review (best score {candidates[0]['score']})")
+    
+    def record_mentions(self, cursor: sqlite3.Cursor, file_id: int, clients: List[Dict],
+                        settled: Optional[Dict[str, Tuple[str, Optional[int]]]] = None):
+        """
+        Replace a document's rows in document_client_mentions: one per
+        extracted client name, with the client it matched and how
+        ('matched', 'review', 'rejected' or 'unmatched')
         
-        # Try fuzzy match (simple contains)
-        clients = self.conn.execute(
-            "SELECT client_id, display_name FROM clients WHERE valid_to IS NULL"
+        Args:
+            clients: The parser's clients ({"name", "client_id", "candidates"})
+            settled: Reviewed names -> (review status, resolved client_id);
+                these keep the reviewer's outcome
+        """
+        settled = settled or {}
+        mentions = {}
+        for client in clients:
+            if client["name"] in settled:
+                status, client_id = settled[client["name"]]
+                status = "matched" if status == "linked" else status
+            elif client["client_id"]:
+                status, client_id = "matched", client["client_id"]
+            else:
+                status, client_id = ("review" if client["candidates"] else "unmatched"), None
+            mentions.setdefault(client["name"], (file_id, client["name"], client_id, status))
+        
+        cursor.execute("DELETE FROM document_client_mentions WHERE file_id = ?", (file_id,))
+        cursor.executemany(
+            "INSERT INTO document_client_mentions(file_id, extracted_name, client_id, match_status) VALUES (?, ?, ?, ?)",
+            list(mentions.values())
+        )
+    
+    def get_match_reviews(self, status: str = "pending") -> List[Dict]:
+        """Get queued client matches with their document and candidates"""
+        rows = self.conn.execute(
+            """SELECT r.review_id, r.file_id, r.extracted_name, r.candidates, r.status,
+                      r.resolved_client_id, r.created_at, r.resolved_at,
+                      f.original_filename, f.document_date
+               FROM client_match_reviews r
+               JOIN client_files f ON f.file_id = r.file_id
+               WHERE r.status = ?
+               ORDER BY r.created_at, r.review_id""",
+            (status,)
         ).fetchall()
         
-        for c in clients:
-            if client_name.lower() in c['display_name'].lower() or c['display_name'].lower() in client_name.lower():
-                return c['client_id']
+        reviews = []
+        for row in rows:
+            review = dict(row)
+            review['candidates'] = json.loads(review['candidates'] or "[]")
+            reviews.append(review)
+        return reviews
+    
+    def resolve_match_review(self, review_id: int, client_id: Optional[int], remember: bool = True) -> Dict:
+        """
+        Resolve a queued match
+        
+        Args:
+            review_id: Review to resolve
+            client_id: Client to link the document to, or None to reject
+            remember: Add the extracted name to the client's name_variants so
+                the same name links automatically next time
+            
+        Returns:
+            The updated review
+        """
+        review = self.conn.execute(
+            """SELECT r.review_id, r.file_id, r.extracted_name, r.status, f.provider_id, f.document_date
+               FROM client_match_reviews r
+               JOIN client_files f ON f.file_id = r.file_id
+               WHERE r.review_id = ?""",
+            (review_id,)
+        ).fetchone()
         
-        return None
+        if not review:
+            raise ValueError(f"Review {review_id} not found")
+        if review['status'] != 'pending':
+            raise ValueError(f"Review {review_id} is already {review['status']}")
+        
+        with self.conn:
+            cursor = self.conn.cursor()
+            if client_id is not None:
+                client = cursor.execute(
+                    "SELECT name_variants FROM clients WHERE client_id = ? AND valid_to IS NULL",
+                    (client_id,)
+                ).fetchone()
+                if not client:
+                    raise ValueError(f"Client {client_id} not found")
+                
+                self.link_client(cursor, review['file_id'], client_id, review['provider_id'], review['document_date'])
+                
+                variants = split_variants(client['name_variants'])
+                if remember and review['extracted_name'] not in variants:
+                    cursor.execute(
+                        "UPDATE clients SET name_variants = ? WHERE client_id = ?",
+                        (",".join(variants + [review['extracted_name']]), client_id)
+                    )
+            
+            cursor.execute(
+                """UPDATE client_match_reviews
+                   SET status = ?, resolved_client_id = ?, resolved_at = CURRENT_TIMESTAMP
+                   WHERE review_id = ?""",
+                ('linked' if client_id is not None else 'rejected', client_id, review_id)
+            )
+            cursor.execute(
+                """UPDATE document_client_mentions SET client_id = ?, match_status = ?
+                   WHERE file_id = ? AND extracted_name = ?""",
+                (client_id, 'matched' if client_id is not None else 'rejected',
+                 review['file_id'], review['extracted_name'])
+            )
+        
+        return dict(self.conn.execute(
+            "SELECT * FROM client_match_reviews WHERE review_id = ?",
+            (review_id,)
+        ).fetchone())
+    
+    def payment_matcher(self) -> PaymentMatcher:
+        """Create a batch payment matcher with the matching config loaded once per scan"""
+        if self.days_to_match is None:
+            self.days_to_match = get_days_to_match(self.conn)
+        return PaymentMatcher(self.conn, self.days_to_match, self.name_resolver.providers.names)
     
     def find_matching_payments(self, client_id: int, provider_id: Optional[int], document_date: str) -> List[int]:
         """Find payments that likely match this document"""
         try:
-            # Convert document_date to datetime for date calculations
-            doc_date = datetime.strptime(document_date, "%Y-%m-%d")
-            
-            # Get days_to_match from system_config
-            config = self.conn.execute(
-                "SELECT config_value FROM system_config WHERE config_key = 'days_to_match_payment'"
-            ).fetchone()
-            
-            days_to_match = 30  # Default
-            if config and config['config_value'].isdigit():
-                days_to_match = int(config['config_value'])
-            
-            # Calculate date range for matching
-            date_min = (doc_date - timedelta(days=days_to_match)).strftime("%Y-%m-%d")
-            date_max = (doc_date + timedelta(days=days_to_match)).strftime("%Y-%m-%d")
-            
-            # Build query based on available information
-            query = """
-                SELECT payment_id 
-                FROM payments 
-                WHERE client_id = ? 
-                AND received_date BETWEEN ? AND ?
-                AND valid_to IS NULL
-            """
-            params = [client_id, date_min, date_max]
-            
-            # Add provider filter if available
-            if provider_id:
-                query += """
-                    AND contract_id IN (
-                        SELECT contract_id FROM contracts 
-                        WHERE provider_id = ? OR provider_name IN (
-                            SELECT provider_name FROM providers WHERE provider_id = ?
-                        )
-                    )
-                """
-                params.extend([provider_id, provider_id])
-            
-            # Execute query
-            payments = self.conn.execute(query, params).fetchall()
-            return [p['payment_id'] for p in payments]
-            
+            matcher = self.payment_matcher()
+            matcher.add(0, client_id, provider_id, document_date)
+            return [payment_id for payment_id, _ in matcher.resolve()]
         except Exception as e:
             logging.error(f"Error finding matching payments: {str(e)}")
             return []
     
+    def build_pipeline(self, threshold: float, threaded: bool = True) -> Pipeline:
+        """
+        Build the document pipeline: classify -> content -> extract ->
+        match -> link -> side effects
+        
+        With content extraction enabled, files whose names are not
+        recognised are classified by their text (see utils.text_extraction);
+        classify hands them to the extraction pool so several are extracted
+        at once while the content stage waits for them in order.
+        
+        Classify, extract and match only use the in-memory patterns and
+        name indexes, so with threaded=True each runs in its own thread
+        behind a bounded queue. Link (the database transaction) and side
+        effects (client shortcuts) run on this thread, which owns the
+        connection; both retry transient failures such as a locked
+        database or a file held open by OneDrive.
+        
+        Args:
+            threshold: Client match threshold
+            threaded: Run the in-memory stages in worker threads
+        """
+        parser = self.parser
+        content = get_content_extractor(self.test_mode)
+        config = settings.get_processing_config()
+        retries = int(config["stage_retries"])
+        retry_delay = float(config["retry_delay_seconds"])
+        
+        def classify(item):
+            item.update(parser.classify(item["file_path"]))
+            if not item["is_401k"]:
+                if content is not None:
+                    # Extraction starts now on the content pool; the content
+                    # stage collects the result
+                    item["text_future"] = content.submit(item["file_path"])
+                    return
+                item["status"] = "skipped"
+                item["done"] = True
+        
+        def read_content(item):
+            future = item.pop("text_future", None)
+            if future is None:
+                return
+            parser.classify_text(item, future.result())
+            if not item["is_401k"]:
+                item["status"] = "skipped"
+                item["done"] = True
+        
+        def side_effects(item):
+            created, failed = item["shortcuts"].flush()
+            if failed:
+                raise OSError(f"{failed} of {created + failed} client shortcuts could not be created")
+        
+        return Pipeline([
+            Stage("classify", classify, threaded=threaded),
+            Stage("content", read_content, threaded=threaded),
+            Stage("extract", parser.extract, threaded=threaded),
+            Stage("match", lambda item: parser.match(item, threshold), threaded=threaded),
+            Stage("link", self._link_stage, retries=retries, retry_delay=retry_delay),
+            Stage("side_effects", side_effects, retries=retries, retry_delay=retry_delay,
+                  transient=lambda e: isinstance(e, OSError)),
+        ], queue_size=int(config["pipeline_queue_size"]))
+    
+    def _link_stage(self, item: Dict):
+        """Pipeline stage: write the document and its links in one transaction"""
+        existing = self._existing_file_id(item["file_path"])
+        if existing:
+            item.update({"file_id": existing, "status": "existing", "done": True})
+            return
+        
+        shortcuts = LinkBatch(self.path_resolver.link_writer)
+        with self.conn:
+            file_id = self.write_document(self.conn.cursor(), item, shortcuts=shortcuts)
+        if file_id is None:
+            # Another scan recorded the file between the check and the insert
+            item.update({"file_id": self._existing_file_id(item["file_path"]), "status": "existing", "done": True})
+            return
+        item.update({"file_id": file_id, "status": "processed", "shortcuts": shortcuts})
+    
+    def _existing_file_id(self, file_path: str) -> Optional[int]:
+        existing = self.conn.execute(
+            "SELECT file_id FROM client_files WHERE file_path = ?",
+            (file_path,)
+        ).fetchone()
+        return existing['file_id'] if existing else None
+    
+    def _finish_item(self, item: Dict) -> Optional[int]:
+        """Pipeline sink: log the outcome of one document and return its file_id"""
+        file_path = item["file_path"]
+        filename = item.get("filename") or os.path.basename(file_path)
+        status = item.get("status")
+        
+        if status == "existing":
+            logging.info(f"File already processed: {filename}")
+            return item["file_id"]
+        if status == "processed":
+            details = f"File ID: {item['file_id']}"
+            if item.get("error"):
+                # The document is linked; only its shortcuts failed
+                logging.error(f"Error processing document {file_path}: {item['error']}")
+                details += f" ({item['error']})"
+            self.log_processing(filename, "processed", details, item["file_id"])
+            return item["file_id"]
+        if status == "skipped":
+            logging.info(f"Not a 401k document, skipping: {filename}")
+            self.log_processing(filename, "skipped", "Not a 401k document")
+            return None
+        
+        logging.error(f"Error processing document {file_path}: {item['error']}")
+        self.log_processing(filename, "error", item["error"])
+        self.failed_paths.add(file_path)
+        return None
+    
+    def run_pipeline(self, paths: List[str], threaded: bool = True,
+                     progress: Optional[Callable[[int, int], None]] = None) -> Tuple[List[int], Pipeline]:
+        """
+        Run files through the document pipeline
+        
+        Args:
+            paths: Files to process
+            threaded: Run the in-memory stages in worker threads
+            progress: Called with (files done, total) after each file; an
+                exception it raises stops the run
+        
+        Returns:
+            (file_ids processed or already known, the pipeline with its stage metrics)
+        """
+        pipeline = self.build_pipeline(self.get_match_threshold(), threaded)
+        file_ids = []
+        for done, item in enumerate(pipeline.run({"file_path": path, "error": None} for path in paths), 1):
+            file_id = self._finish_item(item)
+            if file_id:
+                file_ids.append(file_id)
+            if progress:
+                progress(done, len(paths))
+        return file_ids, pipeline
+    
     def process_document(self, file_path: str) -> Optional[int]:
         """
         Process a single document from the mail dump folder
@@ -291,105 +452,79 @@ class DocumentProcessor:
         Returns:
             file_id if successful, None if skipped or error
         """
-        try:
-            filename = os.path.basename(file_path)
-            
-            # Check if this file is already processed
-            existing = self.conn.execute(
-                "SELECT file_id FROM client_files WHERE file_path = ?",
-                (file_path,)
-            ).fetchone()
-            
-            if existing:
-                logging.info(f"File already processed: {filename}")
-                return existing['file_id']
-            
-            # Check if this is a 401k document
-            if not self.is_401k_document(filename):
-                logging.info(f"Not a 401k document, skipping: {filename}")
-                self.log_processing(filename, "skipped", "Not a 401k document")
-                return None
-            
-            # Extract metadata
-            provider_name = self.extract_provider_name(filename)
-            client_names = self.extract_client_list(filename)
-            document_date = self.extract_document_date(filename)
-            
-            # Match provider
-            provider_id = self.match_provider(provider_name) if provider_name else None
+        file_ids, _ = self.run_pipeline([file_path], threaded=False)
+        return file_ids[0] if file_ids else None
+    
+    def write_document(self, cursor: sqlite3.Cursor, parsed: Dict, matcher: Optional[PaymentMatcher] = None,
+                       shortcuts: Optional[LinkBatch] = None) -> int:
+        """
+        Create the client_files row for a parsed 401k document, link it to
+        confidently matched clients and queue the rest for review. Runs in
+        the caller's transaction.
+        
+        Args:
+            cursor: Cursor inside an open transaction
+            parsed: Result of DocumentParser.parse
+            matcher: Batch payment matcher; payment links are queued on it
+                for the caller to write. Without one the document's links
+                are matched and written here, in one query for all clients.
+            shortcuts: Batch that client shortcuts are queued on, to be
+                created after commit. Without one they are created here.
             
-            # Create database entry for the document
-            with self.conn:
-                cursor = self.conn.cursor()
-                cursor.execute(
-                    """INSERT INTO client_files(file_path, original_filename, upload_date, document_date, provider_id, is_processed) 
-                       VALUES (?, ?, CURRENT_TIMESTAMP, ?, ?, 0)""",
-                    (file_path, filename, document_date, provider_id)
-                )
-                file_id = cursor.lastrowid
-                
-                # Store metadata
-                metadata = {
-                    "extracted_provider": provider_name,
-                    "extracted_clients": client_names,
+        Returns:
+            The new file_id, or None if client_files has the file already
+            (another scan recorded it first); nothing is written then
+        """
+        cursor.execute(
+            """INSERT INTO client_files(file_path, original_filename, upload_date, document_date, provider_id, is_processed, metadata) 
+               VALUES (?, ?, CURRENT_TIMESTAMP, ?, ?, 0, ?)
+               ON CONFLICT(file_path) DO NOTHING""",
+            (
+                parsed["file_path"], parsed["filename"], parsed["document_date"], parsed["provider_id"],
+                json.dumps({
+                    "extracted_provider": parsed["provider_name"],
+                    "extracted_clients": parsed["client_names"],
+                    "client_ids": [client["client_id"] for client in parsed["clients"] if client["client_id"]],
+                    "pattern_version": self.pattern_registry.version,
+                    "classified_by": parsed.get("classified_by", "filename"),
                     "processing_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                }
-                cursor.execute(
-                    "UPDATE client_files SET metadata = ? WHERE file_id = ?",
-                    (json.dumps(metadata), file_id)
-                )
-                
-                # Process each client
-                for client_name in client_names:
-                    client_id = self.match_client(client_name)
-                    if client_id:
-                        # Find matching payments
-                        payment_ids = self.find_matching_payments(client_id, provider_id, document_date)
-                        
-                        # Link to payments
-                        for payment_id in payment_ids:
-                            cursor.execute(
-                                "INSERT INTO payment_files(payment_id, file_id) VALUES (?, ?)",
-                                (payment_id, file_id)
-                            )
-                            
-                        # Create shortcut
-                        client_info = self.conn.execute(
-                            "SELECT display_name FROM clients WHERE client_id = ?",
-                            (client_id,)
-                        ).fetchone()
-                        
-                        if client_info:
-                            year = self.path_resolver.extract_year_from_filename(filename)
-                            shortcut_path = self.path_resolver.get_shortcut_path(
-                                client_info['display_name'], filename, year
-                            )
-                            self.path_resolver.create_windows_shortcut(file_path, shortcut_path)
-            
-            # Mark as processed
-            with self.conn:
-                self.conn.execute(
-                    "UPDATE client_files SET is_processed = 1 WHERE file_id = ?",
-                    (file_id,)
-                )
-            
-            self.log_processing(filename, "processed", f"File ID: {file_id}", file_id)
-            return file_id
-            
-        except Exception as e:
-            logging.error(f"Error processing document {file_path}: {str(e)}")
-            self.log_processing(os.path.basename(file_path), "error", str(e))
+                })
+            )
+        )
+        if cursor.rowcount == 0:
             return None
+        file_id = cursor.lastrowid
+        self.record_mentions(cursor, file_id, parsed["clients"])
+        
+        # Process each client; unclear names go to the review queue
+        payments = matcher if matcher is not None else self.payment_matcher()
+        for client in parsed["clients"]:
+            if client["client_id"]:
+                self.link_client(cursor, file_id, client["client_id"], parsed["provider_id"],
+                                 parsed["document_date"], payments, shortcuts)
+            elif client["candidates"]:
+                self.queue_match_review(cursor, file_id, client["name"], client["candidates"])
+        if matcher is None:
+            payments.write(cursor)
+        
+        # Mark as processed
+        cursor.execute(
+            "UPDATE client_files SET is_processed = 1 WHERE file_id = ?",
+            (file_id,)
+        )
+        return file_id
     
-    def scan_mail_dump(self, year: Optional[int] = None) -> List[int]:
+    def scan_mail_dump(self, year: Optional[int] = None,
+                       progress: Optional[Callable[[int, int], None]] = None) -> List[int]:
         """
-        Scan the mail dump folder for unprocessed documents
+        Scan the mail dump folder for new documents
         
         Args:
             year: Optional year to scan, defaults to current year
+            progress: Called with (files done, new files) while processing
             
         Returns:
-            List of processed file IDs
+            List of file IDs created by this scan
         """
         if year is None:
             year = datetime.now().year
@@ -401,28 +536,94 @@ class DocumentProcessor:
             logging.warning(f"Mail dump path does not exist: {mail_dump_path}")
             return []
         
-        # Get list of PDF files
-        pdf_files = [f for f in os.listdir(mail_dump_path) if f.lower().endswith('.pdf')]
+        started = time.perf_counter()
+        listing = list_folder(mail_dump_path)
+        processed_ids = self.process_listing(mail_dump_path, listing, progress=progress)
+        logging.info(
+            f"Scanned {mail_dump_path}: {len(listing)} files, {len(processed_ids)} new documents "
+            f"in {(time.perf_counter() - started) * 1000:.1f} ms"
+        )
+        
+        # Large loads change row counts enough to shift query plans
+        refresh_stats_after_bulk_load(self.conn, len(processed_ids))
+        
+        return processed_ids
+    
+    def process_listing(self, folder: str, listing: Dict, prune: bool = True,
+                        progress: Optional[Callable[[int, int], None]] = None) -> List[int]:
+        """
+        Process the files in a listing that are new or changed since they
+        were last scanned and not in client_files yet
+        
+        Args:
+            folder: Folder the listing came from
+            listing: path -> (size, mtime_ns), see utils.scan_manifest
+            prune: Whether the listing is the whole folder (drops manifest
+                rows for files that disappeared)
+            progress: Called with (files done, new files) while processing
+            
+        Returns:
+            List of file IDs created
+        """
+        discover = StageMetrics("discover")
+        started = time.perf_counter()
+        new_files, changed_files = find_changed_files(self.conn, listing)
+        discover.record(time.perf_counter() - started, len(new_files))
+        stage_metrics = [discover.to_dict()]
+        
+        # Pick up matching config changes once per scan
+        self.days_to_match = None
         
         processed_ids = []
-        for pdf in pdf_files:
-            file_path = os.path.join(mail_dump_path, pdf)
-            file_id = self.process_document(file_path)
-            if file_id:
-                processed_ids.append(file_id)
+        if new_files:
+            # Build the name indexes up front rather than on the first match
+            # (a no-op unless clients or providers changed since the last build)
+            self.name_resolver.refresh(self.conn)
+            
+            self.failed_paths = set()
+            config = settings.get_processing_config()
+            if len(new_files) >= int(config["parallel_min_files"]) and int(config["workers"]) != 1:
+                parallel = StageMetrics("parallel")
+                started = time.perf_counter()
+                processed_ids, self.failed_paths = process_files_parallel(
+                    self, new_files,
+                    workers=int(config["workers"]) or None,
+                    chunk_size=int(config["chunk_size"]),
+                    batch_size=int(config["write_batch_size"]),
+                    progress=progress
+                )
+                parallel.record(time.perf_counter() - started, len(new_files))
+                parallel.errors = len(self.failed_paths)
+                stage_metrics.append(parallel.to_dict())
+            else:
+                processed_ids, pipeline = self.run_pipeline(new_files, progress=progress)
+                stage_metrics.extend(pipeline.metrics)
+            
+            for stage in stage_metrics:
+                logging.info(
+                    f"Stage {stage['stage']}: {stage['items']} items, {stage['errors']} errors, "
+                    f"{stage['retries']} retries, {stage['busy_ms']} ms"
+                )
+            record_run(stage_metrics, folder)
+        
+        self.processing_log.flush()
         
+        # Files that failed stay out of the manifest so the next scan retries them
+        update_manifest(
+            self.conn, folder, listing,
+            [path for path in changed_files if path not in self.failed_paths],
+            prune=prune
+        )
         return processed_ids
     
     def log_processing(self, filename: str, status: str, details: Optional[str] = None, file_id: Optional[int] = None):
-        """Log document processing status to the database"""
-        try:
-            with self.conn:
-                self.conn.execute(
-                    "INSERT INTO processing_log(file_name, status, details, file_id) VALUES (?, ?, ?, ?)",
-                    (filename, status, details, file_id)
-                )
-        except Exception as e:
-            logging.error(f"Failed to log processing: {str(e)}")
+        """
+        Log document processing status to the database
+        
+        Rows are buffered and written in bulk (see utils.processing_log);
+        process_listing flushes at the end of every scan.
+        """
+        self.processing_log.add(filename, status, details, file_id)
     
     def get_unprocessed_documents(self) -> List[Dict]:
         """Get list of documents that have not been processed yet"""
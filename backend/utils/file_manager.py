@@ -1,22 +1,39 @@
 # backend/utils/file_manager.py
 import os
-import shutil
 import logging
 import json
 import re
+import uuid
+import hashlib
+import aiofiles
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, NamedTuple, Optional, Tuple
 
 from config import settings
 from database import get_db_connection
 from utils.path_resolver import PathResolver
+from utils.blob_store import get_blob_store, hash_file
+
+# Bytes read from an upload at a time
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+class UploadTooLarge(ValueError):
+    """An upload is larger than files.max_upload_mb"""
+
+class StagedUpload(NamedTuple):
+    """An upload written to a temporary file next to its final path"""
+    temp_path: str
+    file_path: str
+    content_hash: str
+    size: int
 
 class FileManager:
     def __init__(self, test_mode=False):
         """Initialize the file manager with appropriate base paths"""
         self.base_path = settings.get_files_base_path(is_test=test_mode)
         self.path_resolver = PathResolver(test_mode=test_mode)
+        self.blob_store = get_blob_store(self.path_resolver)
         self.test_mode = test_mode
         
     def get_full_path(self, relative_path: str) -> str:
@@ -82,7 +99,7 @@ class FileManager:
         finally:
             conn.close()
     
-    def save_document_to_mail_dump(self, file_obj, filename: str, document_date: Optional[str] = None, provider_id: Optional[int] = None) -> Dict:
+    async def save_document_to_mail_dump(self, file_obj, filename: str, document_date: Optional[str] = None, provider_id: Optional[int] = None) -> Dict:
         """
         Save a document to the mail dump folder following the "Store Once" principle
         
@@ -93,45 +110,171 @@ class FileManager:
             provider_id: Optional provider ID
             
         Returns:
-            Dict with file_id and path information
+            Dict with file_id, file_path, content_hash and status (see record_upload)
         """
-        # Extract year from filename or use current year
-        year = self.path_resolver.extract_year_from_filename(filename)
+        staged = await self.stage_upload(file_obj, filename)
         
-        # Get mail dump path for this year
-        mail_dump_path = self.path_resolver.get_mail_dump_path(year)
+        # Create database entry
+        conn = get_db_connection(test_mode=self.test_mode)
+        try:
+            with conn:
+                file_id, status = self.record_upload(conn.cursor(), staged, filename, document_date, provider_id)
+            self.commit_upload(staged)
+                
+            return {"file_id": file_id, "file_path": staged.file_path, "content_hash": staged.content_hash, "status": status}
+        finally:
+            self.discard_upload(staged.temp_path)
+            conn.close()
+    
+    async def stage_upload(self, upload, filename: str) -> StagedUpload:
+        """
+        Stream an upload to a temporary file in the mail dump folder, hashing
+        it on the way; record_upload and commit_upload store it
         
-        # Ensure directory exists
+        Args:
+            upload: UploadFile object
+            filename: Original filename
+            
+        Returns:
+            StagedUpload with the SHA-256 and size of the content
+            
+        Raises:
+            UploadTooLarge: The upload exceeds files.max_upload_mb
+        """
+        year = self.path_resolver.extract_year_from_filename(filename)
+        mail_dump_path = self.path_resolver.get_mail_dump_path(year)
         os.makedirs(mail_dump_path, exist_ok=True)
         
-        # Create the full path to save the file
         file_path = os.path.join(mail_dump_path, filename)
+        # Hidden and not a .pdf, so scans and the watcher ignore it
+        temp_path = os.path.join(mail_dump_path, f".{filename}.{uuid.uuid4().hex}.part")
+        max_mb = float(settings.get_files_config()["max_upload_mb"])
+        max_bytes = int(max_mb * 1024 * 1024)
+        
+        sha256 = hashlib.sha256()
+        size = 0
+        try:
+            async with aiofiles.open(temp_path, "wb") as out:
+                while True:
+                    chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise UploadTooLarge(f"File is larger than the {max_mb:g} MB upload limit")
+                    sha256.update(chunk)
+                    await out.write(chunk)
+        except BaseException:
+            self.discard_upload(temp_path)
+            raise
+        
+        return StagedUpload(temp_path, file_path, sha256.hexdigest(), size)
+    
+    def commit_upload(self, staged: StagedUpload):
+        """
+        Atomically link a recorded upload's stored content in at its final
+        path, replacing any file there; call it once the transaction
+        record_upload ran in has committed, so a rolled-back upload never
+        replaces a file
+        """
+        if self.blob_store.has(staged.content_hash):
+            self.blob_store.link(staged.content_hash, staged.file_path)
+    
+    def discard_upload(self, temp_path: str):
+        """Remove a staged upload's temporary file if it is still there"""
+        try:
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logging.warning(f"Could not remove temporary upload {temp_path}: {str(e)}")
+    
+    def record_upload(self, cursor, staged: StagedUpload, filename: str, document_date: Optional[str] = None,
+                      provider_id: Optional[int] = None, is_processed: bool = False) -> Tuple[int, str]:
+        """
+        Record a staged upload in client_files and move its content into
+        the blob store, in the caller's transaction; the file itself is put
+        in place by commit_upload after the transaction commits
+        
+        A file with the same name and content is a duplicate: the existing
+        row is kept and the staged copy dropped. Same name with different
+        content is an update: the file will be replaced and its row (and so
+        its links) keeps the file_id. Content that is stored under another
+        name already is only linked, not copied.
         
-        # Save file to disk
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file_obj.file, buffer)
+        Returns:
+            (file_id, status): status is "created", "updated" or "duplicate"
+        """
+        existing = cursor.execute(
+            "SELECT file_id, content_hash FROM client_files WHERE file_path = ? ORDER BY file_id DESC LIMIT 1",
+            (staged.file_path,)
+        ).fetchone()
         
+        if existing:
+            # Documents from before uploads were hashed get their hash now
+            existing_hash = existing['content_hash']
+            if existing_hash is None and os.path.exists(staged.file_path):
+                existing_hash = hash_file(staged.file_path)
+            
+            if existing_hash == staged.content_hash:
+                cursor.execute(
+                    "UPDATE client_files SET content_hash = ?, file_size = ? WHERE file_id = ?",
+                    (staged.content_hash, staged.size, existing['file_id'])
+                )
+                self.discard_upload(staged.temp_path)
+                # Files from before the blob store become its copy of the content
+                try:
+                    self.blob_store.adopt(staged.file_path, staged.content_hash)
+                    self.blob_store.record(cursor, staged.content_hash, staged.size)
+                except OSError as e:
+                    logging.warning(f"Could not add {staged.file_path} to the blob store: {str(e)}")
+                return existing['file_id'], "duplicate"
+            
+            logging.info(f"Upload replaces {staged.file_path} with new content")
+            cursor.execute(
+                """UPDATE client_files
+                   SET content_hash = ?, file_size = ?, upload_date = CURRENT_TIMESTAMP,
+                       provider_id = COALESCE(?, provider_id), is_processed = MAX(COALESCE(is_processed, 0), ?)
+                   WHERE file_id = ?""",
+                (staged.content_hash, staged.size, provider_id, int(is_processed), existing['file_id'])
+            )
+            file_id, status = existing['file_id'], "updated"
+        else:
+            file_id = self.insert_document(
+                cursor, staged.file_path, filename, document_date, provider_id, is_processed,
+                staged.content_hash, staged.size
+            )
+            status = "created"
+        
+        # Inside the transaction: if storing fails, nothing is recorded. A
+        # blob left by a rolled-back transaction is only an unused copy.
+        self.blob_store.record(cursor, staged.content_hash, staged.size)
+        if not self.blob_store.put(staged.temp_path, staged.content_hash):
+            logging.info(f"Upload {staged.file_path} matches stored content; linked without a copy")
+        return file_id, status
+    
+    def insert_document(self, cursor, file_path: str, filename: str, document_date: Optional[str] = None,
+                        provider_id: Optional[int] = None, is_processed: bool = False,
+                        content_hash: Optional[str] = None, file_size: Optional[int] = None) -> int:
+        """
+        Insert the client_files row for a saved document (in the caller's transaction)
+        
+        Returns:
+            The new file_id
+        """
         # If no document date provided, use today
         if not document_date:
             document_date = datetime.now().strftime("%Y-%m-%d")
         
-        # Create database entry
-        conn = get_db_connection(test_mode=self.test_mode)
-        try:
-            with conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    """INSERT INTO client_files(file_path, original_filename, upload_date, document_date, provider_id, is_processed) 
-                       VALUES (?, ?, CURRENT_TIMESTAMP, ?, ?, 0)""",
-                    (file_path, filename, document_date, provider_id)
-                )
-                file_id = cursor.lastrowid
-                
-            return {"file_id": file_id, "file_path": file_path}
-        finally:
-            conn.close()
+        cursor.execute(
+            """INSERT INTO client_files(file_path, original_filename, upload_date, document_date, provider_id, is_processed,
+                                        content_hash, file_size) 
+               VALUES (?, ?, CURRENT_TIMESTAMP, ?, ?, ?, ?, ?)""",
+            (file_path, filename, document_date, provider_id, int(is_processed), content_hash, file_size)
+        )
+        return cursor.lastrowid
     
-    def save_uploaded_file(self, client_id: int, file_obj, filename: str, provider_id: Optional[int] = None) -> Dict:
+    async def save_uploaded_file(self, client_id: int, file_obj, filename: str, provider_id: Optional[int] = None) -> Dict:
         """
         Save an uploaded file using the "Store Once, Link Everywhere" pattern
         
@@ -145,7 +288,7 @@ class FileManager:
             Dict with file_id and path information
         """
         # First save to mail dump to implement "Store Once"
-        result = self.save_document_to_mail_dump(file_obj, filename, provider_id=provider_id)
+        result = await self.save_document_to_mail_dump(file_obj, filename, provider_id=provider_id)
         file_id = result["file_id"]
         file_path = result["file_path"]
         
@@ -0,0 +1,271 @@
+# backend/utils/file_server.py
+#
+# Serving stored documents. Each request for a document used to open a
+# database connection and stat a OneDrive path before sending the whole
+# file. Here the database lookup and the stat are kept for a few seconds
+# in a small TTL cache, and responses carry an ETag (the content hash
+# where known), Last-Modified and Accept-Ranges, so the PDF viewer can
+# revalidate cheaply (304) and fetch just the byte ranges it needs (206).
+# A URL that names the content (?v=<content_hash>) is cached for a year.
+#
+# File bodies are sent with the ASGI zero-copy extension when the server
+# offers it, and read in chunks on a worker thread otherwise.
+import os
+import re
+import time
+import logging
+import threading
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import quote
+from typing import Callable, Hashable, NamedTuple, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import Response
+
+from config import settings
+from database import get_db_connection
+
+# Bytes sent per chunk when zero-copy sending is not available
+SEND_CHUNK_SIZE = 256 * 1024
+
+# Cache-Control for URLs that name the content (?v=<hash>) and for the rest
+IMMUTABLE_CACHE = "private, max-age=31536000, immutable"
+REVALIDATE_CACHE = "private, no-cache"
+
+MEDIA_TYPES = {
+    ".pdf": "application/pdf",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+}
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class FileMeta(NamedTuple):
+    """What a response needs to know about a stored file"""
+    path: str
+    filename: str
+    media_type: str
+    size: int
+    mtime: float
+    etag: str
+    content_hash: Optional[str]
+
+
+class TTLCache:
+    """Small thread-safe cache whose entries expire after ttl seconds"""
+    def __init__(self, ttl: float, maxsize: int = 1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._items: "OrderedDict[Hashable, Tuple[float, object]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value):
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._items.pop(key, None)
+
+
+_config = settings.get_files_config()
+file_cache = TTLCache(float(_config["serve_cache_seconds"]), int(_config["serve_cache_size"]))
+
+
+def media_type_for(filename: str) -> str:
+    return MEDIA_TYPES.get(os.path.splitext(filename)[1].lower(), "application/octet-stream")
+
+
+def get_file_meta(key: Hashable, lookup: Callable[[], Optional[Tuple[str, str, Optional[str]]]]) -> Optional[FileMeta]:
+    """
+    Return a file's metadata, from the cache when it is fresh
+
+    Args:
+        key: Cache key (e.g. ("document", file_id))
+        lookup: Returns (path, filename, content_hash) from the database,
+            or None if there is no such file
+
+    Returns:
+        FileMeta, or None if the file is unknown or missing on disk
+    """
+    meta = file_cache.get(key)
+    if meta is not None:
+        return meta
+
+    found = lookup()
+    if not found:
+        return None
+    path, filename, content_hash = found
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    etag = f'"{content_hash}"' if content_hash else f'W/"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+    meta = FileMeta(path, filename, media_type_for(filename), stat.st_size, stat.st_mtime, etag, content_hash)
+    file_cache.set(key, meta)
+    return meta
+
+
+def lookup_document(file_id: int) -> Optional[Tuple[str, str, Optional[str]]]:
+    """Return (file_path, original_filename, content_hash) of a document, as get_file_meta expects"""
+    conn = get_db_connection()
+    try:
+        file_info = conn.execute(
+            "SELECT file_path, original_filename, content_hash FROM client_files WHERE file_id = ?",
+            (file_id,)
+        ).fetchone()
+        return tuple(file_info) if file_info else None
+    finally:
+        conn.close()
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # Weak comparison, as If-None-Match requires
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+
+def _if_range_matches(header: Optional[str], etag: str, last_modified: str) -> bool:
+    # Strong comparison, as If-Range requires: a weak ETag (and the
+    # Last-Modified date of a file that only has one) never matches
+    if header is None:
+        return True
+    if etag.startswith("W/"):
+        return False
+    return header.strip() in (etag, last_modified)
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    (start, end inclusive) of a single byte range; None for a header that
+    is ignored (multiple ranges or other units); ValueError if unsatisfiable
+    """
+    match = _RANGE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("Empty suffix range")
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+
+def serve_file(request: Request, meta: FileMeta) -> Response:
+    """
+    Build the response for a file: 304 when the client's copy is current,
+    206 for a byte range, 200 with the whole file otherwise
+    """
+    versioned = meta.content_hash is not None and request.query_params.get("v") == meta.content_hash
+    headers = {
+        "ETag": meta.etag,
+        "Last-Modified": formatdate(meta.mtime, usegmt=True),
+        "Cache-Control": IMMUTABLE_CACHE if versioned else REVALIDATE_CACHE,
+        "Accept-Ranges": "bytes",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if _etag_matches(if_none_match, meta.etag):
+            return Response(status_code=304, headers=headers)
+    elif "if-modified-since" in request.headers:
+        try:
+            if int(meta.mtime) <= parsedate_to_datetime(request.headers["if-modified-since"]).timestamp():
+                return Response(status_code=304, headers=headers)
+        except (TypeError, ValueError):
+            pass
+
+    byte_range = None
+    range_header = request.headers.get("range")
+    # If-Range: only honour the range if the client's copy is still current
+    if range_header and _if_range_matches(request.headers.get("if-range"), meta.etag, headers["Last-Modified"]):
+        try:
+            byte_range = _parse_range(range_header, meta.size)
+        except ValueError:
+            headers["Content-Range"] = f"bytes */{meta.size}"
+            return Response(status_code=416, headers=headers)
+
+    headers["Content-Disposition"] = f"inline; filename*=utf-8''{quote(meta.filename)}"
+    if byte_range is None:
+        return FileRangeResponse(meta, 0, meta.size, 200, headers, send_body=request.method != "HEAD")
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{meta.size}"
+    return FileRangeResponse(meta, start, end - start + 1, 206, headers, send_body=request.method != "HEAD")
+
+
+class FileRangeResponse(Response):
+    """Sends part (or all) of a file, zero-copy where the server supports it"""
+    def __init__(self, meta: FileMeta, offset: int, count: int, status_code: int, headers: dict,
+                 send_body: bool = True):
+        super().__init__(status_code=status_code, headers=headers, media_type=meta.media_type)
+        self.path = meta.path
+        self.offset = offset
+        self.count = count
+        self.send_body = send_body
+        self.headers["content-length"] = str(count)
+
+    async def __call__(self, scope, receive, send):
+        try:
+            f = await run_in_threadpool(open, self.path, "rb")
+        except OSError as e:
+            # Gone since it was stat'ed (cached metadata is at most a few seconds old)
+            logging.warning(f"Could not open {self.path}: {str(e)}")
+            await Response(status_code=404)(scope, receive, send)
+            return
+
+        try:
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            if not self.send_body or self.count == 0:
+                await send({"type": "http.response.body", "body": b""})
+                return
+
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": f.fileno(),
+                    "offset": self.offset,
+                    "count": self.count
+                })
+                return
+
+            await run_in_threadpool(f.seek, self.offset)
+            remaining = self.count
+            while remaining > 0:
+                chunk = await run_in_threadpool(f.read, min(SEND_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                # File shrank while sending
+                await send({"type": "http.response.body", "body": b""})
+        finally:
+            await run_in_threadpool(f.close)
@@ -0,0 +1,353 @@
+# backend/utils/job_queue.py
+#
+# Persistent background jobs. Jobs are rows in the jobs table, so they
+# survive restarts: a pool of worker threads (each with its own
+# connection) claims queued jobs oldest first and records progress,
+# results and errors on the row. Submitting a job whose dedupe key
+# matches a queued or running job returns that job instead of adding a
+# second one. Cancelling a queued job drops it; a running job is asked to
+# stop and does so at its next progress report. Jobs interrupted by a
+# shutdown go back to the queue.
+import json
+import time
+import logging
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import settings
+from database import get_db_connection
+
+# Seconds between progress writes for one job (the final report always goes out)
+PROGRESS_INTERVAL = 0.5
+
+# A job that keeps getting interrupted is failed after this many starts
+MAX_ATTEMPTS = 3
+
+# job_type -> handler(context, **params) -> result dict
+JOB_HANDLERS: Dict[str, Callable[..., Dict]] = {}
+
+
+def job_handler(job_type: str):
+    """Register the function that runs jobs of a type"""
+    def register(fn):
+        JOB_HANDLERS[job_type] = fn
+        return fn
+    return register
+
+
+class JobCancelled(Exception):
+    """Raised inside a handler when its job was cancelled"""
+
+
+class JobInterrupted(Exception):
+    """Raised inside a handler when the queue is shutting down"""
+
+
+class JobContext:
+    """What a handler gets to report progress and notice cancellation"""
+    def __init__(self, conn: sqlite3.Connection, job_id: int, test_mode: bool, stopping: threading.Event):
+        self.conn = conn
+        self.job_id = job_id
+        self.test_mode = test_mode
+        self._stopping = stopping
+        self._last_write = 0.0
+
+    def progress(self, done: int, total: Optional[int] = None, detail: Optional[str] = None):
+        """
+        Record progress; raises JobCancelled or JobInterrupted when the job
+        should stop
+        """
+        now = time.monotonic()
+        if now - self._last_write < PROGRESS_INTERVAL and (total is None or done < total):
+            return
+        self._last_write = now
+        with self.conn:
+            self.conn.execute(
+                "UPDATE jobs SET progress_done = ?, progress_total = COALESCE(?, progress_total), "
+                "progress_detail = COALESCE(?, progress_detail) WHERE job_id = ?",
+                (done, total, detail, self.job_id)
+            )
+        self.check_cancelled()
+
+    def check_cancelled(self):
+        if self._stopping.is_set():
+            raise JobInterrupted()
+        row = self.conn.execute("SELECT cancel_requested FROM jobs WHERE job_id = ?", (self.job_id,)).fetchone()
+        if row and row[0]:
+            raise JobCancelled()
+
+
+def _job_dict(row) -> Dict[str, Any]:
+    job = dict(row)
+    for key in ("params", "result"):
+        job[key] = json.loads(job[key]) if job[key] else None
+    job["cancel_requested"] = bool(job["cancel_requested"])
+    return job
+
+
+def submit_job(conn: sqlite3.Connection, job_type: str, params: Optional[Dict] = None,
+               dedupe_key: Optional[str] = None) -> Tuple[Dict[str, Any], bool]:
+    """
+    Queue a job
+
+    Args:
+        job_type: A registered job type
+        params: Keyword arguments for the handler (JSON-serializable)
+        dedupe_key: Jobs with the same key are not queued twice; defaults
+            to the job type plus its parameters
+
+    Returns:
+        (job, created): created is False when an identical queued or
+        running job was returned instead
+    """
+    if job_type not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job type '{job_type}'")
+    params_json = json.dumps(params or {}, sort_keys=True)
+    if dedupe_key is None:
+        dedupe_key = f"{job_type}:{params_json}"
+
+    while True:
+        try:
+            with conn:
+                job_id = conn.execute(
+                    "INSERT INTO jobs(job_type, params, dedupe_key) VALUES (?, ?, ?)",
+                    (job_type, params_json, dedupe_key)
+                ).lastrowid
+            created = True
+            break
+        except sqlite3.IntegrityError:
+            # The unique index on active dedupe keys rejected it
+            existing = conn.execute(
+                "SELECT job_id FROM jobs WHERE dedupe_key = ? AND status IN ('queued', 'running')",
+                (dedupe_key,)
+            ).fetchone()
+            if existing:
+                job_id, created = existing[0], False
+                break
+            # That job finished in the meantime; try again
+
+    _get_running_queue_wake().set()
+    return get_job(conn, job_id), created
+
+
+def get_job(conn: sqlite3.Connection, job_id: int) -> Optional[Dict[str, Any]]:
+    row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+    return _job_dict(row) if row else None
+
+
+def list_jobs(conn: sqlite3.Connection, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+    """Most recent jobs first, optionally only those with a status"""
+    if status:
+        rows = conn.execute(
+            "SELECT * FROM jobs WHERE status = ? ORDER BY job_id DESC LIMIT ?", (status, limit)
+        ).fetchall()
+    else:
+        rows = conn.execute("SELECT * FROM jobs ORDER BY job_id DESC LIMIT ?", (limit,)).fetchall()
+    return [_job_dict(row) for row in rows]
+
+
+def cancel_job(conn: sqlite3.Connection, job_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Cancel a job: a queued job is cancelled at once, a running one is asked
+    to stop. Finished jobs are left as they are.
+    """
+    with conn:
+        conn.execute(
+            "UPDATE jobs SET status = 'cancelled', finished_at = CURRENT_TIMESTAMP "
+            "WHERE job_id = ? AND status = 'queued'",
+            (job_id,)
+        )
+        conn.execute(
+            "UPDATE jobs SET cancel_requested = 1 WHERE job_id = ? AND status = 'running'",
+            (job_id,)
+        )
+    return get_job(conn, job_id)
+
+
+def _claim_job(conn: sqlite3.Connection) -> Optional[sqlite3.Row]:
+    """Take the oldest queued job and mark it running"""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(
+            "SELECT * FROM jobs WHERE status = 'queued' ORDER BY job_id LIMIT 1"
+        ).fetchone()
+        if row:
+            conn.execute(
+                """UPDATE jobs SET status = 'running', started_at = CURRENT_TIMESTAMP,
+                       attempts = attempts + 1, progress_done = 0, progress_total = NULL
+                   WHERE job_id = ?""",
+                (row['job_id'],)
+            )
+        conn.commit()
+        return row
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def _finish_job(conn: sqlite3.Connection, job_id: int, status: str,
+                result: Optional[Dict] = None, error: Optional[str] = None):
+    with conn:
+        conn.execute(
+            """UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = CURRENT_TIMESTAMP
+               WHERE job_id = ?""",
+            (status, json.dumps(result) if result is not None else None, error, job_id)
+        )
+
+
+class JobQueue:
+    """Worker threads that run queued jobs"""
+    def __init__(self, test_mode: bool = False, workers: Optional[int] = None,
+                 poll_seconds: Optional[float] = None):
+        config = settings.get_jobs_config()
+        self.test_mode = test_mode
+        self.workers = max(1, int(workers if workers is not None else config["workers"]))
+        self.poll_seconds = float(poll_seconds if poll_seconds is not None else config["poll_seconds"])
+        self.wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    @property
+    def is_running(self) -> bool:
+        return any(thread.is_alive() for thread in self._threads)
+
+    def start(self):
+        """Requeue jobs a previous process left running, then start the workers"""
+        if self.is_running:
+            return
+        conn = get_db_connection(test_mode=self.test_mode)
+        try:
+            with conn:
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = 'Interrupted too many times', "
+                    "finished_at = CURRENT_TIMESTAMP WHERE status = 'running' AND attempts >= ?",
+                    (MAX_ATTEMPTS,)
+                )
+                requeued = conn.execute(
+                    "UPDATE jobs SET status = 'queued' WHERE status = 'running'"
+                ).rowcount
+            if requeued:
+                logging.info(f"Requeued {requeued} interrupted jobs")
+        finally:
+            conn.close()
+
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+        logging.info(f"Job queue started with {self.workers} workers")
+
+    def stop(self, timeout: float = 30.0):
+        """Stop the workers; running jobs stop at their next progress report and are requeued"""
+        self._stop.set()
+        self.wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _work(self):
+        conn = get_db_connection(test_mode=self.test_mode)
+        try:
+            while not self._stop.is_set():
+                try:
+                    job = _claim_job(conn)
+                except sqlite3.OperationalError as e:
+                    logging.warning(f"Could not claim a job: {str(e)}")
+                    job = None
+                if job is None:
+                    self.wake.wait(self.poll_seconds)
+                    self.wake.clear()
+                    continue
+                self._run(conn, job)
+        finally:
+            conn.close()
+
+    def _run(self, conn: sqlite3.Connection, job: sqlite3.Row):
+        job_id, job_type = job['job_id'], job['job_type']
+        handler = JOB_HANDLERS.get(job_type)
+        if handler is None:
+            _finish_job(conn, job_id, 'failed', error=f"Unknown job type '{job_type}'")
+            return
+
+        context = JobContext(conn, job_id, self.test_mode, self._stop)
+        started = time.perf_counter()
+        logging.info(f"Job {job_id} ({job_type}) started")
+        try:
+            context.check_cancelled()
+            result = handler(context, **json.loads(job['params'] or "{}"))
+        except JobCancelled:
+            _finish_job(conn, job_id, 'cancelled')
+            logging.info(f"Job {job_id} ({job_type}) cancelled")
+            return
+        except JobInterrupted:
+            with conn:
+                conn.execute("UPDATE jobs SET status = 'queued' WHERE job_id = ?", (job_id,))
+            logging.info(f"Job {job_id} ({job_type}) interrupted by shutdown; requeued")
+            return
+        except Exception as e:
+            logging.error(f"Job {job_id} ({job_type}) failed: {str(e)}")
+            _finish_job(conn, job_id, 'failed', error=str(e))
+            return
+        _finish_job(conn, job_id, 'completed', result=result)
+        logging.info(f"Job {job_id} ({job_type}) completed in {time.perf_counter() - started:.1f} s")
+
+
+# One queue for the application
+_queue: Optional[JobQueue] = None
+
+
+def get_job_queue(test_mode: bool = False) -> JobQueue:
+    """Return the application's job queue"""
+    global _queue
+    if _queue is None:
+        _queue = JobQueue(test_mode=test_mode)
+    return _queue
+
+
+def _get_running_queue_wake() -> threading.Event:
+    # Lets submit_job start an idle worker at once instead of at its next poll
+    return _queue.wake if _queue is not None else threading.Event()
+
+
+# Job types
+
+@job_handler("scan_mail_dump")
+def run_scan_job(context: JobContext, year: Optional[int] = None) -> Dict:
+    """Scan one year's mail dump folder (the current year by default)"""
+    from utils.document_processor import DocumentProcessor
+
+    processor = DocumentProcessor(test_mode=context.test_mode)
+    try:
+        processed_ids = processor.scan_mail_dump(year, progress=context.progress)
+    finally:
+        processor.close()
+    return {"year": year, "processed_count": len(processed_ids), "processed_ids": processed_ids}
+
+
+def submit_scan(conn: sqlite3.Connection, year: int) -> Tuple[Dict[str, Any], bool]:
+    """Queue a scan of one year's mail dump folder, unless one is already queued or running"""
+    return submit_job(conn, "scan_mail_dump", {"year": year}, dedupe_key=f"scan_mail_dump:{year}")
+
+
+@job_handler("dedupe_report")
+def run_dedupe_report(context: JobContext, start_year: int, end_year: int, limit: int = 100) -> Dict:
+    """Find identical files in a range of mail dump years (the largest groups first)"""
+    from utils.blob_store import dedupe_report
+    from utils.path_resolver import PathResolver
+
+    path_resolver = PathResolver(test_mode=context.test_mode)
+    report = dedupe_report([path_resolver.get_mail_dump_path(year) for year in range(start_year, end_year + 1)])
+    report["duplicate_groups"] = report["duplicate_groups"][:limit]
+    return report
+
+
+@job_handler("backfill")
+def run_backfill_job(context: JobContext, start_year: int, end_year: int) -> Dict:
+    """Process the mail dump folders of a range of past years, resuming after the last finished chunk"""
+    from utils.backfill import BackfillRunner
+
+    return BackfillRunner(context).run(start_year, end_year)
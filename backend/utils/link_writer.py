@@ -0,0 +1,252 @@
+# backend/utils/link_writer.py
+#
+# Writers for the client-folder links that point back at documents in the
+# mail dump ("Store Once, Link Everywhere"). The default backend writes
+# Windows .lnk files directly in the MS-SHLLINK binary format, so no COM
+# (pywin32/WScript.Shell) is needed and links can be created on any OS.
+# Symlink and .url backends are available for shares where .lnk files are
+# not wanted.
+import os
+import struct
+import logging
+import tempfile
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import quote
+
+from config import settings
+
+# MS-SHLLINK constants
+LNK_HEADER_SIZE = 0x4C
+LNK_CLSID = bytes.fromhex("0114020000000000c000000000000046")
+HAS_LINK_INFO = 0x02
+HAS_WORKING_DIR = 0x10
+IS_UNICODE = 0x80
+FILE_ATTRIBUTE_NORMAL = 0x80
+SW_SHOWNORMAL = 1
+VOLUME_ID_AND_LOCAL_BASE_PATH = 0x01
+COMMON_NETWORK_RELATIVE_LINK_AND_PATH_SUFFIX = 0x02
+DRIVE_FIXED = 3
+WNNC_NET_LANMAN = 0x00020000
+
+
+def _ansi(text: str) -> bytes:
+    return text.encode("cp1252", errors="replace") + b"\x00"
+
+
+def _unicode(text: str) -> bytes:
+    return text.encode("utf-16-le") + b"\x00\x00"
+
+
+def _windows_path(path: str) -> str:
+    return path.replace("/", "\\")
+
+
+def _link_info(target: str) -> bytes:
+    """Build the LinkInfo structure for a local (C:\\...) or UNC (\\\\server\\share\\...) target"""
+    header_size = 0x24  # includes the Unicode path offsets
+    common_suffix = ""
+
+    if target.startswith("\\\\"):
+        # \\server\share\rest -> network link "\\server\share" + suffix "rest"
+        parts = target[2:].split("\\", 2)
+        net_name = "\\\\" + "\\".join(parts[:2])
+        common_suffix = parts[2] if len(parts) > 2 else ""
+        flags = COMMON_NETWORK_RELATIVE_LINK_AND_PATH_SUFFIX
+
+        net_name_ansi, net_name_unicode = _ansi(net_name), _unicode(net_name)
+        network = struct.pack(
+            "<IIIIIII",
+            0x1C + len(net_name_ansi) + len(net_name_unicode),
+            0,                       # CommonNetworkRelativeLinkFlags
+            0x1C,                    # NetNameOffset
+            0,                       # DeviceNameOffset
+            WNNC_NET_LANMAN,         # NetworkProviderType
+            0x1C + len(net_name_ansi),  # NetNameOffsetUnicode
+            0,                       # DeviceNameOffsetUnicode
+        ) + net_name_ansi + net_name_unicode
+        volume, base_path, base_path_unicode = b"", b"", b""
+    else:
+        flags = VOLUME_ID_AND_LOCAL_BASE_PATH
+        label = b"\x00"
+        volume = struct.pack("<IIII", 0x10 + len(label), DRIVE_FIXED, 0, 0x10) + label
+        base_path, base_path_unicode = _ansi(target), _unicode(target)
+        network = b""
+
+    suffix_ansi, suffix_unicode = _ansi(common_suffix), _unicode(common_suffix)
+
+    volume_offset = header_size if volume else 0
+    base_offset = header_size + len(volume) if base_path else 0
+    network_offset = header_size + len(volume) + len(base_path) if network else 0
+    suffix_offset = header_size + len(volume) + len(base_path) + len(network)
+    base_unicode_offset = suffix_offset + len(suffix_ansi) if base_path_unicode else 0
+    suffix_unicode_offset = suffix_offset + len(suffix_ansi) + len(base_path_unicode)
+
+    body = volume + base_path + network + suffix_ansi + base_path_unicode + suffix_unicode
+    header = struct.pack(
+        "<IIIIIIIII",
+        header_size + len(body),
+        header_size,
+        flags,
+        volume_offset,
+        base_offset,
+        network_offset,
+        suffix_offset,
+        base_unicode_offset,
+        suffix_unicode_offset,
+    )
+    return header + body
+
+
+def build_lnk(target_path: str, working_dir: Optional[str] = None) -> bytes:
+    """
+    Build the bytes of a Windows shell link (.lnk) to an absolute path
+
+    The link carries LinkInfo (local base path or UNC share plus suffix)
+    and a working directory, which is what Explorer needs to resolve it.
+    No ID list is written, so nothing here depends on the local machine.
+    """
+    target = _windows_path(target_path)
+    working_dir = _windows_path(working_dir if working_dir is not None else target.rsplit("\\", 1)[0])
+
+    header = struct.pack(
+        "<I16sIIQQQIiIHHII",
+        LNK_HEADER_SIZE,
+        LNK_CLSID,
+        HAS_LINK_INFO | HAS_WORKING_DIR | IS_UNICODE,
+        FILE_ATTRIBUTE_NORMAL,
+        0, 0, 0,                 # creation, access, write times
+        0,                       # file size
+        0,                       # icon index
+        SW_SHOWNORMAL,
+        0,                       # hotkey
+        0, 0, 0,                 # reserved
+    )
+    string_data = struct.pack("<H", len(working_dir)) + working_dir.encode("utf-16-le")
+    return header + _link_info(target) + string_data + b"\x00\x00\x00\x00"
+
+
+class LinkWriter:
+    """Base class: writes one link file pointing at a target"""
+    name = ""
+    suffix = ""
+
+    def write(self, target_path: str, link_path: str):
+        raise NotImplementedError
+
+
+class LnkWriter(LinkWriter):
+    """Windows .lnk shortcuts written in pure Python"""
+    name = "lnk"
+    suffix = ".lnk"
+
+    def write(self, target_path: str, link_path: str):
+        data = build_lnk(target_path)
+        # A unique name in the same folder, so concurrent writers never share
+        # a temp file and the final replace stays on one filesystem
+        fd, tmp_path = tempfile.mkstemp(prefix=".lnk-", suffix=".tmp", dir=os.path.dirname(link_path) or ".")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, link_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+class SymlinkWriter(LinkWriter):
+    """Filesystem symlinks (on Windows this needs Developer Mode or the symlink privilege)"""
+    name = "symlink"
+    suffix = ""
+
+    def write(self, target_path: str, link_path: str):
+        if os.path.lexists(link_path):
+            os.remove(link_path)
+        os.symlink(target_path, link_path)
+
+
+class UrlWriter(LinkWriter):
+    """Internet shortcuts (.url) with a file:// URL, readable by browsers and Explorer"""
+    name = "url"
+    suffix = ".url"
+
+    def write(self, target_path: str, link_path: str):
+        path = target_path.replace("\\", "/")
+        # The drive colon stays as it is; Explorer cannot open file:///C%3A/...
+        if path.startswith("//"):
+            url = "file:" + quote(path, safe="/:")
+        else:
+            url = "file:///" + quote(path.lstrip("/"), safe="/:")
+        with open(link_path, "w", encoding="utf-8", newline="\r\n") as f:
+            f.write(f"[InternetShortcut]\nURL={url}\n")
+
+
+LINK_BACKENDS = {writer.name: writer for writer in (LnkWriter, SymlinkWriter, UrlWriter)}
+
+
+def get_link_writer(name: Optional[str] = None) -> LinkWriter:
+    """Return the link writer for a backend name (defaults to files.link_backend, then lnk)"""
+    name = name or settings.get_files_config()["link_backend"] or "lnk"
+    if name not in LINK_BACKENDS:
+        raise ValueError(f"Unknown link backend '{name}' (expected one of {', '.join(LINK_BACKENDS)})")
+    return LINK_BACKENDS[name]()
+
+
+class LinkBatch:
+    """
+    Collects links for a whole scan and creates them together: each target
+    folder is created once, then the link files are written
+    """
+    def __init__(self, writer: LinkWriter):
+        self.writer = writer
+        self._links: List[Tuple[str, str]] = []
+
+    def __len__(self) -> int:
+        return len(self._links)
+
+    def add(self, target_path: str, link_path: str):
+        """Queue a link"""
+        self._links.append((target_path, link_path))
+
+    def truncate(self, count: int):
+        """Drop the links queued after the first ``count`` (e.g. when a write was rolled back)"""
+        del self._links[count:]
+
+    def flush(self) -> Tuple[int, int]:
+        """
+        Create the queued links. Links that fail stay queued, so calling
+        flush again retries just those.
+
+        Returns:
+            (created, failed)
+        """
+        links, self._links = self._links, []
+        created = failed = 0
+        folders: Set[str] = set()
+        failed_folders: Dict[str, str] = {}
+
+        for folder in {os.path.dirname(link_path) for _, link_path in links}:
+            try:
+                os.makedirs(folder, exist_ok=True)
+                folders.add(folder)
+            except OSError as e:
+                failed_folders[folder] = str(e)
+
+        for target_path, link_path in links:
+            folder = os.path.dirname(link_path)
+            if folder in failed_folders:
+                logging.error(f"Failed to create shortcut {link_path}: {failed_folders[folder]}")
+                self._links.append((target_path, link_path))
+                failed += 1
+                continue
+            try:
+                self.writer.write(target_path, link_path)
+                created += 1
+            except OSError as e:
+                logging.error(f"Failed to create shortcut {link_path}: {str(e)}")
+                self._links.append((target_path, link_path))
+                failed += 1
+
+        if links:
+            logging.info(f"Created {created} shortcuts in {len(folders)} folders ({failed} failed)")
+        return created, failed
@@ -0,0 +1,186 @@
+# backend/utils/mail_watcher.py
+#
+# Feeds files dropped into the mail dump to the DocumentProcessor as they
+# arrive instead of waiting for the hourly scan. With the optional watchdog
+# package it listens for filesystem events (inotify on Linux,
+# ReadDirectoryChangesW on Windows); without it, it polls the folder, which
+# the scan manifest keeps cheap. Events are debounced per file so a
+# document that is still being written or synced is processed once, after
+# it has been quiet for a moment.
+import os
+import time
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from config import settings
+from utils.document_processor import DocumentProcessor
+from utils.scan_manifest import stat_files
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+# How often the worker wakes up to look for debounced files
+TICK_SECONDS = 0.5
+
+
+class _MailDumpEventHandler(FileSystemEventHandler):
+    """Forwards create, rename and write events for PDFs to the watcher"""
+    def __init__(self, watcher: "MailDumpWatcher"):
+        self.watcher = watcher
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.watcher.notify(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.watcher.notify(event.dest_path)
+
+    def on_modified(self, event):
+        # Large files and OneDrive downloads arrive as a create followed by writes
+        if not event.is_directory:
+            self.watcher.notify(event.src_path)
+
+
+class MailDumpWatcher:
+    """Watches the current year's mail dump folder and processes new files"""
+    def __init__(self, test_mode: bool = False, debounce_seconds: Optional[float] = None,
+                 poll_interval: Optional[float] = None):
+        config = settings.get_watcher_config()
+        self.test_mode = test_mode
+        self.debounce_seconds = float(debounce_seconds if debounce_seconds is not None else config["debounce_seconds"])
+        self.poll_interval = float(poll_interval if poll_interval is not None else config["poll_interval_seconds"])
+
+        self._pending: Dict[str, float] = {}
+        self._pending_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._observer = None
+        self._watched_folder: Optional[str] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def uses_events(self) -> bool:
+        """True when filesystem events are available, False when polling"""
+        return Observer is not None
+
+    def notify(self, path: str):
+        """Queue a file for processing once it has been quiet for the debounce period"""
+        if not path.lower().endswith(".pdf"):
+            return
+        with self._pending_lock:
+            self._pending[path] = time.monotonic()
+
+    def start(self):
+        """Start the worker thread (and the event observer when available)"""
+        if self.is_running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="mail-dump-watcher", daemon=True)
+        self._thread.start()
+        logging.info(f"Mail dump watcher started ({'filesystem events' if self.uses_events else 'polling'})")
+
+    def stop(self, timeout: float = 10.0):
+        """Stop watching and wait for the current batch to finish"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        logging.info("Mail dump watcher stopped")
+
+    def _watch(self, folder: str):
+        """Point the observer at a folder, replacing the previous one (year rollover)"""
+        if self._observer is not None and folder == self._watched_folder:
+            return
+        self._unwatch()
+        if Observer is None or not os.path.isdir(folder):
+            return
+        self._observer = Observer()
+        self._observer.schedule(_MailDumpEventHandler(self), folder, recursive=False)
+        self._observer.start()
+        self._watched_folder = folder
+        logging.info(f"Watching {folder}")
+
+    def _unwatch(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+        self._watched_folder = None
+
+    def _take_due(self) -> List[str]:
+        """Remove and return the paths that have been quiet for the debounce period"""
+        cutoff = time.monotonic() - self.debounce_seconds
+        with self._pending_lock:
+            due = [path for path, last_event in self._pending.items() if last_event <= cutoff]
+            for path in due:
+                del self._pending[path]
+        return due
+
+    def _run(self):
+        # SQLite connections stay on the thread that opened them
+        processor = DocumentProcessor(test_mode=self.test_mode)
+        last_poll = None
+
+        while not self._stop.is_set():
+            try:
+                year = datetime.now().year
+                folder = processor.path_resolver.get_mail_dump_path(year)
+                self._watch(folder)
+
+                # Scan once at startup to pick up files that arrived while the
+                # app was down, then keep polling if events are unavailable
+                # (no watchdog, or the folder does not exist yet)
+                if last_poll is None or (self._observer is None and time.monotonic() - last_poll >= self.poll_interval):
+                    last_poll = time.monotonic()
+                    processed_ids = processor.scan_mail_dump(year)
+                    if processed_ids:
+                        logging.info(f"Watcher processed {len(processed_ids)} documents")
+
+                due = self._take_due()
+                if due:
+                    self._process(processor, folder, due)
+            except Exception as e:
+                logging.error(f"Mail dump watcher error: {str(e)}")
+
+            self._stop.wait(TICK_SECONDS)
+
+        self._unwatch()
+        # Flush buffered processing log rows on the thread that owns the connection
+        processor.close()
+
+    def _process(self, processor: DocumentProcessor, folder: str, paths: List[str]):
+        """Process just the changed files, skipping any already in client_files"""
+        # Rebuild paths from the configured folder so they match what a full
+        # scan stores in client_files and the manifest
+        same_folder = os.path.normcase(os.path.normpath(folder))
+        listing = stat_files(
+            os.path.join(folder, os.path.basename(p)) for p in paths
+            if os.path.normcase(os.path.normpath(os.path.dirname(p))) == same_folder
+        )
+        if not listing:
+            return
+        processed_ids = processor.process_listing(folder, listing, prune=False)
+        if processed_ids:
+            logging.info(f"Watcher processed {len(processed_ids)} documents: {processed_ids}")
+
+
+# One watcher for the application
+_watcher: Optional[MailDumpWatcher] = None
+
+
+def get_mail_watcher(test_mode: bool = False) -> MailDumpWatcher:
+    """Return the application's mail dump watcher"""
+    global _watcher
+    if _watcher is None:
+        _watcher = MailDumpWatcher(test_mode=test_mode)
+    return _watcher
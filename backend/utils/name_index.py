@@ -0,0 +1,374 @@
+# backend/utils/name_index.py
+#
+# In-memory name resolution for clients and providers. Names extracted from
+# filenames are matched against display names and name_variants without a
+# query per name: exact and alias lookups are dict hits, and fuzzy
+# candidates come from token and trigram inverted indexes, so only names
+# that share something with the query are ever scored.
+import re
+import time
+import logging
+import sqlite3
+import threading
+from collections import Counter
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from database.table_versions import get_table_version
+
+# Scores used to rank candidates
+SCORE_EXACT = 1.0
+SCORE_ALIAS = 0.95
+SCORE_NORMALIZED = 0.9
+
+# Below this a candidate is not worth showing at all
+MIN_CANDIDATE_SCORE = 0.4
+
+# Defaults for auto-linking: the best candidate must reach the threshold
+# and beat the runner-up by the margin, otherwise a person decides
+DEFAULT_MATCH_THRESHOLD = 0.75
+DEFAULT_MATCH_MARGIN = 0.1
+
+# Fuzzy candidates scored per query, taken in order of shared trigrams
+MAX_FUZZY_CANDIDATES = 50
+
+# Names searched for in document text must be at least this long, so
+# short keys do not turn up inside unrelated words and phrases
+MIN_TEXT_KEY_LENGTH = 5
+
+# Words that do not distinguish one client from another
+LEGAL_SUFFIXES = {
+    "inc", "incorporated", "llc", "llp", "lp", "ltd", "limited", "co", "corp",
+    "corporation", "company", "pc", "pllc", "pa", "the", "plan", "401k",
+}
+
+
+def normalize_name(name: Optional[str]) -> str:
+    """Case-fold and collapse whitespace so lookups ignore formatting"""
+    if not name:
+        return ""
+    return re.sub(r"\s+", " ", name).strip().casefold()
+
+
+def match_key(name: Optional[str]) -> str:
+    """
+    Reduce a name to the tokens that identify it: case-folded, punctuation
+    removed, "&" read as "and", and legal suffixes such as Inc or LLC dropped
+    """
+    text = normalize_name(name).replace("&", " and ").replace("'", "")
+    tokens = re.findall(r"[0-9a-z]+", text)
+    significant = [t for t in tokens if t not in LEGAL_SUFFIXES]
+    return " ".join(significant or tokens)
+
+
+def split_variants(variants: Optional[str]) -> List[str]:
+    """Split a comma-separated name_variants value"""
+    if not variants:
+        return []
+    return [v.strip() for v in variants.split(",") if v.strip()]
+
+
+def _trigrams(key: str) -> Set[str]:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(query_tokens: FrozenSet[str], query_grams: Set[str],
+               key_tokens: FrozenSet[str], key_grams: Set[str]) -> float:
+    """
+    Score two match keys between 0 and 1
+
+    Whole-token containment ("Dakota" in "Dakota Creek") scores at least
+    0.7 and rises with how much of the longer name is covered; otherwise
+    the trigram Dice coefficient catches typos and partial words.
+    """
+    dice = 2 * len(query_grams & key_grams) / (len(query_grams) + len(key_grams))
+
+    shared = len(query_tokens & key_tokens)
+    token_score = 0.0
+    if shared:
+        coverage = shared / max(len(query_tokens), len(key_tokens))
+        if shared == min(len(query_tokens), len(key_tokens)):
+            token_score = 0.7 + 0.25 * coverage
+        else:
+            token_score = 0.6 * coverage
+
+    return max(dice, token_score)
+
+
+class NameIndex:
+    """
+    Lookup structures for one entity type (clients or providers)
+
+    Entries are (id, primary name, name_variants). Display names and
+    variants are both searchable; variants shorter than three characters
+    (AS, BC) only ever match exactly.
+    """
+    def __init__(self, entries: Iterable[Tuple[int, str, Optional[str]]]):
+        self.names: Dict[int, str] = {}
+        self._exact: Dict[str, List[int]] = {}
+        self._alias: Dict[str, List[int]] = {}
+        self._keys: Dict[str, Set[int]] = {}
+        self._key_tokens: Dict[str, FrozenSet[str]] = {}
+        self._key_grams: Dict[str, Set[str]] = {}
+        self._token_index: Dict[str, Set[str]] = {}
+        self._gram_index: Dict[str, Set[str]] = {}
+        self._max_key_tokens: Optional[int] = None
+
+        for entity_id, name, variants in entries:
+            self.names[entity_id] = name
+            if normalize_name(name):
+                self._exact.setdefault(normalize_name(name), []).append(entity_id)
+                self._add_key(match_key(name), entity_id)
+            for variant in split_variants(variants):
+                self._alias.setdefault(normalize_name(variant), []).append(entity_id)
+                if len(variant) >= 3:
+                    self._add_key(match_key(variant), entity_id)
+
+    def _add_key(self, key: str, entity_id: int):
+        if not key:
+            return
+        if key not in self._keys:
+            self._keys[key] = set()
+            self._key_tokens[key] = frozenset(key.split())
+            self._key_grams[key] = _trigrams(key)
+            for token in self._key_tokens[key]:
+                self._token_index.setdefault(token, set()).add(key)
+            for gram in self._key_grams[key]:
+                self._gram_index.setdefault(gram, set()).add(key)
+        self._keys[key].add(entity_id)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _fuzzy_keys(self, tokens: FrozenSet[str], grams: Set[str]) -> List[str]:
+        """Keys sharing a token or trigram with the query, most overlap first"""
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._gram_index.get(gram, ()))
+        for token in tokens:
+            # A shared whole token always makes the cut
+            for key in self._token_index.get(token, ()):
+                shared[key] += len(grams)
+        return [key for key, _ in shared.most_common(MAX_FUZZY_CANDIDATES)]
+
+    def candidates(self, name: str, limit: int = 5) -> List[Dict]:
+        """
+        Return ranked matches for a name
+
+        Returns:
+            List of {"id", "name", "score", "match"} dicts, best first
+        """
+        query = normalize_name(name)
+        if not query:
+            return []
+
+        scored: Dict[int, Tuple[float, str]] = {}
+
+        def add(entity_id: int, score: float, match: str):
+            if entity_id not in scored or scored[entity_id][0] < score:
+                scored[entity_id] = (score, match)
+
+        for entity_id in self._exact.get(query, []):
+            add(entity_id, SCORE_EXACT, "exact")
+        for entity_id in self._alias.get(query, []):
+            add(entity_id, SCORE_ALIAS, "alias")
+
+        key = match_key(name)
+        if key:
+            for entity_id in self._keys.get(key, ()):
+                add(entity_id, SCORE_NORMALIZED, "normalized")
+
+            tokens, grams = frozenset(key.split()), _trigrams(key)
+            for candidate in self._fuzzy_keys(tokens, grams):
+                if candidate == key:
+                    continue
+                score = similarity(tokens, grams, self._key_tokens[candidate], self._key_grams[candidate])
+                if score >= MIN_CANDIDATE_SCORE:
+                    for entity_id in self._keys[candidate]:
+                        add(entity_id, min(score, SCORE_NORMALIZED), "fuzzy")
+
+        ranked = sorted(scored.items(), key=lambda item: (-item[1][0], item[0]))
+        return [
+            {"id": entity_id, "name": self.names[entity_id], "score": round(score, 3), "match": match}
+            for entity_id, (score, match) in ranked[:limit]
+        ]
+
+    def match(self, name: str, threshold: float = DEFAULT_MATCH_THRESHOLD,
+              margin: float = DEFAULT_MATCH_MARGIN) -> Tuple[Optional[int], List[Dict]]:
+        """
+        Decide whether a name can be linked automatically
+
+        Returns:
+            (id, candidates) where id is None unless the best candidate
+            reaches ``threshold`` and is not ambiguous (a fuzzy best match
+            must lead the runner-up by more than ``margin``)
+        """
+        ranked = self.candidates(name)
+        if not ranked or ranked[0]["score"] < threshold:
+            return None, ranked
+        if len(ranked) > 1:
+            best, runner_up = ranked[0], ranked[1]
+            # Exact, alias and normalized hits only lose to a tie; fuzzy
+            # hits also need a clear lead
+            lead = margin if best["match"] == "fuzzy" else 0
+            if best["score"] - runner_up["score"] <= lead:
+                return None, ranked
+        return ranked[0]["id"], ranked
+
+    def best_match(self, name: str, threshold: float = DEFAULT_MATCH_THRESHOLD) -> Optional[int]:
+        """Return the confidently matching id for a name, or None"""
+        return self.match(name, threshold)[0]
+
+    def find_in_text(self, text: str, limit: int = 10) -> List[str]:
+        """
+        Return the names whose match keys occur in a text (as whole runs of
+        tokens), in order of first appearance
+
+        Only the index's own keys are looked up, one dict hit per run of up
+        to the longest key's length, so a page of text costs about as much
+        as matching a few hundred names.
+        """
+        if self._max_key_tokens is None:
+            self._max_key_tokens = max((len(tokens) for tokens in self._key_tokens.values()), default=0)
+        tokens = match_key(text).split()
+        found: Dict[str, None] = {}
+        for start in range(len(tokens)):
+            for length in range(min(self._max_key_tokens, len(tokens) - start), 0, -1):
+                key = " ".join(tokens[start:start + length])
+                if len(key) >= MIN_TEXT_KEY_LENGTH and key in self._keys:
+                    for entity_id in sorted(self._keys[key]):
+                        found.setdefault(self.names[entity_id])
+                    break
+            if len(found) >= limit:
+                break
+        return list(found)[:limit]
+
+
+class NameIndexes(NamedTuple):
+    """
+    One build of the client and provider indexes with the table versions
+    they were built from. The resolver swaps in a new build with a single
+    assignment, so a reader never pairs new clients with old providers.
+    """
+    clients: NameIndex
+    providers: NameIndex
+    versions: Optional[Tuple[int, ...]]
+
+
+class NameResolver:
+    """
+    Client and provider name indexes for one database, rebuilt only when
+    the clients or providers tables change (tracked by table_versions)
+    """
+    TABLES = ("clients", "providers")
+
+    def __init__(self, check_interval: float = 5.0):
+        self.check_interval = check_interval
+        self._indexes = NameIndexes(NameIndex([]), NameIndex([]), None)
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def clients(self) -> NameIndex:
+        return self._indexes.clients
+
+    @property
+    def providers(self) -> NameIndex:
+        return self._indexes.providers
+
+    @property
+    def versions(self) -> Optional[Tuple[int, ...]]:
+        """Table versions the indexes were built from (None before the first build)"""
+        return self._indexes.versions
+
+    def refresh(self, conn: sqlite3.Connection, force: bool = False) -> bool:
+        """
+        Rebuild the indexes if clients or providers changed since the last
+        build. Checks at most once per ``check_interval`` seconds unless forced.
+
+        Returns:
+            True if the indexes were rebuilt
+        """
+        now = time.monotonic()
+        if not force and self.versions is not None and now - self._last_check < self.check_interval:
+            return False
+
+        with self._lock:
+            self._last_check = now
+            versions = tuple(get_table_version(conn, table) for table in self.TABLES)
+            # -1 means a table is not tracked yet, so always rebuild
+            if not force and versions == self.versions and -1 not in versions:
+                return False
+            self._build(conn, versions)
+            return True
+
+    def _build(self, conn: sqlite3.Connection, versions: Tuple[int, ...]):
+        started = time.perf_counter()
+        clients = conn.execute(
+            "SELECT client_id, display_name, name_variants FROM clients WHERE valid_to IS NULL ORDER BY client_id"
+        ).fetchall()
+        try:
+            providers = conn.execute(
+                "SELECT provider_id, provider_name, name_variants FROM providers ORDER BY provider_id"
+            ).fetchall()
+        except sqlite3.OperationalError as e:
+            logging.error(f"Could not load providers for name matching: {str(e)}")
+            providers = []
+
+        indexes = NameIndexes(
+            NameIndex((row[0], row[1], row[2]) for row in clients),
+            NameIndex((row[0], row[1], row[2]) for row in providers),
+            versions
+        )
+        self._indexes = indexes
+        logging.info(
+            f"Built name index: {len(indexes.clients)} clients, {len(indexes.providers)} providers "
+            f"in {(time.perf_counter() - started) * 1000:.1f} ms"
+        )
+
+    def snapshot(self) -> Tuple[NameIndex, NameIndex, Optional[Tuple[int, ...]]]:
+        """Return the built indexes, e.g. to use them in a worker process"""
+        return tuple(self._indexes)
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Tuple[NameIndex, NameIndex, Optional[Tuple[int, ...]]]) -> "NameResolver":
+        """Create a resolver around indexes built elsewhere (never refreshes)"""
+        resolver = cls()
+        resolver._indexes = NameIndexes(*snapshot)
+        return resolver
+
+    def match_client(self, name: str, threshold: float = DEFAULT_MATCH_THRESHOLD) -> Optional[int]:
+        """Return the confidently matching active client_id for a name"""
+        return self.clients.best_match(name, threshold)
+
+    def resolve_client(self, name: str, threshold: float = DEFAULT_MATCH_THRESHOLD) -> Tuple[Optional[int], List[Dict]]:
+        """Return the confident client_id (or None) with the ranked candidates"""
+        return self.clients.match(name, threshold)
+
+    def find_clients_in_text(self, text: str) -> List[str]:
+        """Return the display names of active clients mentioned in a text"""
+        return self.clients.find_in_text(text)
+
+    def find_provider_in_text(self, text: str) -> Optional[str]:
+        """Return the name of the first provider mentioned in a text"""
+        found = self.providers.find_in_text(text, limit=1)
+        return found[0] if found else None
+
+    def match_provider(self, name: str, threshold: float = DEFAULT_MATCH_THRESHOLD) -> Optional[int]:
+        """Return the confidently matching provider_id for a name"""
+        return self.providers.best_match(name, threshold)
+
+    def get_client_name(self, client_id: int) -> Optional[str]:
+        """Return the display name of an active client"""
+        return self.clients.names.get(client_id)
+
+
+# One resolver per database, shared by every DocumentProcessor instance
+_resolvers: Dict[bool, NameResolver] = {}
+
+
+def get_name_resolver(test_mode: bool = False) -> NameResolver:
+    """Return the shared name resolver for the live or test database"""
+    if test_mode not in _resolvers:
+        _resolvers[test_mode] = NameResolver()
+    return _resolvers[test_mode]
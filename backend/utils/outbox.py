@@ -0,0 +1,187 @@
+# backend/utils/outbox.py
+#
+# Transactional outbox for filesystem side effects. Instead of creating
+# client shortcuts while the request waits, callers insert a row into
+# fs_outbox in the same transaction as the database rows the shortcut
+# belongs to; the row only becomes visible once that transaction commits.
+# A background worker creates the shortcuts (each client folder once per
+# batch) and retries failures with a doubling delay, so a slow or offline
+# OneDrive folder no longer holds up the request. Writing a shortcut is
+# idempotent, so a row that is retried after a crash does no harm.
+import os
+import logging
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+from config import settings
+from database import get_db_connection
+from utils.link_writer import get_link_writer
+
+ACTION_SHORTCUT = "shortcut"
+
+
+def enqueue_shortcut(cursor: sqlite3.Cursor, target_path: str, link_path: str,
+                     file_id: Optional[int] = None):
+    """
+    Record a shortcut to create once the caller's transaction commits
+
+    Args:
+        cursor: Cursor of the transaction that writes the related rows
+        target_path: File the shortcut points to
+        link_path: Where the shortcut goes
+        file_id: The client_files row it belongs to, for troubleshooting
+    """
+    cursor.execute(
+        "INSERT INTO fs_outbox(action, target_path, link_path, file_id) VALUES (?, ?, ?, ?)",
+        (ACTION_SHORTCUT, target_path, link_path, file_id)
+    )
+
+
+class OutboxWorker:
+    """Background thread that works through due outbox rows"""
+    def __init__(self, test_mode: bool = False):
+        config = settings.get_outbox_config()
+        self.test_mode = test_mode
+        self.poll_seconds = float(config["poll_seconds"])
+        self.batch_size = max(1, int(config["batch_size"]))
+        self.max_attempts = max(1, int(config["max_attempts"]))
+        self.retry_delay = float(config["retry_delay_seconds"])
+        self.writer = get_link_writer()
+        self.wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.is_running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="fs-outbox", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        self._stop.set()
+        self.wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def notify(self):
+        """Process new rows now instead of at the next poll"""
+        self.wake.set()
+
+    def _run(self):
+        conn = get_db_connection(test_mode=self.test_mode)
+        try:
+            while not self._stop.is_set():
+                try:
+                    handled = self.process_due(conn)
+                except Exception as e:
+                    logging.error(f"Outbox worker failed: {str(e)}")
+                    handled = 0
+                if handled < self.batch_size:
+                    self.wake.wait(self.poll_seconds)
+                    self.wake.clear()
+        finally:
+            conn.close()
+
+    def process_due(self, conn: sqlite3.Connection) -> int:
+        """
+        Carry out one batch of due outbox rows
+
+        Returns:
+            Number of rows handled (created or failed)
+        """
+        rows = conn.execute(
+            """SELECT outbox_id, action, target_path, link_path, attempts FROM fs_outbox
+               WHERE status = 'pending' AND next_attempt_at <= CURRENT_TIMESTAMP
+               ORDER BY outbox_id LIMIT ?""",
+            (self.batch_size,)
+        ).fetchall()
+        if not rows:
+            return 0
+
+        # Each client folder is created once for the batch
+        folder_errors: Dict[str, str] = {}
+        for folder in {os.path.dirname(row['link_path']) for row in rows}:
+            try:
+                os.makedirs(folder, exist_ok=True)
+            except OSError as e:
+                folder_errors[folder] = str(e)
+
+        done: List[int] = []
+        failed = []
+        for row in rows:
+            error = folder_errors.get(os.path.dirname(row['link_path']))
+            if error is None:
+                try:
+                    if row['action'] != ACTION_SHORTCUT:
+                        raise ValueError(f"Unknown outbox action '{row['action']}'")
+                    self.writer.write(row['target_path'], row['link_path'])
+                    done.append(row['outbox_id'])
+                    continue
+                except (OSError, ValueError) as e:
+                    error = str(e)
+            failed.append((row, error))
+
+        with conn:
+            conn.executemany(
+                "UPDATE fs_outbox SET status = 'done', attempts = attempts + 1, done_at = CURRENT_TIMESTAMP "
+                "WHERE outbox_id = ?",
+                [(outbox_id,) for outbox_id in done]
+            )
+            for row, error in failed:
+                attempts = row['attempts'] + 1
+                if attempts >= self.max_attempts:
+                    logging.error(f"Giving up on shortcut {row['link_path']} after {attempts} attempts: {error}")
+                    status, delay = 'failed', 0
+                else:
+                    logging.warning(f"Shortcut {row['link_path']} failed (attempt {attempts}), will retry: {error}")
+                    status, delay = 'pending', self.retry_delay * 2 ** (attempts - 1)
+                conn.execute(
+                    """UPDATE fs_outbox SET status = ?, attempts = ?, last_error = ?,
+                           next_attempt_at = datetime('now', ?)
+                       WHERE outbox_id = ?""",
+                    (status, attempts, error, f"+{int(delay)} seconds", row['outbox_id'])
+                )
+
+        logging.info(f"Outbox: created {len(done)} shortcuts ({len(failed)} failed)")
+        return len(rows)
+
+
+def get_outbox_status(conn: sqlite3.Connection, limit: int = 50) -> Dict:
+    """Row counts by status and the most recent rows that gave up"""
+    counts = {row['status']: row['count'] for row in conn.execute(
+        "SELECT status, COUNT(*) AS count FROM fs_outbox GROUP BY status"
+    ).fetchall()}
+    failed = [dict(row) for row in conn.execute(
+        "SELECT * FROM fs_outbox WHERE status = 'failed' ORDER BY outbox_id DESC LIMIT ?", (limit,)
+    ).fetchall()]
+    return {"counts": counts, "failed": failed}
+
+
+def retry_failed(conn: sqlite3.Connection) -> int:
+    """Put rows that gave up back in the queue; returns how many"""
+    with conn:
+        count = conn.execute(
+            "UPDATE fs_outbox SET status = 'pending', attempts = 0, next_attempt_at = CURRENT_TIMESTAMP "
+            "WHERE status = 'failed'"
+        ).rowcount
+    get_outbox_worker().notify()
+    return count
+
+
+# One worker for the application
+_worker: Optional[OutboxWorker] = None
+
+
+def get_outbox_worker(test_mode: bool = False) -> OutboxWorker:
+    """Return the application's outbox worker"""
+    global _worker
+    if _worker is None:
+        _worker = OutboxWorker(test_mode=test_mode)
+    return _worker
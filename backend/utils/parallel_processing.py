@@ -0,0 +1,181 @@
+# backend/utils/parallel_processing.py
+#
+# Parallel mode for large mail dump scans. Filename parsing and name
+# matching are pure CPU work over in-memory data, so they run in a process
+# pool over chunks of files. Each worker rebuilds the pattern registry and
+# name indexes from a snapshot taken once in the parent. Results stream
+# back to a single writer in the parent process, which owns the SQLite
+# connection and writes client_files, payment_files and processing_log rows
+# in batched transactions. Client shortcuts for a batch are created after
+# its transaction commits. Files whose names are not recognised are
+# classified by their text on the content extraction pool, if enabled.
+import os
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from utils.document_parser import DocumentParser
+from utils.link_writer import LinkBatch
+from utils.name_index import NameResolver
+from utils.pattern_registry import PatternRegistry
+from utils.text_extraction import get_content_extractor
+
+# Set in each worker process by _init_worker
+_worker_parser: Optional[DocumentParser] = None
+
+
+def _init_worker(pattern_snapshot: Tuple, name_snapshot: Tuple):
+    global _worker_parser
+    registry = PatternRegistry()
+    registry.load_rows(*pattern_snapshot)
+    _worker_parser = DocumentParser(registry, NameResolver.from_snapshot(name_snapshot))
+
+
+def _parse_chunk(paths: List[str], threshold: float) -> List[Dict]:
+    return [_worker_parser.parse(path, threshold) for path in paths]
+
+
+class BatchWriter:
+    """
+    Writes parsed documents through DocumentProcessor.write_document, many
+    documents per transaction. Each document gets its own savepoint so one
+    failure does not roll back the rest of the batch.
+    """
+    def __init__(self, processor, batch_size: int = 500):
+        self.processor = processor
+        self.conn = processor.conn
+        self.batch_size = batch_size
+        self.file_ids: List[int] = []
+        self.failed_paths: Set[str] = set()
+        self._pending: List[Dict] = []
+
+    def add(self, parsed_documents: List[Dict]):
+        """Queue parsed documents, writing whenever a full batch is ready"""
+        self._pending.extend(parsed_documents)
+        while len(self._pending) >= self.batch_size:
+            batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+            self._write(batch)
+
+    def flush(self):
+        """Write whatever is still queued"""
+        if self._pending:
+            batch, self._pending = self._pending, []
+            self._write(batch)
+
+    def _write(self, batch: List[Dict]):
+        log_rows = []
+        matcher = self.processor.payment_matcher()
+        shortcuts = LinkBatch(self.processor.path_resolver.link_writer)
+        self.conn.execute("BEGIN")
+        try:
+            cursor = self.conn.cursor()
+            for parsed in batch:
+                filename = parsed["filename"]
+                if parsed["error"]:
+                    logging.error(f"Error processing document {parsed['file_path']}: {parsed['error']}")
+                    log_rows.append((filename, "error", parsed["error"], None))
+                    self.failed_paths.add(parsed["file_path"])
+                    continue
+                if not parsed["is_401k"]:
+                    log_rows.append((filename, "skipped", "Not a 401k document", None))
+                    continue
+
+                probes, links = len(matcher), len(shortcuts)
+                cursor.execute("SAVEPOINT document")
+                try:
+                    file_id = self.processor.write_document(cursor, parsed, matcher, shortcuts)
+                    cursor.execute("RELEASE SAVEPOINT document")
+                except Exception as e:
+                    cursor.execute("ROLLBACK TO SAVEPOINT document")
+                    matcher.truncate(probes)
+                    shortcuts.truncate(links)
+                    cursor.execute("RELEASE SAVEPOINT document")
+                    logging.error(f"Error processing document {parsed['file_path']}: {str(e)}")
+                    log_rows.append((filename, "error", str(e), None))
+                    self.failed_paths.add(parsed["file_path"])
+                    continue
+
+                if file_id is None:
+                    # Another scan recorded the file since it was found new
+                    logging.info(f"File already processed: {filename}")
+                    continue
+                log_rows.append((filename, "processed", f"File ID: {file_id}", file_id))
+                self.file_ids.append(file_id)
+
+            # Payment links for the whole batch: one join, one executemany
+            matcher.write(cursor)
+            cursor.executemany(
+                "INSERT INTO processing_log(file_name, status, details, file_id) VALUES (?, ?, ?, ?)",
+                log_rows
+            )
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            self.failed_paths.update(parsed["file_path"] for parsed in batch)
+            raise
+        shortcuts.flush()
+
+
+def process_files_parallel(processor, paths: List[str], workers: Optional[int] = None,
+                           chunk_size: int = 250, batch_size: int = 500,
+                           progress: Optional[Callable[[int, int], None]] = None) -> Tuple[List[int], Set[str]]:
+    """
+    Process new mail dump files with a process pool and a batched writer
+
+    Args:
+        processor: DocumentProcessor whose connection receives the writes
+        paths: Files to process (already known to be new)
+        workers: Worker processes (defaults to one per CPU core)
+        chunk_size: Files handed to a worker at a time
+        batch_size: Documents written per transaction
+        progress: Called with (files parsed, total) after each chunk; an
+            exception it raises cancels the chunks not started yet
+
+    Returns:
+        (file_ids created, paths that failed)
+    """
+    threshold = processor.get_match_threshold()
+    pattern_snapshot = processor.patterns.snapshot()
+    name_snapshot = processor.names.snapshot()
+    workers = workers or os.cpu_count() or 1
+
+    # Files with unrecognised names wait for their text (if enabled)
+    content = get_content_extractor(processor.test_mode)
+    pending_text = []
+
+    writer = BatchWriter(processor, batch_size)
+    chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+    logging.info(f"Processing {len(paths)} documents with {workers} workers in {len(chunks)} chunks")
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(pattern_snapshot, name_snapshot)) as pool:
+        futures = {pool.submit(_parse_chunk, chunk, threshold): chunk for chunk in chunks}
+        parsed = 0
+        try:
+            for future in as_completed(futures):
+                try:
+                    results = future.result()
+                    if content is not None:
+                        pending_text.extend(
+                            (result["file_path"], content.submit(result["file_path"]))
+                            for result in results if not result["is_401k"] and not result["error"]
+                        )
+                        results = [result for result in results if result["is_401k"] or result["error"]]
+                    writer.add(results)
+                except Exception as e:
+                    logging.error(f"Parallel document processing failed for a chunk: {str(e)}")
+                    writer.failed_paths.update(futures[future])
+                parsed += len(futures[future])
+                if progress:
+                    progress(parsed, len(paths))
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+    if pending_text:
+        parser = processor.parser
+        writer.add([parser.parse(path, threshold, future.result()) for path, future in pending_text])
+    writer.flush()
+
+    return writer.file_ids, writer.failed_paths
@@ -4,9 +4,8 @@ from datetime import datetime
 from typing import Optional
 from config import settings
 import logging
-import win32com.client
-import pythoncom
 import re
+from utils.link_writer import get_link_writer
 
 class PathResolver:
     """
@@ -17,6 +16,7 @@ class PathResolver:
         """Initialize the path resolver with appropriate settings"""
         self.username = os.getlogin()
         self.test_mode = test_mode
+        self.link_writer = get_link_writer()
         
     def get_mail_dump_path(self, year=None) -> str:
         """
@@ -34,6 +34,21 @@ class PathResolver:
         mail_dump = settings.config["files"]["mail_dump"]
         return mail_dump.replace("{username}", self.username).replace("{year}", str(year))
     
+    def get_blob_store_path(self) -> str:
+        """
+        Resolves the content-addressed blob store folder
+        
+        Defaults to a hidden .blobs folder next to the mail dump year
+        folders, so mail dump files can be hard links to the blobs (hard
+        links only work within one volume)
+        
+        Returns:
+            Fully resolved blob store path
+        """
+        files = settings.get_files_config()
+        blob_store = files["blob_store"] or files["mail_dump"].replace("{year}", ".blobs")
+        return blob_store.replace("{username}", self.username)
+    
     def get_client_folder_path(self, client_name: str) -> str:
         """
         Resolves a specific client folder path
@@ -54,18 +69,19 @@ class PathResolver:
         
         Args:
             client_name: Client display name
-            file_name: Name of the file (shortcut will append .lnk)
+            file_name: Name of the file (the link backend's suffix, e.g. .lnk, is appended)
             year: Year for subfolder organization
             
         Returns:
             Fully resolved path for the shortcut file
         """
         client_path = self.get_client_folder_path(client_name)
-        return os.path.join(client_path, "Consulting Fee", str(year), file_name + ".lnk")
+        return os.path.join(client_path, "Consulting Fee", str(year), file_name + self.link_writer.suffix)
     
     def create_windows_shortcut(self, target_path: str, shortcut_path: str) -> bool:
         """
-        Creates a Windows shortcut (.lnk file) pointing to the target
+        Creates a shortcut pointing to the target with the configured link
+        backend (a .lnk file by default)
         
         Args:
             target_path: Path to the original file
@@ -78,12 +94,7 @@ class PathResolver:
             # Ensure directory exists
             os.makedirs(os.path.dirname(shortcut_path), exist_ok=True)
             
-            # Initialize COM objects for shortcut creation
-            pythoncom.CoInitialize()
-            shell = win32com.client.Dispatch("WScript.Shell")
-            shortcut = shell.CreateShortCut(shortcut_path)
-            shortcut.Targetpath = target_path
-            shortcut.save()
+            self.link_writer.write(target_path, shortcut_path)
             
             logging.info(f"Created shortcut: {shortcut_path} -> {target_path}")
             return True
@@ -0,0 +1,193 @@
+# backend/utils/pattern_registry.py
+import re
+import time
+import logging
+import sqlite3
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from database.table_versions import get_table_version
+
+# Pattern types matched case-insensitively; all others are case-sensitive
+CASE_INSENSITIVE_TYPES = {"document_type"}
+
+
+class CompiledPattern:
+    """A document_patterns row with its compiled regex"""
+    def __init__(self, row: Dict):
+        self.pattern_id = row["pattern_id"]
+        self.pattern_type = row["pattern_type"]
+        self.pattern = row["pattern"]
+        self.description = row["description"]
+        self.priority = row["priority"]
+
+        flags = re.IGNORECASE if self.pattern_type in CASE_INSENSITIVE_TYPES else 0
+        self.regex = re.compile(self.pattern, flags)
+
+    def to_dict(self) -> Dict:
+        return {
+            "pattern_id": self.pattern_id,
+            "pattern_type": self.pattern_type,
+            "pattern": self.pattern,
+            "description": self.description,
+            "priority": self.priority
+        }
+
+
+class PatternSet:
+    """
+    One load of document_patterns: the rows, their compiled patterns and the
+    combined document_type regex. Built once and never modified, so the
+    registry can swap in a new set with a single assignment and a reader
+    never sees patterns from one load with the combined regex of another.
+    """
+    def __init__(self, rows: List[Dict], version: Optional[int]):
+        patterns = {}
+        for row in rows:
+            try:
+                compiled = CompiledPattern(row)
+            except re.error as e:
+                logging.error(f"Invalid document pattern {row['pattern_id']} ({row['pattern']}): {str(e)}")
+                continue
+            patterns.setdefault(compiled.pattern_type, []).append(compiled)
+
+        self.rows = rows
+        self.version = version
+        self.patterns = patterns
+        self.by_group = {f"p{p.pattern_id}": p for p in patterns.get("document_type", [])}
+        self.document_type_regex = self._combine(patterns.get("document_type", []))
+
+    @staticmethod
+    def _combine(patterns: List[CompiledPattern]):
+        if not patterns:
+            return None
+        alternation = "|".join(f"(?P<p{p.pattern_id}>{p.pattern})" for p in patterns)
+        try:
+            return re.compile(alternation, re.IGNORECASE)
+        except re.error:
+            # A pattern with its own named groups can clash; match one by one
+            return None
+
+
+class PatternRegistry:
+    """
+    Loads all active document_patterns once, compiled, and reloads them only
+    when the table changes (tracked by table_versions triggers).
+
+    The document_type patterns are also combined into a single alternation
+    with one named group per pattern, so classifying a filename is a single
+    regex search. Extraction patterns keep their priority order because the
+    first matching pattern wins, not the leftmost match.
+    """
+    def __init__(self, check_interval: float = 5.0):
+        self.check_interval = check_interval
+        self.match_counts = Counter()
+        self._set = PatternSet([], None)
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self._counts_lock = threading.Lock()
+
+    @property
+    def version(self) -> Optional[int]:
+        """document_patterns version of the loaded patterns (None before the first load)"""
+        return self._set.version
+
+    def refresh(self, conn: sqlite3.Connection, force: bool = False) -> bool:
+        """
+        Reload the patterns if document_patterns changed since the last load.
+        Checks at most once per ``check_interval`` seconds unless forced.
+
+        Returns:
+            True if the patterns were reloaded
+        """
+        now = time.monotonic()
+        if not force and self.version is not None and now - self._last_check < self.check_interval:
+            return False
+
+        with self._lock:
+            self._last_check = now
+            version = get_table_version(conn, "document_patterns")
+            # -1 means the table is not tracked yet, so always reload
+            if not force and version == self.version and version != -1:
+                return False
+            self._load(conn, version)
+            return True
+
+    def _load(self, conn: sqlite3.Connection, version: int):
+        rows = conn.execute(
+            """SELECT pattern_id, pattern_type, pattern, description, priority
+               FROM document_patterns
+               WHERE is_active = 1
+               ORDER BY priority DESC, pattern_id"""
+        ).fetchall()
+        self.load_rows([dict(row) for row in rows], version)
+        logging.info(f"Loaded {len(rows)} document patterns (version {version})")
+
+    def load_rows(self, rows: List[Dict], version: int):
+        """Compile pattern rows (highest priority first) into the registry"""
+        self._set = PatternSet(rows, version)
+
+    def snapshot(self) -> Tuple[List[Dict], Optional[int]]:
+        """Return the loaded rows and version, e.g. to rebuild the registry in a worker process"""
+        loaded = self._set
+        return loaded.rows, loaded.version
+
+    def _count(self, pattern_id: int):
+        with self._counts_lock:
+            self.match_counts[pattern_id] += 1
+
+    def get_patterns(self, pattern_type: str) -> List[CompiledPattern]:
+        """Return the active patterns of a type, highest priority first"""
+        return self._set.patterns.get(pattern_type, [])
+
+    def is_401k_document(self, text: str) -> bool:
+        """Check whether any document_type pattern matches"""
+        loaded = self._set
+        if loaded.document_type_regex is not None:
+            match = loaded.document_type_regex.search(text)
+            if match:
+                self._count(loaded.by_group[match.lastgroup].pattern_id)
+                return True
+            return False
+
+        return self._search(loaded, "document_type", text) is not None
+
+    def search(self, pattern_type: str, text: str) -> Optional[Tuple[CompiledPattern, "re.Match"]]:
+        """
+        Return the first pattern of a type (by priority) that matches, with
+        its match object, or None
+        """
+        return self._search(self._set, pattern_type, text)
+
+    def _search(self, loaded: PatternSet, pattern_type: str, text: str):
+        for compiled in loaded.patterns.get(pattern_type, []):
+            match = compiled.regex.search(text)
+            if match:
+                self._count(compiled.pattern_id)
+                return compiled, match
+        return None
+
+    def get_stats(self) -> List[Dict]:
+        """Return every loaded pattern with how often it matched since startup"""
+        with self._counts_lock:
+            counts = dict(self.match_counts)
+        stats = []
+        for patterns in self._set.patterns.values():
+            for compiled in patterns:
+                entry = compiled.to_dict()
+                entry["match_count"] = counts.get(compiled.pattern_id, 0)
+                stats.append(entry)
+        return stats
+
+
+# One registry per database so compiled patterns and match counts are
+# shared by every DocumentProcessor instance
+_registries: Dict[bool, PatternRegistry] = {}
+
+
+def get_pattern_registry(test_mode: bool = False) -> PatternRegistry:
+    """Return the shared pattern registry for the live or test database"""
+    if test_mode not in _registries:
+        _registries[test_mode] = PatternRegistry()
+    return _registries[test_mode]
@@ -0,0 +1,133 @@
+# backend/utils/payment_matcher.py
+#
+# Batched payment matching. Each (document, client) pair becomes a probe:
+# client_id, provider and a received_date window around the document date.
+# Probes are staged in a TEMP table and resolved with one join against
+# payments, and the resulting links are written with a single executemany.
+# The join is pinned to probe-first order on idx_payments_client_date: the
+# TEMP table has no statistics, and left alone the planner prefers the
+# low-selectivity idx_payments_valid_to.
+import logging
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_DAYS_TO_MATCH = 30
+
+
+def get_days_to_match(conn: sqlite3.Connection) -> int:
+    """Read days_to_match_payment from system_config"""
+    try:
+        config = conn.execute(
+            "SELECT config_value FROM system_config WHERE config_key = 'days_to_match_payment'"
+        ).fetchone()
+    except sqlite3.Error as e:
+        logging.error(f"Could not read days_to_match_payment: {str(e)}")
+        return DEFAULT_DAYS_TO_MATCH
+
+    if config and str(config[0]).isdigit():
+        return int(config[0])
+    return DEFAULT_DAYS_TO_MATCH
+
+
+class PaymentMatcher:
+    """
+    Collects payment probes for one or more documents and resolves them
+    together
+
+    Args:
+        conn: Database connection
+        days_to_match: Half-width of the received_date window; read from
+            system_config when not given
+        provider_names: provider_id -> provider_name, for contracts that
+            only carry the provider name
+    """
+    def __init__(self, conn: sqlite3.Connection, days_to_match: Optional[int] = None,
+                 provider_names: Optional[Dict[int, str]] = None):
+        self.conn = conn
+        self.days_to_match = days_to_match if days_to_match is not None else get_days_to_match(conn)
+        self.provider_names = provider_names or {}
+        self._probes: List[Tuple] = []
+
+    def __len__(self) -> int:
+        return len(self._probes)
+
+    def add(self, file_id: int, client_id: int, provider_id: Optional[int], document_date: str):
+        """Queue a probe for payments of a client around a document date"""
+        try:
+            doc_date = datetime.strptime(document_date, "%Y-%m-%d")
+        except (TypeError, ValueError):
+            logging.warning(f"Cannot match payments for file {file_id}: invalid document date {document_date!r}")
+            return
+        self._probes.append((
+            file_id,
+            client_id,
+            provider_id,
+            self.provider_names.get(provider_id) if provider_id else None,
+            (doc_date - timedelta(days=self.days_to_match)).strftime("%Y-%m-%d"),
+            (doc_date + timedelta(days=self.days_to_match)).strftime("%Y-%m-%d"),
+        ))
+
+    def truncate(self, count: int):
+        """Drop the probes queued after the first ``count`` (e.g. when a write was rolled back)"""
+        del self._probes[count:]
+
+    def resolve(self) -> List[Tuple[int, int]]:
+        """
+        Match every queued probe in one query
+
+        Returns:
+            (payment_id, file_id) pairs
+        """
+        if not self._probes:
+            return []
+
+        self.conn.execute(
+            """CREATE TEMP TABLE IF NOT EXISTS payment_probes (
+                   file_id INTEGER NOT NULL,
+                   client_id INTEGER NOT NULL,
+                   provider_id INTEGER,
+                   provider_name TEXT,
+                   date_min TEXT NOT NULL,
+                   date_max TEXT NOT NULL
+               )"""
+        )
+        self.conn.execute("DELETE FROM temp.payment_probes")
+        self.conn.executemany(
+            """INSERT INTO temp.payment_probes(file_id, client_id, provider_id, provider_name, date_min, date_max)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            self._probes
+        )
+        rows = self.conn.execute(
+            """SELECT DISTINCT p.payment_id, pr.file_id
+               FROM temp.payment_probes pr
+               CROSS JOIN payments p
+               WHERE p.client_id = pr.client_id
+                 AND p.received_date BETWEEN pr.date_min AND pr.date_max
+                 AND +p.valid_to IS NULL
+                 AND (pr.provider_id IS NULL
+                  OR EXISTS (
+                      SELECT 1 FROM contracts c
+                      WHERE c.contract_id = p.contract_id
+                        AND (c.provider_id = pr.provider_id OR c.provider_name = pr.provider_name)
+                  ))"""
+        ).fetchall()
+        self.conn.execute("DELETE FROM temp.payment_probes")
+        return [(row[0], row[1]) for row in rows]
+
+    def write(self, cursor: sqlite3.Cursor) -> int:
+        """
+        Resolve the queued probes and insert the payment_files links
+
+        Returns:
+            Number of probes resolved
+        """
+        count = len(self._probes)
+        links = self.resolve()
+        if links:
+            cursor.executemany(
+                "INSERT OR IGNORE INTO payment_files(payment_id, file_id, auto_linked) VALUES (?, ?, 1)",
+                links
+            )
+        self._probes = []
+        return count
@@ -0,0 +1,225 @@
+# backend/utils/pipeline.py
+#
+# Streaming pipeline for mail dump documents. Each stage is a generator
+# over work items (dicts); stages that only touch in-memory data run in
+# their own thread and hand items on through bounded queues, so a slow
+# stage makes the ones before it wait instead of piling up work. Stages
+# that use the database run on the calling thread, which owns the SQLite
+# connection. Every stage counts items, errors and retries and the time
+# spent on them, and retries transient failures (file locks held by
+# OneDrive or antivirus, a busy database) with backoff.
+import time
+import queue
+import logging
+import sqlite3
+import threading
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+# Marks the end of a queue's items
+_DONE = object()
+
+# How often blocked queue operations check whether the run was abandoned
+_POLL_SECONDS = 0.5
+
+
+def is_transient_error(e: Exception) -> bool:
+    """Failures worth retrying: locked or busy files and a locked database"""
+    if isinstance(e, sqlite3.OperationalError):
+        message = str(e).lower()
+        return "locked" in message or "busy" in message
+    return isinstance(e, (PermissionError, BlockingIOError, TimeoutError, InterruptedError))
+
+
+class StageMetrics:
+    """Counters and timing for one stage"""
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.errors = 0
+        self.retries = 0
+        self.busy_seconds = 0.0
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+
+    def record(self, seconds: float, items: int = 1):
+        now = time.perf_counter()
+        if self.started is None:
+            self.started = now - seconds
+        self.finished = now
+        self.items += items
+        self.busy_seconds += seconds
+
+    def to_dict(self) -> Dict:
+        wall = (self.finished - self.started) if self.started is not None else 0.0
+        return {
+            "stage": self.name,
+            "items": self.items,
+            "errors": self.errors,
+            "retries": self.retries,
+            "busy_ms": round(self.busy_seconds * 1000, 1),
+            "wall_ms": round(wall * 1000, 1),
+            "items_per_second": round(self.items / self.busy_seconds, 1) if self.busy_seconds else None
+        }
+
+
+class Stage:
+    """
+    One pipeline step
+
+    Args:
+        name: Stage name used in metrics and error messages
+        handler: Called with each item; updates the item in place. It may
+            set item["done"] to skip the remaining stages (e.g. a file
+            that is not a 401k document).
+        threaded: Run in a worker thread (only for stages that do not use
+            the database connection)
+        retries: Extra attempts for transient failures
+        retry_delay: Wait before the first retry; doubles on each attempt
+        transient: Decides which exceptions are retried
+    """
+    def __init__(self, name: str, handler: Callable[[Dict], None], threaded: bool = False,
+                 retries: int = 0, retry_delay: float = 0.5,
+                 transient: Callable[[Exception], bool] = is_transient_error):
+        self.name = name
+        self.handler = handler
+        self.threaded = threaded
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.transient = transient
+        self.metrics = StageMetrics(name)
+
+    def run(self, items: Iterable[Dict]) -> Iterator[Dict]:
+        """Apply the handler to each item that is still in flight"""
+        for item in items:
+            if item.get("done"):
+                yield item
+                continue
+
+            started = time.perf_counter()
+            attempt = 0
+            while True:
+                try:
+                    self.handler(item)
+                    break
+                except Exception as e:
+                    if attempt < self.retries and self.transient(e):
+                        attempt += 1
+                        self.metrics.retries += 1
+                        logging.warning(f"{self.name} failed for {item.get('file_path')}, retry {attempt}/{self.retries}: {str(e)}")
+                        time.sleep(self.retry_delay * 2 ** (attempt - 1))
+                        continue
+                    self.metrics.errors += 1
+                    item["error"] = f"{self.name}: {str(e)}"
+                    item["done"] = True
+                    break
+            self.metrics.record(time.perf_counter() - started)
+            yield item
+
+
+class Pipeline:
+    """
+    Runs items through a list of stages
+
+    Threaded stages must come before the stages that run on the calling
+    thread; each threaded stage reads from and writes to a queue holding
+    at most ``queue_size`` items.
+    """
+    def __init__(self, stages: List[Stage], queue_size: int = 64):
+        threaded = [stage.threaded for stage in stages]
+        if threaded != sorted(threaded, reverse=True):
+            raise ValueError("Threaded pipeline stages must come before caller-thread stages")
+        self.stages = stages
+        self.queue_size = max(1, int(queue_size))
+
+    @property
+    def metrics(self) -> List[Dict]:
+        return [stage.metrics.to_dict() for stage in self.stages]
+
+    def run(self, source: Iterable[Dict]) -> Iterator[Dict]:
+        """Stream items from the source through every stage"""
+        stop = threading.Event()
+        threads = []
+        items: Iterable[Dict] = source
+
+        for stage in self.stages:
+            if not stage.threaded:
+                items = stage.run(items)
+                continue
+            out = queue.Queue(maxsize=self.queue_size)
+            thread = threading.Thread(
+                target=self._feed, args=(stage.run(items), out, stop),
+                name=f"pipeline-{stage.name}", daemon=True
+            )
+            threads.append(thread)
+            items = self._drain(out, stop)
+
+        for thread in threads:
+            thread.start()
+        try:
+            yield from items
+        finally:
+            # Also reached when the consumer stops early: unblock the workers
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+    @staticmethod
+    def _put(out: "queue.Queue", item, stop: threading.Event) -> bool:
+        """Put an item on a queue, waiting while it is full; False if the run was abandoned"""
+        while not stop.is_set():
+            try:
+                out.put(item, timeout=_POLL_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    @classmethod
+    def _feed(cls, items: Iterator[Dict], out: "queue.Queue", stop: threading.Event):
+        """Worker thread: run a stage and put its output on the next queue"""
+        try:
+            for item in items:
+                if not cls._put(out, item, stop):
+                    return
+        except Exception as e:
+            # Stages handle item errors themselves; this is a broken source
+            logging.error(f"Pipeline stage failed: {str(e)}")
+            cls._put(out, e, stop)
+            return
+        cls._put(out, _DONE, stop)
+
+    @staticmethod
+    def _drain(source: "queue.Queue", stop: threading.Event) -> Iterator[Dict]:
+        """Read a stage's output queue until it is finished"""
+        while not stop.is_set():
+            try:
+                item = source.get(timeout=_POLL_SECONDS)
+            except queue.Empty:
+                continue
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+
+# Metrics of the most recent pipeline run, for the admin API
+_last_run: Dict = {}
+_last_run_lock = threading.Lock()
+
+
+def record_run(metrics: List[Dict], folder: Optional[str] = None):
+    """Remember the stage metrics of a finished run"""
+    with _last_run_lock:
+        _last_run.clear()
+        _last_run.update({
+            "finished_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "folder": folder,
+            "stages": metrics
+        })
+
+
+def get_last_run() -> Dict:
+    """Return the stage metrics of the most recent run (empty before the first)"""
+    with _last_run_lock:
+        return dict(_last_run)
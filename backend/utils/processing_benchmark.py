@@ -0,0 +1,109 @@
+# backend/utils/processing_benchmark.py
+#
+# Benchmark for the parallel document pipeline: generates a synthetic mail
+# dump of realistic filenames from the clients and providers in the
+# database, then times the parse and match stage serially and with process
+# pools of increasing size. Nothing is written to the database.
+#
+#   python -m utils.processing_benchmark [--test] [--files 50000] [--workers 1,2,4,8]
+import os
+import sys
+import time
+import random
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+from database import get_db_connection
+from utils.document_parser import DocumentParser
+from utils.name_index import NameResolver, DEFAULT_MATCH_THRESHOLD
+from utils.pattern_registry import PatternRegistry
+from utils.parallel_processing import _init_worker, _parse_chunk
+
+FEE_PHRASES = ["401k Advisor Fee", "401K Advisor Fees", "401k Advisor Fee -"]
+NOISE_NAMES = ["Scan", "Invoice", "Statement", "Meeting notes", "IMG"]
+
+
+def make_synthetic_dump(names: NameResolver, count: int, seed: int = 42) -> List[str]:
+    """
+    Build synthetic mail dump paths: mostly advisor-fee statements naming
+    one to three clients (display names, variants and typos), the rest
+    unrelated scans
+    """
+    rng = random.Random(seed)
+    clients = list(names.clients.names.values()) or ["Sample Client"]
+    providers = list(names.providers.names.values()) or ["Sample Provider"]
+
+    def client_name():
+        name = rng.choice(clients)
+        if rng.random() < 0.1 and len(name) > 4:
+            # Drop a letter to exercise fuzzy matching
+            i = rng.randrange(1, len(name) - 1)
+            name = name[:i] + name[i + 1:]
+        return name
+
+    paths = []
+    for i in range(count):
+        if rng.random() < 0.2:
+            name = f"{rng.choice(NOISE_NAMES)} {i}.pdf"
+        else:
+            listed = " and ".join(client_name() for _ in range(rng.randint(1, 3)))
+            if rng.random() < 0.5:
+                date = f"Q{rng.randint(1, 4)}-{rng.randint(20, 25)}"
+            else:
+                date = f"{rng.randint(1, 12)}.{rng.randint(1, 28)}.{rng.randint(20, 25)}"
+            name = f"{rng.choice(providers)} - {rng.choice(FEE_PHRASES)} {listed} {date} {i}.pdf"
+        paths.append(os.path.join("synthetic", name))
+    return paths
+
+
+def run_benchmark(test_mode: bool, count: int, worker_counts: List[int], chunk_size: int):
+    conn = get_db_connection(test_mode=test_mode)
+    try:
+        registry = PatternRegistry()
+        registry.refresh(conn, force=True)
+        names = NameResolver()
+        names.refresh(conn, force=True)
+    finally:
+        conn.close()
+
+    paths = make_synthetic_dump(names, count)
+    chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+    print(f"{count} synthetic files, {len(chunks)} chunks of {chunk_size}, {os.cpu_count()} CPU cores")
+
+    parser = DocumentParser(registry, names)
+    started = time.perf_counter()
+    results = [parser.parse(path, DEFAULT_MATCH_THRESHOLD) for path in paths]
+    serial = time.perf_counter() - started
+    matched = sum(1 for r in results for c in r.get("clients", []) if c["client_id"])
+    print(f"{'serial':>10}: {serial:7.2f} s  {count / serial:9.0f} files/s  ({matched} client links)")
+
+    for workers in worker_counts:
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(registry.snapshot(), names.snapshot())) as pool:
+            parsed = sum(len(batch) for batch in pool.map(_parse_chunk, chunks, [DEFAULT_MATCH_THRESHOLD] * len(chunks)))
+        elapsed = time.perf_counter() - started
+        print(f"{workers:>2} workers: {elapsed:7.2f} s  {parsed / elapsed:9.0f} files/s  speedup {serial / elapsed:4.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parallel document parsing on a synthetic mail dump")
+    parser.add_argument("--test", action="store_true", help="Use the test database for clients and patterns")
+    parser.add_argument("--files", type=int, default=50000, help="Number of synthetic files")
+    parser.add_argument("--workers", default=None, help="Comma-separated worker counts (default 1,2,4,... up to the core count)")
+    parser.add_argument("--chunk-size", type=int, default=250, help="Files per worker task")
+    args = parser.parse_args()
+
+    if args.workers:
+        worker_counts = [int(w) for w in args.workers.split(",")]
+    else:
+        cores = os.cpu_count() or 1
+        worker_counts = sorted({min(2 ** i, cores) for i in range(cores.bit_length() + 1)})
+
+    run_benchmark(args.test, args.files, worker_counts, args.chunk_size)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+# backend/utils/processing_log.py
+#
+# Buffered writer for processing_log. A scan logs one row per file
+# (processed, skipped or error); committing each row on its own made log
+# lines most of a scan's fsyncs. Rows are collected in memory and written
+# with one executemany per flush: when the buffer holds log_batch_size rows,
+# when the oldest row is log_flush_seconds old (checked on the next add),
+# at the end of every scan and when the owning processor closes. Buffers
+# that are still alive at interpreter exit are flushed by an atexit hook.
+#
+# A flush never commits somebody else's work: while a transaction is open
+# on the buffer's connection the rows wait for the next flush. SQLite
+# connections belong to the thread that opened them, so a flush from any
+# other thread (the shutdown hook) writes through a connection of its own.
+import time
+import atexit
+import logging
+import sqlite3
+import threading
+import weakref
+from typing import Callable, List, Optional, Tuple
+
+# Rows are kept for the next flush when a write fails; past this many
+# multiples of the batch size the oldest are dropped so memory stays bounded
+MAX_PENDING_BATCHES = 20
+
+_buffers: "weakref.WeakSet[ProcessingLogBuffer]" = weakref.WeakSet()
+
+
+class ProcessingLogBuffer:
+    """
+    Collects processing_log rows and writes them in bulk
+
+    Args:
+        conn: Connection the rows are written with on the thread that
+            creates the buffer (the thread that owns conn)
+        batch_size: Flush once this many rows are buffered
+        flush_seconds: Flush once the oldest buffered row is this old
+        connect: Opens a connection to the same database, for flushes from
+            other threads; without it those flushes write nothing
+    """
+    def __init__(self, conn: sqlite3.Connection, batch_size: int = 500, flush_seconds: float = 5.0,
+                 connect: Optional[Callable[[], sqlite3.Connection]] = None):
+        self.conn = conn
+        self.connect = connect
+        self.batch_size = max(1, int(batch_size))
+        self.flush_seconds = float(flush_seconds)
+        self._rows: List[Tuple] = []
+        self._oldest: Optional[float] = None
+        self._owner = threading.get_ident()
+        self._lock = threading.Lock()
+        _buffers.add(self)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def add(self, file_name: str, status: str, details: Optional[str] = None, file_id: Optional[int] = None):
+        """Buffer a log row, flushing if the size or age threshold is reached"""
+        with self._lock:
+            if not self._rows:
+                self._oldest = time.monotonic()
+            self._rows.append((file_name, status, details, file_id))
+            due = len(self._rows) >= self.batch_size or time.monotonic() - self._oldest >= self.flush_seconds
+        if due:
+            self.flush()
+
+    def flush(self) -> int:
+        """
+        Write the buffered rows in one transaction. Deferred (0 rows) while
+        a transaction is open on the buffer's connection.
+
+        Returns:
+            Number of rows written
+        """
+        on_owner = threading.get_ident() == self._owner
+        if on_owner and self.conn.in_transaction:
+            return 0
+        if not on_owner and self.connect is None:
+            if self._rows:
+                logging.warning(f"Cannot flush {len(self._rows)} processing log rows from another thread")
+            return 0
+
+        with self._lock:
+            rows, self._rows = self._rows, []
+            self._oldest = None
+        if not rows:
+            return 0
+
+        try:
+            if on_owner:
+                self._write(self.conn, rows)
+            else:
+                conn = self.connect()
+                try:
+                    self._write(conn, rows)
+                finally:
+                    conn.close()
+            return len(rows)
+        except Exception as e:
+            logging.error(f"Failed to write {len(rows)} processing log rows: {str(e)}")
+            with self._lock:
+                self._rows = rows + self._rows
+                overflow = len(self._rows) - self.batch_size * MAX_PENDING_BATCHES
+                if overflow > 0:
+                    logging.error(f"Dropping {overflow} processing log rows")
+                    del self._rows[:overflow]
+                self._oldest = time.monotonic()
+            return 0
+
+    @staticmethod
+    def _write(conn: sqlite3.Connection, rows: List[Tuple]):
+        with conn:
+            conn.executemany(
+                "INSERT INTO processing_log(file_name, status, details, file_id) VALUES (?, ?, ?, ?)",
+                rows
+            )
+
+    def close(self):
+        """Flush and stop tracking the buffer"""
+        self.flush()
+        _buffers.discard(self)
+
+
+def flush_processing_logs() -> int:
+    """
+    Flush every live buffer (used at shutdown); buffers owned by other
+    threads are written through their own connection. Returns rows written.
+    """
+    written = 0
+    for buffer in list(_buffers):
+        try:
+            written += buffer.flush()
+        except Exception as e:
+            logging.error(f"Failed to flush processing log: {str(e)}")
+    return written
+
+
+atexit.register(flush_processing_logs)
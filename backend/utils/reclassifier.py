@@ -0,0 +1,419 @@
+# backend/utils/reclassifier.py
+#
+# Reclassification after document_patterns changes. Every processed
+# document records the pattern version it was classified with (in
+# client_files.metadata). A run re-parses only documents classified with
+# an older version, compares the outcome (401k or not, provider, date,
+# client names and matched clients) with what is stored, and writes only
+# the documents whose outcome changed: their client_files row, review
+# queue entries, the payment links the matcher made (as a diff, in bulk
+# per batch; links made by hand are kept) and their client shortcuts. Documents whose outcome is unchanged just get the new
+# version stamped. Files that were skipped as non-401k and are recognized
+# now go through the normal pipeline.
+#
+# Runs are checkpointed in reclassify_runs after every batch, so an
+# interrupted run resumes where it stopped.
+#
+#   python -m utils.reclassifier [--test] [--dry-run]
+import os
+import sys
+import json
+import logging
+import argparse
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+from database import get_db_connection
+from utils.document_processor import DocumentProcessor
+from utils.document_parser import DocumentParser
+from utils.link_writer import LinkBatch
+from utils.text_extraction import get_cached_file_text
+
+DEFAULT_BATCH_SIZE = 500
+
+# SQLite's default limit on bound parameters is 999
+_IN_CHUNK = 900
+
+
+class Reclassifier:
+    """
+    Re-examines documents classified with an older pattern version
+
+    Args:
+        processor: DocumentProcessor whose connection receives the writes
+        batch_size: Documents examined per transaction (and per checkpoint)
+    """
+    def __init__(self, processor: DocumentProcessor, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.processor = processor
+        self.conn = processor.conn
+        self.batch_size = batch_size
+
+    def run(self, dry_run: bool = False) -> Dict:
+        """
+        Reclassify every stale document, resuming an interrupted run for
+        the current pattern version
+
+        Args:
+            dry_run: Only count what would change
+
+        Returns:
+            Counts: examined, changed, unlinked (no longer 401k), added
+            (skipped files now recognized), errors
+        """
+        self.processor.pattern_registry.refresh(self.conn, force=True)
+        self.processor.name_resolver.refresh(self.conn, force=True)
+        version = self.processor.pattern_registry.version
+        self.processor.days_to_match = None
+        parser = self.processor.parser
+        threshold = self.processor.get_match_threshold()
+
+        run = None if dry_run else self._start_run(version)
+        counts = {key: run[key] if run else 0 for key in ("examined", "changed", "unlinked", "added")}
+        counts["errors"] = 0
+        last_file_id = run["last_file_id"] if run else 0
+
+        try:
+            while True:
+                rows = self._stale_documents(version, last_file_id)
+                if not rows:
+                    break
+                plans = [self._plan(row, parser, threshold, version) for row in rows]
+                last_file_id = rows[-1]["file_id"]
+
+                counts["examined"] += len(plans)
+                counts["changed"] += sum(1 for plan in plans if plan["changed"])
+                counts["unlinked"] += sum(1 for plan in plans if plan["changed"] and not plan["is_401k"])
+                counts["errors"] += sum(1 for plan in plans if plan["error"])
+
+                if not dry_run:
+                    self._apply(run["run_id"], plans, last_file_id, counts)
+
+            recognized = self._newly_recognized(parser)
+            counts["added"] += len(recognized)
+            if recognized and not dry_run:
+                self.processor.run_pipeline(recognized)
+                self.processor.processing_log.flush()
+        except Exception as e:
+            if run:
+                self._finish_run(run["run_id"], "failed", counts, str(e))
+            raise
+
+        if run:
+            self._finish_run(run["run_id"], "completed", counts)
+        logging.info(f"Reclassified documents for pattern version {version}{' (dry run)' if dry_run else ''}: {counts}")
+        return counts
+
+    def _start_run(self, version: int) -> Dict:
+        """Resume the unfinished run for this pattern version, or start one"""
+        with self.conn:
+            self.conn.execute(
+                "UPDATE reclassify_runs SET status = 'superseded', finished_at = CURRENT_TIMESTAMP "
+                "WHERE status = 'running' AND pattern_version <> ?",
+                (version,)
+            )
+            run = self.conn.execute(
+                "SELECT * FROM reclassify_runs WHERE status = 'running' AND pattern_version = ? "
+                "ORDER BY run_id DESC LIMIT 1",
+                (version,)
+            ).fetchone()
+            if run:
+                logging.info(f"Resuming reclassify run {run['run_id']} after file {run['last_file_id']}")
+                return dict(run)
+            cursor = self.conn.execute("INSERT INTO reclassify_runs(pattern_version) VALUES (?)", (version,))
+            return dict(self.conn.execute(
+                "SELECT * FROM reclassify_runs WHERE run_id = ?", (cursor.lastrowid,)
+            ).fetchone())
+
+    def _finish_run(self, run_id: int, status: str, counts: Dict, error: Optional[str] = None):
+        with self.conn:
+            self.conn.execute(
+                """UPDATE reclassify_runs
+                   SET status = ?, examined = ?, changed = ?, unlinked = ?, added = ?,
+                       error = ?, finished_at = CURRENT_TIMESTAMP
+                   WHERE run_id = ?""",
+                (status, counts["examined"], counts["changed"], counts["unlinked"], counts["added"], error, run_id)
+            )
+
+    def _stale_documents(self, version: int, after_file_id: int) -> List:
+        """Next batch of processor-created documents classified with another pattern version"""
+        return self.conn.execute(
+            """SELECT file_id, file_path, original_filename, provider_id, document_date, metadata
+               FROM client_files
+               WHERE file_id > ?
+                 AND json_extract(metadata, '$.extracted_clients') IS NOT NULL
+                 AND COALESCE(json_extract(metadata, '$.pattern_version'), -1) <> ?
+               ORDER BY file_id
+               LIMIT ?""",
+            (after_file_id, version, self.batch_size)
+        ).fetchall()
+
+    def _plan(self, row, parser: DocumentParser, threshold: float, version: int) -> Dict:
+        """Re-parse one document and work out whether its outcome changed"""
+        metadata = json.loads(row["metadata"] or "{}")
+        filename = row["original_filename"] or os.path.basename(row["file_path"])
+        plan = {"file_id": row["file_id"], "filename": filename, "error": None, "changed": False,
+                "is_401k": False, "metadata": metadata}
+
+        old_ids = metadata.get("client_ids")
+        if old_ids is None:
+            # Documents processed before client_ids was recorded: match the
+            # stored names against the current index
+            old_ids = [
+                client_id for client_id in (
+                    parser.names.match_client(name, threshold) for name in metadata.get("extracted_clients") or []
+                ) if client_id
+            ]
+        plan["old_ids"] = set(old_ids)
+
+        # Documents recognised by their text are re-parsed with it
+        text = get_cached_file_text(self.conn, row["file_path"]) if metadata.get("classified_by") == "content" else None
+        parsed = parser.parse(row["file_path"], threshold, text)
+        if parsed["error"]:
+            plan["error"] = parsed["error"]
+            logging.error(f"Error reclassifying {filename}: {parsed['error']}")
+            return plan
+
+        if parsed["is_401k"]:
+            # Without a date in the name the parser falls back to today, which
+            # is not a change
+            if not parser.patterns.search("date_pattern", filename):
+                parsed["document_date"] = row["document_date"]
+            new_ids = {client["client_id"] for client in parsed["clients"] if client["client_id"]}
+            new_outcome = (True, parsed["provider_id"], parsed["document_date"], parsed["client_names"], new_ids)
+        else:
+            parsed.update({"provider_id": row["provider_id"], "document_date": row["document_date"],
+                           "provider_name": None, "client_names": [], "clients": []})
+            new_ids = set()
+            new_outcome = (False, row["provider_id"], row["document_date"], [], new_ids)
+
+        old_outcome = (
+            metadata.get("is_401k", True), row["provider_id"], row["document_date"],
+            metadata.get("extracted_clients") or [], plan["old_ids"]
+        )
+        plan.update({
+            "changed": new_outcome != old_outcome,
+            "is_401k": parsed["is_401k"],
+            "parsed": parsed,
+            "new_ids": new_ids,
+            "metadata": dict(metadata, **{
+                "is_401k": parsed["is_401k"],
+                "extracted_provider": parsed["provider_name"],
+                "extracted_clients": parsed["client_names"],
+                "client_ids": sorted(new_ids),
+                "pattern_version": version,
+            }),
+        })
+        return plan
+
+    def _apply(self, run_id: int, plans: List[Dict], last_file_id: int, counts: Dict):
+        """Write one batch's changes and checkpoint the run in the same transaction"""
+        processor = self.processor
+        matcher = processor.payment_matcher()
+        shortcuts = LinkBatch(processor.path_resolver.link_writer)
+        stale_links: List[str] = []
+        log_rows = []
+        changed = [plan for plan in plans if plan["changed"]]
+
+        with self.conn:
+            cursor = self.conn.cursor()
+
+            # Unchanged outcome: only stamp the new version
+            cursor.executemany(
+                "UPDATE client_files SET metadata = ? WHERE file_id = ?",
+                [(json.dumps(plan["metadata"]), plan["file_id"])
+                 for plan in plans if not plan["changed"] and not plan["error"]]
+            )
+
+            for plan in changed:
+                parsed, file_id = plan["parsed"], plan["file_id"]
+                cursor.execute(
+                    "UPDATE client_files SET provider_id = ?, document_date = ?, metadata = ? WHERE file_id = ?",
+                    (parsed["provider_id"], parsed["document_date"], json.dumps(plan["metadata"]), file_id)
+                )
+
+                # Names someone already linked or rejected are not asked again
+                settled = cursor.execute(
+                    "SELECT extracted_name, status, resolved_client_id FROM client_match_reviews "
+                    "WHERE file_id = ? AND status <> 'pending'",
+                    (file_id,)
+                ).fetchall()
+                settled_names = {review["extracted_name"] for review in settled}
+                cursor.execute(
+                    "DELETE FROM client_match_reviews WHERE file_id = ? AND status = 'pending'",
+                    (file_id,)
+                )
+
+                desired = set(plan["new_ids"])
+                if plan["is_401k"]:
+                    desired.update(review["resolved_client_id"] for review in settled
+                                   if review["status"] == "linked" and review["resolved_client_id"])
+                    for client in parsed["clients"]:
+                        if not client["client_id"] and client["candidates"] and client["name"] not in settled_names:
+                            processor.queue_match_review(cursor, file_id, client["name"], client["candidates"])
+                processor.record_mentions(cursor, file_id, parsed["clients"], {
+                    review["extracted_name"]: (review["status"], review["resolved_client_id"]) for review in settled
+                })
+                for client_id in desired:
+                    processor.link_client(cursor, file_id, client_id, parsed["provider_id"],
+                                          parsed["document_date"], matcher, shortcuts)
+                stale_links.extend(self._shortcut_paths(plan["filename"], plan["old_ids"] - desired))
+
+                if plan["is_401k"]:
+                    details = f"Clients {sorted(plan['old_ids'])} -> {sorted(desired)}"
+                else:
+                    details = "No longer recognized as a 401k document; links removed"
+                log_rows.append((plan["filename"], "reclassified", details, file_id))
+
+            self._write_link_diff(cursor, [plan["file_id"] for plan in changed], set(matcher.resolve()))
+            cursor.executemany(
+                "INSERT INTO processing_log(file_name, status, details, file_id) VALUES (?, ?, ?, ?)",
+                log_rows
+            )
+
+            cursor.execute(
+                """UPDATE reclassify_runs
+                   SET last_file_id = ?, examined = ?, changed = ?, unlinked = ?
+                   WHERE run_id = ?""",
+                (last_file_id, counts["examined"], counts["changed"], counts["unlinked"], run_id)
+            )
+
+        shortcuts.flush()
+        for link_path in stale_links:
+            try:
+                if os.path.lexists(link_path):
+                    os.remove(link_path)
+            except OSError as e:
+                logging.error(f"Failed to remove shortcut {link_path}: {str(e)}")
+
+    def _write_link_diff(self, cursor, file_ids: List[int], desired: Set[Tuple[int, int]]):
+        """
+        Make the matcher's payment_files links for these documents equal to
+        the desired (payment_id, file_id) pairs; links made by hand stay
+        """
+        current: Set[Tuple[int, int]] = set()
+        for i in range(0, len(file_ids), _IN_CHUNK):
+            chunk = file_ids[i:i + _IN_CHUNK]
+            current.update(
+                (row[0], row[1]) for row in cursor.execute(
+                    f"SELECT payment_id, file_id FROM payment_files WHERE file_id IN ({', '.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall()
+            )
+        cursor.executemany(
+            "DELETE FROM payment_files WHERE payment_id = ? AND file_id = ? AND auto_linked = 1",
+            sorted(current - desired)
+        )
+        cursor.executemany(
+            "INSERT OR IGNORE INTO payment_files(payment_id, file_id, auto_linked) VALUES (?, ?, 1)",
+            sorted(desired - current)
+        )
+
+    def _shortcut_paths(self, filename: str, client_ids: Set[int]) -> List[str]:
+        """Shortcut paths a document has in these clients' folders"""
+        resolver = self.processor.path_resolver
+        year = resolver.extract_year_from_filename(filename)
+        paths = []
+        for client_id in client_ids:
+            display_name = self.processor.name_resolver.get_client_name(client_id)
+            if display_name:
+                paths.append(resolver.get_shortcut_path(display_name, filename, year))
+        return paths
+
+    def _newly_recognized(self, parser: DocumentParser) -> List[str]:
+        """Scanned files that were skipped as non-401k but match the current patterns"""
+        try:
+            rows = self.conn.execute(
+                """SELECT m.file_path FROM scan_manifest m
+                   WHERE NOT EXISTS (SELECT 1 FROM client_files cf WHERE cf.file_path = m.file_path)"""
+            ).fetchall()
+        except Exception as e:
+            logging.error(f"Could not read the scan manifest: {str(e)}")
+            return []
+        return [
+            row[0] for row in rows
+            if parser.is_401k_document(os.path.basename(row[0])) and os.path.exists(row[0])
+        ]
+
+
+def get_reclassify_status(conn) -> Optional[Dict]:
+    """Return the most recent reclassify run"""
+    row = conn.execute("SELECT * FROM reclassify_runs ORDER BY run_id DESC LIMIT 1").fetchone()
+    return dict(row) if row else None
+
+
+# One background run at a time
+_thread: Optional[threading.Thread] = None
+_thread_lock = threading.Lock()
+
+
+def start_reclassify(test_mode: bool = False) -> bool:
+    """
+    Run (or resume) reclassification in a background thread
+
+    Returns:
+        False if a run is already in progress
+    """
+    global _thread
+    with _thread_lock:
+        if _thread is not None and _thread.is_alive():
+            return False
+        _thread = threading.Thread(target=_run_in_background, args=(test_mode,), name="reclassify", daemon=True)
+        _thread.start()
+        return True
+
+
+def resume_interrupted_reclassify(test_mode: bool = False) -> bool:
+    """Restart a run that was still in progress when the app stopped"""
+    conn = get_db_connection(test_mode=test_mode)
+    try:
+        run = get_reclassify_status(conn)
+    except Exception as e:
+        logging.error(f"Could not check for an interrupted reclassify run: {str(e)}")
+        return False
+    finally:
+        conn.close()
+    if run and run["status"] == "running":
+        logging.info(f"Resuming interrupted reclassify run {run['run_id']}")
+        return start_reclassify(test_mode)
+    return False
+
+
+def reclassify_dry_run(test_mode: bool = False) -> Dict:
+    """Count what a run would change, on a processor owned by the calling thread"""
+    processor = DocumentProcessor(test_mode=test_mode)
+    try:
+        return Reclassifier(processor).run(dry_run=True)
+    finally:
+        processor.close()
+
+
+def _run_in_background(test_mode: bool):
+    # The processor (and its connection) belongs to this thread
+    processor = DocumentProcessor(test_mode=test_mode)
+    try:
+        Reclassifier(processor).run()
+    except Exception as e:
+        logging.error(f"Reclassification failed: {str(e)}")
+    finally:
+        processor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reclassify documents processed with older document patterns")
+    parser.add_argument("--test", action="store_true", help="Use the test database")
+    parser.add_argument("--dry-run", action="store_true", help="Only report how many documents would change")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Documents per transaction")
+    args = parser.parse_args()
+
+    processor = DocumentProcessor(test_mode=args.test)
+    try:
+        counts = Reclassifier(processor, args.batch_size).run(dry_run=args.dry_run)
+    finally:
+        processor.close()
+    for key, value in counts.items():
+        print(f"{key:>10}: {value}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
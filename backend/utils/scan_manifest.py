@@ -0,0 +1,120 @@
+# backend/utils/scan_manifest.py
+#
+# Remembers the size and mtime of every file seen in a mail dump folder so
+# a scan only looks at files that are new or changed. The folder listing
+# goes into a TEMP table and one query returns the entries that differ from
+# the manifest and are not in client_files yet.
+import os
+import logging
+import sqlite3
+from typing import Dict, Iterable, List, Tuple
+
+# path -> (size, mtime_ns)
+Listing = Dict[str, Tuple[int, int]]
+
+
+def list_folder(folder: str, extensions: Tuple[str, ...] = (".pdf",)) -> Listing:
+    """
+    List the files in a folder with their size and mtime
+
+    os.scandir returns the stat data with the directory entries on Windows,
+    so this is one directory read rather than a stat per file.
+    """
+    listing = {}
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if not entry.name.lower().endswith(extensions):
+                continue
+            try:
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+            except OSError as e:
+                # OneDrive placeholders can vanish mid-scan
+                logging.warning(f"Could not stat {entry.path}: {str(e)}")
+                continue
+            listing[entry.path] = (stat.st_size, stat.st_mtime_ns)
+    return listing
+
+
+def _load_listing(conn: sqlite3.Connection, listing: Listing):
+    conn.execute(
+        """CREATE TEMP TABLE IF NOT EXISTS scan_listing (
+               file_path TEXT PRIMARY KEY,
+               size INTEGER NOT NULL,
+               mtime_ns INTEGER NOT NULL
+           )"""
+    )
+    conn.execute("DELETE FROM temp.scan_listing")
+    conn.executemany(
+        "INSERT INTO temp.scan_listing(file_path, size, mtime_ns) VALUES (?, ?, ?)",
+        ((path, size, mtime_ns) for path, (size, mtime_ns) in listing.items())
+    )
+
+
+def find_changed_files(conn: sqlite3.Connection, listing: Listing) -> Tuple[List[str], List[str]]:
+    """
+    Compare a folder listing with the manifest and client_files
+
+    Returns:
+        (new_files, changed_files): new_files are new or changed entries
+        without a client_files row (these need processing); changed_files
+        are all entries that differ from the manifest
+    """
+    with conn:
+        _load_listing(conn, listing)
+    rows = conn.execute(
+        """SELECT l.file_path,
+                  EXISTS (SELECT 1 FROM client_files f WHERE f.file_path = l.file_path) AS is_known
+           FROM temp.scan_listing l
+           LEFT JOIN scan_manifest m ON m.file_path = l.file_path
+           WHERE m.file_path IS NULL OR m.size != l.size OR m.mtime_ns != l.mtime_ns
+           ORDER BY l.file_path"""
+    ).fetchall()
+
+    changed = [row[0] for row in rows]
+    new = [row[0] for row in rows if not row[1]]
+    return new, changed
+
+
+def stat_files(paths: Iterable[str]) -> Listing:
+    """Build a listing for specific files, skipping any that no longer exist"""
+    listing = {}
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        listing[path] = (stat.st_size, stat.st_mtime_ns)
+    return listing
+
+
+def update_manifest(conn: sqlite3.Connection, folder: str, listing: Listing, paths: Iterable[str],
+                    prune: bool = True):
+    """
+    Record the given entries as scanned
+
+    Args:
+        conn: Database connection
+        folder: Folder the listing came from
+        listing: Listing passed to find_changed_files
+        paths: Entries to record (normally the changed ones that processed)
+        prune: Drop manifest rows for files missing from the listing; only
+            correct when the listing is the whole folder
+    """
+    with conn:
+        conn.executemany(
+            """INSERT INTO scan_manifest(file_path, folder, size, mtime_ns, scanned_at)
+               VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+               ON CONFLICT(file_path) DO UPDATE SET
+                   size = excluded.size,
+                   mtime_ns = excluded.mtime_ns,
+                   scanned_at = excluded.scanned_at""",
+            ((path, folder, *listing[path]) for path in paths)
+        )
+        if prune:
+            conn.execute(
+                """DELETE FROM scan_manifest
+                   WHERE folder = ? AND file_path NOT IN (SELECT file_path FROM temp.scan_listing)""",
+                (folder,)
+            )
@@ -0,0 +1,256 @@
+# backend/utils/text_extraction.py
+#
+# Optional content stage for the document pipeline. Filenames decide most
+# documents; one whose name matches no document_type pattern can still be
+# recognised from its text. Text is extracted by a pluggable backend
+# (content.extractor: pdftotext from poppler, or the pypdf package) and
+# cached in document_text by content hash, so a document is extracted at
+# most once however often it is scanned, renamed or copied. Failures and
+# timeouts are cached too; only another backend tries them again.
+#
+# Every extraction runs in a child process driven from a small thread
+# pool, so a file that hangs or crashes the extractor is killed at
+# content.timeout_seconds instead of stalling the pipeline, and CPU-bound
+# parsing does not hold the GIL of the API process. Documents are usually
+# extracted once ever, so the cost of starting a process per file is paid
+# once too.
+#
+#   python -m utils.text_extraction FILE [--max-pages N]   (pypdf backend)
+import os
+import sys
+import time
+import shutil
+import logging
+import argparse
+import sqlite3
+import threading
+import subprocess
+import importlib.util
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from config import settings
+from database import get_db_connection
+from utils.blob_store import hash_file
+
+# Working directory for `python -m utils.text_extraction`
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TextExtractor:
+    """Base class: a command that prints a PDF's text to stdout"""
+    name = ""
+
+    @classmethod
+    def available(cls) -> bool:
+        raise NotImplementedError
+
+    def command(self, file_path: str, max_pages: int) -> List[str]:
+        raise NotImplementedError
+
+    def extract(self, file_path: str, max_pages: int, timeout: float) -> str:
+        """
+        Text of the first max_pages pages
+
+        Raises:
+            subprocess.TimeoutExpired: The extractor ran longer than timeout
+                (it has been killed)
+            RuntimeError: The extractor failed
+        """
+        completed = subprocess.run(
+            self.command(file_path, max_pages), cwd=_BACKEND_DIR, capture_output=True, timeout=timeout
+        )
+        if completed.returncode != 0:
+            message = completed.stderr.decode("utf-8", "replace").strip().splitlines()
+            raise RuntimeError(message[-1] if message else f"{self.name} exited with {completed.returncode}")
+        return completed.stdout.decode("utf-8", "replace")
+
+
+class PdftotextExtractor(TextExtractor):
+    """poppler's pdftotext (fast; needs poppler on the PATH)"""
+    name = "pdftotext"
+
+    @classmethod
+    def available(cls) -> bool:
+        return shutil.which("pdftotext") is not None
+
+    def command(self, file_path: str, max_pages: int) -> List[str]:
+        return ["pdftotext", "-q", "-enc", "UTF-8", "-l", str(max_pages), file_path, "-"]
+
+
+class PypdfExtractor(TextExtractor):
+    """The pypdf package (pure Python; slower, no system dependency)"""
+    name = "pypdf"
+
+    @classmethod
+    def available(cls) -> bool:
+        return importlib.util.find_spec("pypdf") is not None
+
+    def command(self, file_path: str, max_pages: int) -> List[str]:
+        return [sys.executable, "-m", "utils.text_extraction", file_path, "--max-pages", str(max_pages)]
+
+
+EXTRACTOR_BACKENDS = {extractor.name: extractor for extractor in (PdftotextExtractor, PypdfExtractor)}
+
+
+def get_text_extractor(name: Optional[str] = None) -> Optional[TextExtractor]:
+    """
+    Return the extractor for a backend name (defaults to content.extractor);
+    "auto" picks the first one available. None if it is not available.
+    """
+    name = name or settings.get_content_config()["extractor"]
+    if name == "auto":
+        for extractor in EXTRACTOR_BACKENDS.values():
+            if extractor.available():
+                return extractor()
+        return None
+    if name not in EXTRACTOR_BACKENDS:
+        raise ValueError(f"Unknown text extractor '{name}' (expected auto or one of {', '.join(EXTRACTOR_BACKENDS)})")
+    extractor = EXTRACTOR_BACKENDS[name]
+    return extractor() if extractor.available() else None
+
+
+def get_cached_text(conn: sqlite3.Connection, content_hash: str, extractor: str) -> Optional[sqlite3.Row]:
+    """
+    The cached extraction for a content hash, if it should be used: a
+    success from any backend, a failure only from the same backend
+    """
+    return conn.execute(
+        """SELECT content_hash, extractor, status, text, error FROM document_text
+           WHERE content_hash = ? AND (status IN ('ok', 'empty') OR extractor = ?)""",
+        (content_hash, extractor)
+    ).fetchone()
+
+
+def get_cached_file_text(conn: sqlite3.Connection, file_path: str) -> Optional[str]:
+    """A file's cached text, if it was extracted before (never extracts)"""
+    try:
+        content_hash = hash_file(file_path)
+    except OSError:
+        return None
+    row = conn.execute(
+        "SELECT text FROM document_text WHERE content_hash = ? AND status = 'ok'", (content_hash,)
+    ).fetchone()
+    return row[0] if row else None
+
+
+def store_text(conn: sqlite3.Connection, content_hash: str, extractor: str, status: str,
+               text: Optional[str] = None, error: Optional[str] = None, duration_ms: Optional[float] = None):
+    """Cache the outcome of an extraction"""
+    with conn:
+        conn.execute(
+            """INSERT OR REPLACE INTO document_text(content_hash, extractor, status, text, error, duration_ms)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            (content_hash, extractor, status, text, error, duration_ms)
+        )
+
+
+class ContentExtractor:
+    """Extracts document text on a worker pool, through the document_text cache"""
+    def __init__(self, extractor: TextExtractor, connect: Callable[[], sqlite3.Connection],
+                 workers: int = 2, timeout: float = 30.0, max_pages: int = 5, max_chars: int = 200000):
+        self.extractor = extractor
+        self.connect = connect
+        self.timeout = timeout
+        self.max_pages = max_pages
+        self.max_chars = max_chars
+        self.stats: Dict[str, int] = {"cached": 0, "extracted": 0, "failed": 0}
+        self._stats_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="text-extract")
+
+    def _count(self, outcome: str):
+        with self._stats_lock:
+            self.stats[outcome] += 1
+
+    def submit(self, file_path: str) -> "Future[Optional[str]]":
+        """Start getting a file's text; the future gives None if there is none"""
+        return self._pool.submit(self._get_text_or_none, file_path)
+
+    def _get_text_or_none(self, file_path: str) -> Optional[str]:
+        # A failure here must not stop a scan; the file is simply not recognised
+        try:
+            return self.get_text(file_path)
+        except Exception as e:
+            logging.error(f"Text extraction failed for {file_path}: {str(e)}")
+            return None
+
+    def get_text(self, file_path: str) -> Optional[str]:
+        """A file's text, from the cache or extracted (and then cached)"""
+        try:
+            content_hash = hash_file(file_path)
+        except OSError as e:
+            logging.warning(f"Could not read {file_path} for text extraction: {str(e)}")
+            return None
+
+        conn = self.connect()
+        try:
+            cached = get_cached_text(conn, content_hash, self.extractor.name)
+            if cached is not None:
+                self._count("cached")
+                return cached["text"] or None
+
+            started = time.perf_counter()
+            try:
+                text = self.extractor.extract(file_path, self.max_pages, self.timeout)[:self.max_chars]
+                status, error = ("ok" if text.strip() else "empty"), None
+                self._count("extracted")
+            except subprocess.TimeoutExpired:
+                text, status, error = None, "timeout", f"No result after {self.timeout:g} s"
+                self._count("failed")
+            except (OSError, RuntimeError) as e:
+                text, status, error = None, "error", str(e)
+                self._count("failed")
+            duration_ms = (time.perf_counter() - started) * 1000
+            if error:
+                logging.warning(f"Text extraction failed for {file_path}: {error}")
+
+            store_text(conn, content_hash, self.extractor.name, status, text, error, duration_ms)
+            return text if status == "ok" else None
+        finally:
+            conn.close()
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+# One content extractor per database; None while the stage is disabled
+_extractors: Dict[bool, Optional[ContentExtractor]] = {}
+
+
+def get_content_extractor(test_mode: bool = False) -> Optional[ContentExtractor]:
+    """Return the shared content extractor, or None if content.enabled is off or no backend is available"""
+    if test_mode not in _extractors:
+        config = settings.get_content_config()
+        extractor = get_text_extractor() if config["enabled"] else None
+        if config["enabled"] and extractor is None:
+            logging.warning(f"Content extraction is enabled but the '{config['extractor']}' extractor is not available")
+        _extractors[test_mode] = ContentExtractor(
+            extractor,
+            lambda: get_db_connection(test_mode=test_mode),
+            workers=int(config["workers"]),
+            timeout=float(config["timeout_seconds"]),
+            max_pages=int(config["max_pages"]),
+            max_chars=int(config["max_chars"])
+        ) if extractor is not None else None
+    return _extractors[test_mode]
+
+
+def main():
+    # Child process of PypdfExtractor: print the text of the first pages
+    parser = argparse.ArgumentParser(description="Print the text of a PDF's first pages (pypdf)")
+    parser.add_argument("file_path")
+    parser.add_argument("--max-pages", type=int, default=5)
+    args = parser.parse_args()
+
+    from pypdf import PdfReader
+
+    reader = PdfReader(args.file_path)
+    out = open(sys.stdout.fileno(), "w", encoding="utf-8", closefd=False)
+    for page in reader.pages[:args.max_pages]:
+        out.write((page.extract_text() or "") + "\n\f")
+    out.flush()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())